@@ -3,6 +3,13 @@ ASGI config for Smartbus project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the live tracking endpoints through this module so idle driver and
+rider connections do not each hold a worker thread, e.g.
+``uvicorn Smartbus.asgi:application``. The ingestion and live tracking views
+are async; the benchmark_asgi command compares this path with wsgi.py.
+With several workers, send every fix of a bus to the same worker: the live
+state of each bus is held in the memory of one process (see the README).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -71,6 +71,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'Smartbus.wsgi.application'
+ASGI_APPLICATION = 'Smartbus.asgi.application'
 
 # Database (MySQL by default; configurable via .env)
 DB_NAME = os.environ.get('DB_NAME', 'smartbus')
@@ -125,3 +126,48 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+
+# Route catalog (routes, stops, bus assignments and the route geometries and
+# stop index built from them): seconds between checks of the catalog version
+# row, and seconds before a reload even without a version bump (covers
+# writes that send no signals)
+ROUTE_CATALOG_VERSION_CHECK = float(os.environ.get('ROUTE_CATALOG_VERSION_CHECK', '1'))
+ROUTE_CATALOG_TTL = int(os.environ.get('ROUTE_CATALOG_TTL', '300'))
+
+# Live tracking
+# Write-behind live state: seconds between bulk flushes of buffered
+# LiveRouteTracking/BusStatus updates (0 writes through on every fix), and
+# the directory holding the append-only log of unflushed fixes. The rows
+# live in the memory of the worker that received the fix, so every fix of a
+# bus must reach the same worker (see the README); a flush skips rows
+# another worker has written more recently
+LIVE_STATE_FLUSH_INTERVAL = float(os.environ.get('LIVE_STATE_FLUSH_INTERVAL', '2.0'))
+LIVE_STATE_LOG_DIR = Path(os.environ.get('LIVE_STATE_LOG_DIR', BASE_DIR / 'var' / 'live_state'))
+# Breadcrumbs kept in memory while the database is unreachable; the oldest
+# are dropped beyond this
+LIVE_STATE_MAX_PENDING_BREADCRUMBS = int(os.environ.get('LIVE_STATE_MAX_PENDING_BREADCRUMBS', '100000'))
+
+# Seconds a cached bus_number -> active route resolution is trusted; saves
+# in the same process invalidate it immediately
+BUS_RESOLVER_CACHE_TTL = int(os.environ.get('BUS_RESOLVER_CACHE_TTL', '60'))
+# Seconds an unknown bus_number stays cached, and the most resolutions kept
+BUS_RESOLVER_MISS_TTL = int(os.environ.get('BUS_RESOLVER_MISS_TTL', '5'))
+BUS_RESOLVER_CACHE_SIZE = int(os.environ.get('BUS_RESOLVER_CACHE_SIZE', '10000'))
+
+# Seconds a route's live overview is cached and shared between viewers
+ROUTE_OVERVIEW_CACHE_TTL = float(os.environ.get('ROUTE_OVERVIEW_CACHE_TTL', '2'))
+
+# Seconds a live stream waits for position updates before re-sending its snapshot
+LIVE_STREAM_RESYNC_SECONDS = float(os.environ.get('LIVE_STREAM_RESYNC_SECONDS', '15'))
+
+# Seconds between loads of other workers' bus positions into the nearby-bus index
+LIVE_INDEX_REFRESH_SECONDS = float(os.environ.get('LIVE_INDEX_REFRESH_SECONDS', '5'))
+
+# Seconds without a fix after which a bus is no longer shown as live;
+# sweep_stale_buses marks such buses inactive/offline in the database. The
+# live state writes a reporting bus's BusStatus.updated_at every half of
+# this, so sweep_stale_buses refuses a --stale-after below that
+LIVE_TRACKING_STALE_AFTER = int(os.environ.get('LIVE_TRACKING_STALE_AFTER', '300'))
+
+# Days of LocationBreadcrumb GPS history kept by purge_breadcrumbs
+BREADCRUMB_RETENTION_DAYS = int(os.environ.get('BREADCRUMB_RETENTION_DAYS', '30'))
@@ -0,0 +1,148 @@
+"""
+SmartBus Alert Engine
+Debounced delay alerts driven by the GPS ingestion path
+
+The engine remembers the last delay level emitted per (bus_route, alert_type)
+and only touches the database when a bus crosses a threshold, or to refresh
+an alert before it expires. Each bus route keeps at most one active delay
+alert, which is updated in place. Database work runs on a background thread,
+outside the request and its transaction.
+"""
+
+from django.db import close_old_connections
+from django.utils import timezone
+from datetime import timedelta
+import logging
+import queue
+import threading
+import time
+
+from .models import BusAlert
+
+logger = logging.getLogger(__name__)
+
+# Delay thresholds in minutes and the alert priority for each
+DELAY_LEVELS = [
+    (30, 'critical'),
+    (20, 'high'),
+    (10, 'medium'),
+]
+DELAY_PRIORITIES = dict(DELAY_LEVELS)
+ALERT_LIFETIME = timedelta(hours=2)
+# Re-emit an unchanged alert this long after the last emit so it never expires while still valid
+REFRESH_AFTER_SECONDS = 60 * 60
+
+
+def delay_level(delay_minutes, is_delayed=True):
+    """Highest delay threshold crossed, or 0 if the bus is not meaningfully late"""
+    if not is_delayed:
+        return 0
+    for threshold, _ in DELAY_LEVELS:
+        if delay_minutes > threshold:
+            return threshold
+    return 0
+
+
+class AlertEngine:
+    """Per-process alert state with a single background writer"""
+
+    def __init__(self):
+        self._state = {}  # (bus_route_id, alert_type) -> (level, emitted_at)
+        self._lock = threading.Lock()
+        self._jobs = queue.Queue()
+        self._worker = None
+
+    def observe_delay(self, bus_route, delay_minutes, is_delayed=True):
+        """Feed the delay of one accepted fix; emits only on level transitions"""
+        level = delay_level(delay_minutes, is_delayed)
+        key = (bus_route.id, 'delay')
+        now = time.monotonic()
+
+        with self._lock:
+            previous = self._state.get(key)
+            if previous is not None:
+                previous_level, emitted_at = previous
+                if previous_level == level and (level == 0 or now - emitted_at < REFRESH_AFTER_SECONDS):
+                    return False
+            self._state[key] = (level, now)
+
+        # Unknown previous state (first fix since start) is treated as a
+        # transition so an alert left active by an earlier process is reused or cleared
+        self._submit(key, self._write_delay_alert, {
+            'bus_route_id': bus_route.id,
+            'route_id': bus_route.route_id,
+            'bus_number': bus_route.bus.bus_number,
+            'route_name': bus_route.route.route_name,
+            'level': level,
+            'delay_minutes': delay_minutes,
+        })
+        return True
+
+    def _write_delay_alert(self, bus_route_id, route_id, bus_number, route_name, level, delay_minutes):
+        alert = BusAlert.objects.filter(
+            bus_route_id=bus_route_id, alert_type='delay', is_active=True
+        ).order_by('-created_at').first()
+
+        if level == 0:
+            if alert:
+                alert.is_active = False
+                alert.save(update_fields=['is_active', 'updated_at'])
+                logger.info(f"Delay alert cleared: {alert.title}")
+            return
+
+        fields = {
+            'priority': DELAY_PRIORITIES[level],
+            'title': f'Bus {bus_number} Delayed',
+            'message': f'Bus {bus_number} on {route_name} is delayed by {delay_minutes} minutes.',
+            'expires_at': timezone.now() + ALERT_LIFETIME,
+        }
+
+        if alert:
+            for name, value in fields.items():
+                setattr(alert, name, value)
+            alert.save(update_fields=list(fields) + ['updated_at'])
+            logger.info(f"Delay alert updated: {alert.title} ({delay_minutes} min)")
+        else:
+            alert = BusAlert.objects.create(
+                alert_type='delay',
+                bus_route_id=bus_route_id,
+                route_id=route_id,
+                **fields
+            )
+            logger.info(f"Delay alert created: {alert.title}")
+
+    # ----- background writer -----
+
+    def _submit(self, key, func, kwargs):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name='alert-engine', daemon=True)
+                    self._worker.start()
+        self._jobs.put((key, func, kwargs))
+
+    def _run(self):
+        while True:
+            key, func, kwargs = self._jobs.get()
+            try:
+                close_old_connections()
+                func(**kwargs)
+            except Exception as e:
+                logger.error(f"Alert engine job failed: {str(e)}")
+                # Forget the level so the next fix retries the write
+                with self._lock:
+                    self._state.pop(key, None)
+            finally:
+                self._jobs.task_done()
+
+    def drain(self):
+        """Block until every queued alert write has been applied"""
+        self._jobs.join()
+
+
+_engine = AlertEngine()
+
+
+def get_engine():
+    """Process-wide AlertEngine"""
+    return _engine
@@ -0,0 +1,185 @@
+"""
+SmartBus Route Catalog
+Versioned in-process snapshot of routes, stops and bus assignments
+
+Routes, their stops and their operational buses change rarely but are
+read by every search, listing and live view. Each worker process holds
+one RouteCatalog, loaded in three queries, and swaps it for a freshly
+loaded one when the catalog version changes.
+
+The version is the single RouteCatalogVersion row, bumped after commit
+by the Route/RouteStop/BusRoute/Bus save and delete signals and by
+renames of bus operators. A worker reads it (one primary key query) at
+most every VERSION_CHECK_SECONDS, so every worker picks up a change
+within that interval and all of them agree on the version, which route
+ETags are derived from. Changes made without signals (queryset update(),
+bulk_create()) are picked up after CATALOG_TTL.
+
+Data derived from the catalog, such as route geometries and the
+nearest-stop index, is built on first use through derived() and is
+dropped together with the catalog.
+"""
+
+from django.conf import settings
+from django.db.models import F
+import threading
+import time
+
+from .models import Route, RouteStop, BusRoute, RouteCatalogVersion
+
+VERSION_ROW_ID = 1
+VERSION_CHECK_SECONDS = getattr(settings, 'ROUTE_CATALOG_VERSION_CHECK', 1.0)
+# Safety net for changes that bump no version
+CATALOG_TTL_SECONDS = getattr(settings, 'ROUTE_CATALOG_TTL', 300)
+
+
+class RouteCatalog:
+    """
+    Every route with its stops (by stop_sequence) and operational bus
+    routes (by id, with bus, operator and route loaded). Shared between
+    threads: the model instances in it must not be modified.
+    """
+
+    def __init__(self, version, routes, stops, bus_routes):
+        self.version = version
+        self.routes = {route.route_id: route for route in routes}
+        # Sorted in Python so the names can be bisected for keyset pagination
+        self.active_routes = sorted(
+            (route for route in routes if route.is_active), key=lambda route: route.route_name
+        )
+        self.active_route_names = [route.route_name for route in self.active_routes]
+        self._by_name = {route.route_name.lower(): route for route in self.active_routes}
+        self.cities = sorted(
+            {route.source for route in self.active_routes} | {route.destination for route in self.active_routes}
+        )
+        # Active routes by lowercased endpoints, in route_name order
+        self._by_endpoints = {}
+        self._by_source = {}
+        self._by_destination = {}
+        for route in self.active_routes:
+            source, destination = route.source.lower(), route.destination.lower()
+            self._by_endpoints.setdefault((source, destination), []).append(route)
+            self._by_source.setdefault(source, []).append(route)
+            self._by_destination.setdefault(destination, []).append(route)
+
+        self._stops = {}
+        for stop in stops:
+            self._stops.setdefault(stop.route_id, []).append(stop)
+
+        self._bus_routes = {}
+        self._bus_routes_by_id = {}
+        for bus_route in bus_routes:
+            route = self.routes.get(bus_route.route_id)
+            if route is None:
+                continue
+            bus_route.route = route
+            self._bus_routes.setdefault(bus_route.route_id, []).append(bus_route)
+            self._bus_routes_by_id[bus_route.id] = bus_route
+
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def load(cls, version):
+        return cls(
+            version,
+            list(Route.objects.order_by('route_name')),
+            list(RouteStop.objects.order_by('route_id', 'stop_sequence')),
+            list(BusRoute.objects.filter(is_operational=True).select_related('bus__user').order_by('id')),
+        )
+
+    def is_expired(self):
+        return time.monotonic() - self.loaded_at > CATALOG_TTL_SECONDS
+
+    def active_route(self, route_id):
+        """Active route by id, or None"""
+        route = self.routes.get(route_id)
+        return route if route is not None and route.is_active else None
+
+    def route_by_name(self, route_name):
+        """Active route by case-insensitive name, or None"""
+        return self._by_name.get(route_name.strip().lower())
+
+    def routes_between(self, source, destination):
+        """(routes from source to destination, routes back) by case-insensitive city names"""
+        source, destination = source.lower(), destination.lower()
+        return (
+            self._by_endpoints.get((source, destination), []),
+            self._by_endpoints.get((destination, source), [])
+        )
+
+    def routes_from(self, city):
+        return self._by_source.get(city.lower(), [])
+
+    def routes_to(self, city):
+        return self._by_destination.get(city.lower(), [])
+
+    def stops_of(self, route_id):
+        return self._stops.get(route_id, [])
+
+    def bus_routes_of(self, route_id):
+        """Operational bus routes of a route"""
+        return self._bus_routes.get(route_id, [])
+
+    def bus_route(self, bus_route_id):
+        """Operational bus route by id, or None"""
+        return self._bus_routes_by_id.get(bus_route_id)
+
+    def derived(self, key, build):
+        """Value built once per catalog by build(); concurrent first uses may both build it"""
+        value = self._derived.get(key)
+        if value is None:
+            value = build()
+            with self._derived_lock:
+                value = self._derived.setdefault(key, value)
+        return value
+
+
+_catalog = None
+_checked_at = None
+_lock = threading.Lock()
+
+
+def current_version():
+    """The shared catalog version, created if the row does not exist yet"""
+    version = RouteCatalogVersion.objects.filter(pk=VERSION_ROW_ID).values_list('version', flat=True).first()
+    if version is None:
+        # Start from the clock so a recreated row never repeats an old version
+        version = RouteCatalogVersion.objects.get_or_create(
+            pk=VERSION_ROW_ID, defaults={'version': time.time_ns()}
+        )[0].version
+    return version
+
+
+def bump_version():
+    """Make every worker reload its catalog; call after the change is committed"""
+    global _checked_at
+    if not RouteCatalogVersion.objects.filter(pk=VERSION_ROW_ID).update(version=F('version') + 1):
+        current_version()
+    # This process sees its own change on the next request
+    _checked_at = None
+
+
+def get_catalog():
+    """The current RouteCatalog, reloaded if the version moved or it expired"""
+    global _catalog, _checked_at
+    catalog = _catalog
+    checked_at = _checked_at
+    now = time.monotonic()
+    if catalog is not None and not catalog.is_expired():
+        if checked_at is not None and now - checked_at < VERSION_CHECK_SECONDS:
+            return catalog
+        if catalog.version == current_version():
+            _checked_at = now
+            return catalog
+
+    with _lock:
+        # Another thread may have reloaded while this one waited
+        version = current_version()
+        catalog = _catalog
+        if catalog is None or catalog.version != version or catalog.is_expired():
+            catalog = RouteCatalog.load(version)
+            _catalog = catalog
+        _checked_at = now
+    return catalog
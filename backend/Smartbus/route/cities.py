@@ -0,0 +1,135 @@
+"""
+SmartBus City Index
+City-name validation and suggestions for route search
+
+CityIndex resolves user input to a known city name with the rules
+search_routes has always applied: an exact case-insensitive match, else
+a single "strict partial" match (the input starts the city name, or is a
+substring covering at least half of it), else up to three suggestions.
+Instead of scanning every city on each request it keeps
+  - a hash of normalized names for exact matches,
+  - the normalized names in sorted order, bisected for prefix matches,
+  - an inverted index of padded trigrams, intersected for substring
+    matches and counted to pick fuzzy candidates, which are then ranked
+    by difflib's similarity ratio as before.
+The index of the active routes' cities, and a second one of their stop
+names for searches between intermediate stops, are built once per route
+catalog, so Route and RouteStop changes rebuild them.
+"""
+
+from collections import Counter
+import bisect
+import difflib
+
+from .catalog import get_catalog
+
+# Shorter input is never matched
+MIN_INPUT_LENGTH = 3
+# Share of a city name a non-prefix substring must cover to match it
+SUBSTRING_MIN_SHARE = 0.5
+SUGGESTIONS = 3
+FUZZY_CUTOFF = 0.7
+# Cities sharing the most trigrams with the input that are ranked by ratio
+FUZZY_CANDIDATES = 50
+
+
+def normalize(name):
+    """Lowercase with runs of whitespace collapsed"""
+    return ' '.join(name.lower().split())
+
+
+def _padded_trigrams(key):
+    padded = f'  {key} '
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def _result(matched_name=None, suggestions=()):
+    return {
+        'valid': matched_name is not None,
+        'matched_name': matched_name,
+        'suggestions': list(suggestions)
+    }
+
+
+class CityIndex:
+    def __init__(self, names):
+        self.names = sorted({name.strip() for name in names if name and name.strip()}, key=normalize)
+        self._keys = [normalize(name) for name in self.names]
+        self._exact = {}
+        self._trigrams = {}  # padded trigram -> ranks of the names containing it
+        for rank, key in enumerate(self._keys):
+            self._exact.setdefault(key, rank)
+            for trigram in _padded_trigrams(key):
+                self._trigrams.setdefault(trigram, []).append(rank)
+
+    def __len__(self):
+        return len(self.names)
+
+    def validate(self, city_input):
+        """{'valid', 'matched_name', 'suggestions'} for a user-typed city"""
+        key = normalize(city_input)
+        if len(key) < MIN_INPUT_LENGTH:
+            return _result(suggestions=self.names[:5])
+
+        rank = self._exact.get(key)
+        if rank is not None:
+            return _result(self.names[rank])
+
+        partial = self._partial_matches(key)
+        if len(partial) == 1:
+            return _result(self.names[partial[0]])
+        if partial:
+            return _result(suggestions=[self.names[rank] for rank in partial])
+        return _result(suggestions=self.suggest(key))
+
+    def _partial_matches(self, key):
+        """First SUGGESTIONS ranks of the names key starts or covers as a long enough substring"""
+        found = set()
+        start = bisect.bisect_left(self._keys, key)
+        for rank in range(start, min(start + SUGGESTIONS, len(self._keys))):
+            if not self._keys[rank].startswith(key):
+                break
+            found.add(rank)
+
+        longest = len(key) / SUBSTRING_MIN_SHARE
+        found.update(rank for rank in self._containing(key) if len(self._keys[rank]) <= longest)
+        return sorted(found)[:SUGGESTIONS]
+
+    def _containing(self, key):
+        """Ranks of the names containing key (at least MIN_INPUT_LENGTH long)"""
+        postings = sorted(
+            (self._trigrams.get(key[index:index + 3], ()) for index in range(len(key) - 2)), key=len
+        )
+        if not postings[0]:
+            return []
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return [rank for rank in candidates if key in self._keys[rank]]
+
+    def suggest(self, key):
+        """Up to SUGGESTIONS names with a similarity ratio of at least FUZZY_CUTOFF, best first"""
+        shared = Counter()
+        for trigram in _padded_trigrams(key):
+            shared.update(self._trigrams.get(trigram, ()))
+
+        scored = []
+        for rank, _ in shared.most_common(FUZZY_CANDIDATES):
+            ratio = difflib.SequenceMatcher(None, key, self._keys[rank]).ratio()
+            if ratio >= FUZZY_CUTOFF:
+                scored.append((-ratio, rank))
+        return [self.names[rank] for _, rank in sorted(scored)[:SUGGESTIONS]]
+
+
+def get_city_index():
+    """The CityIndex of the current route catalog's cities"""
+    catalog = get_catalog()
+    return catalog.derived('city_index', lambda: CityIndex(catalog.cities))
+
+
+def get_stop_name_index():
+    """A CityIndex of the stop names of the current route catalog's active routes"""
+    catalog = get_catalog()
+    return catalog.derived('stop_name_index', lambda: CityIndex(
+        stop.stop_name
+        for route in catalog.active_routes
+        for stop in catalog.stops_of(route.route_id)
+    ))
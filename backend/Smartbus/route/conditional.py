@@ -0,0 +1,69 @@
+"""
+SmartBus Conditional Responses
+Weak ETag / Last-Modified validators for the live polling endpoints
+
+A live payload changes only when its bus reports a fix
+(LiveRouteTracking.last_updated) or its status changes
+(BusStatus.updated_at). Views derive validators from those rows before
+building the payload and answer a matching If-None-Match or
+If-Modified-Since with 304 Not Modified. ETags are weak because the JSON
+is not byte-for-byte reproducible (timestamps of the response itself).
+
+Async views cannot use django.views.decorators.http.condition, which
+calls its validator functions synchronously; they call not_modified()
+and with_validators() around their own lookups instead.
+"""
+
+from collections import namedtuple
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+import hashlib
+
+Validators = namedtuple('Validators', ['etag', 'last_modified'])
+
+
+def make_validators(key, timestamps):
+    """
+    Validators of a payload identified by key (any repr-able value, e.g.
+    the ids of the rows it is built from) and the modification times of
+    those rows; None timestamps are skipped
+    """
+    timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+    # Microsecond timestamps: fixes can arrive within the same second
+    digest = hashlib.md5(
+        repr((key, [timestamp.timestamp() for timestamp in timestamps])).encode()
+    ).hexdigest()
+    return Validators(f'W/"{digest}"', max(timestamps) if timestamps else None)
+
+
+def live_validators(key, tracking=None, bus_status=None):
+    """Validators of a single-bus payload built from a tracking row and bus status"""
+    return make_validators(
+        (key, tracking.pk if tracking else None, bus_status.pk if bus_status else None),
+        [tracking.last_updated if tracking else None, bus_status.updated_at if bus_status else None]
+    )
+
+
+def _last_modified_seconds(validators):
+    if validators.last_modified is None:
+        return None
+    return int(validators.last_modified.timestamp())
+
+
+def not_modified(request, validators):
+    """A 304 response if the request's conditional headers match, else None"""
+    response = get_conditional_response(
+        request, etag=validators.etag, last_modified=_last_modified_seconds(validators)
+    )
+    if response is not None:
+        with_validators(response, validators)
+    return response
+
+
+def with_validators(response, validators):
+    """Set ETag and Last-Modified on a successful response"""
+    if response.status_code in (200, 304):
+        response.headers.setdefault('ETag', validators.etag)
+        if validators.last_modified is not None:
+            response.headers.setdefault('Last-Modified', http_date(_last_modified_seconds(validators)))
+    return response
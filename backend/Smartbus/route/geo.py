@@ -0,0 +1,76 @@
+"""
+SmartBus Geo Distance Engine
+NumPy-vectorized great-circle distances for the live tracking hot paths
+
+Distances use the haversine formula on a sphere with the IUGG mean Earth
+radius. Compared with geopy's ellipsoidal geodesic (WGS-84) the relative
+error is at most about 0.56% (worst for north-south lines), i.e. under
+0.6 m for a 100 m GPS hop and under 1.4 km on a 250 km route;
+`python manage.py benchmark_geo` reports the measured error on the sample
+routes. The equirectangular approximation differs from haversine by less
+than 0.001% for points under 50 km apart and suits short hops such as
+consecutive GPS fixes.
+"""
+
+import math
+import numpy as np
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; arguments may be scalars or broadcastable arrays"""
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    sin_dlat = np.sin((lat2 - lat1) * 0.5)
+    sin_dlon = np.sin((lon2 - lon1) * 0.5)
+    a = sin_dlat * sin_dlat + np.cos(lat1) * np.cos(lat2) * sin_dlon * sin_dlon
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def equirectangular_km(lat1, lon1, lat2, lon2):
+    """Fast flat-Earth approximation in km, accurate for short distances"""
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    x = (lon2 - lon1) * np.cos((lat1 + lat2) * 0.5)
+    y = lat2 - lat1
+    return EARTH_RADIUS_KM * np.sqrt(x * x + y * y)
+
+
+def point_distance_km(lat1, lon1, lat2, lon2):
+    """Haversine distance between two points as a plain float"""
+    # Scalar math avoids NumPy's per-call overhead for single pairs
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    sin_dlat = math.sin((lat2 - lat1) * 0.5)
+    sin_dlon = math.sin((lon2 - lon1) * 0.5)
+    a = sin_dlat * sin_dlat + math.cos(lat1) * math.cos(lat2) * sin_dlon * sin_dlon
+    return 2.0 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def distances_to_points_km(latitude, longitude, latitudes, longitudes):
+    """Distances in km from one point to N points, as an array of shape (N,)"""
+    return haversine_km(
+        latitude, longitude,
+        np.asarray(latitudes, dtype=np.float64),
+        np.asarray(longitudes, dtype=np.float64),
+    )
+
+
+def pairwise_distances_km(latitudes_a, longitudes_a, latitudes_b, longitudes_b):
+    """Distances in km from N points to M points, as an array of shape (N, M)"""
+    latitudes_a = np.asarray(latitudes_a, dtype=np.float64)[:, np.newaxis]
+    longitudes_a = np.asarray(longitudes_a, dtype=np.float64)[:, np.newaxis]
+    latitudes_b = np.asarray(latitudes_b, dtype=np.float64)[np.newaxis, :]
+    longitudes_b = np.asarray(longitudes_b, dtype=np.float64)[np.newaxis, :]
+    return haversine_km(latitudes_a, longitudes_a, latitudes_b, longitudes_b)
+
+
+def nearest_index(latitude, longitude, latitudes, longitudes):
+    """
+    Index of the nearest of N points and its distance in km.
+    NaN coordinates are skipped; returns (None, inf) if no point qualifies.
+    """
+    distances = distances_to_points_km(latitude, longitude, latitudes, longitudes)
+    if distances.size == 0 or np.all(np.isnan(distances)):
+        return None, float('inf')
+    index = int(np.nanargmin(distances))
+    return index, float(distances[index])
@@ -0,0 +1,226 @@
+"""
+SmartBus Route Geometry
+Route stop coordinates for the GPS ingestion path, built once per route
+catalog (see route/catalog.py)
+
+RouteGeometry also map-matches GPS fixes: each fix is projected onto the
+straight stop-to-stop segments of the route, giving continuous distance
+along the route. Matching searches a few segments around the bus's
+previous position (found by binary search on the cumulative distances)
+and only falls back to scanning every segment on a bus's first fix or
+when the fix is off the expected stretch.
+"""
+
+from collections import namedtuple
+import bisect
+import math
+import numpy as np
+
+from .catalog import get_catalog
+from . import geo
+
+
+# A fix further than this from every segment of its search window is
+# matched against the whole route instead
+OFF_ROUTE_KM = 0.5
+# Segments searched on either side of the bus's previous segment
+MATCH_WINDOW = 3
+
+
+RouteMatch = namedtuple('RouteMatch', [
+    'segment',                # index into the segment arrays
+    'stop_index',             # last stop passed
+    'next_stop_index',        # None at the destination
+    'distance_along_km',      # distance from the source along the route
+    'distance_remaining_km',  # distance left to the destination
+    'progress_percent',
+    'offset_km',              # distance of the fix from the matched segment
+])
+
+
+class RouteGeometry:
+    """Stops of one route ordered by stop_sequence, stored as NumPy arrays"""
+
+    __slots__ = (
+        'route_id', 'stops', 'sequences', 'latitudes', 'longitudes',
+        'cumulative_km', 'total_km', 'segment_stops', 'segment_start_km',
+        'segment_km', 'segment_x', 'segment_y', 'segment_dx', 'segment_dy',
+        'segment_length2', 'x_scale', 'segment_tuples', 'segment_start_list',
+        'cumulative_list'
+    )
+
+    def __init__(self, route_id, stops):
+        self.route_id = route_id
+        self.stops = tuple(stops)
+        self.sequences = np.array([stop.stop_sequence for stop in self.stops], dtype=np.int32)
+        # Stops without coordinates are stored as NaN and never matched
+        self.latitudes = np.array([
+            stop.latitude if stop.latitude and stop.longitude else np.nan
+            for stop in self.stops
+        ], dtype=np.float64)
+        self.longitudes = np.array([
+            stop.longitude if stop.latitude and stop.longitude else np.nan
+            for stop in self.stops
+        ], dtype=np.float64)
+        self.cumulative_km = self._cumulative_distances()
+        self.total_km = float(self.cumulative_km[-1]) if len(self.stops) else 0.0
+        self.cumulative_list = self.cumulative_km.tolist()
+        self._build_segments()
+
+    def _cumulative_distances(self):
+        """
+        Distance of every stop from the source in km. Uses
+        RouteStop.distance_from_source when it is filled in and never
+        decreases, else straight-line distances between located stops.
+        """
+        reported = np.array(
+            [stop.distance_from_source or 0.0 for stop in self.stops], dtype=np.float64
+        )
+        if len(reported) > 1 and reported[-1] > 0 and np.all(np.diff(reported) >= 0):
+            return reported
+
+        cumulative = np.zeros(len(self.stops), dtype=np.float64)
+        located = np.flatnonzero(~np.isnan(self.latitudes))
+        if len(located) > 1:
+            cumulative[located[1:]] = np.cumsum(geo.haversine_km(
+                self.latitudes[located[:-1]], self.longitudes[located[:-1]],
+                self.latitudes[located[1:]], self.longitudes[located[1:]],
+            ))
+            # Stops without coordinates take the distance of the stop before them
+            cumulative = np.maximum.accumulate(cumulative)
+        return cumulative
+
+    def _build_segments(self):
+        """
+        Straight segments between consecutive located stops, in a local
+        equirectangular projection (km) centred on the route's mean latitude
+        """
+        located = np.flatnonzero(~np.isnan(self.latitudes))
+        self.segment_stops = located
+        if len(located) < 2:
+            self.segment_x = None
+            return
+
+        self.x_scale = geo.EARTH_RADIUS_KM * math.cos(math.radians(np.mean(self.latitudes[located])))
+        xs = self.x_scale * np.radians(self.longitudes[located])
+        ys = geo.EARTH_RADIUS_KM * np.radians(self.latitudes[located])
+        self.segment_x = xs[:-1]
+        self.segment_y = ys[:-1]
+        self.segment_dx = np.diff(xs)
+        self.segment_dy = np.diff(ys)
+        self.segment_length2 = self.segment_dx ** 2 + self.segment_dy ** 2
+        self.segment_start_km = self.cumulative_km[located[:-1]]
+        self.segment_km = np.diff(self.cumulative_km[located])
+        # Plain-float copies for the windowed search, where NumPy's per-call
+        # overhead outweighs the handful of segments examined
+        self.segment_tuples = list(zip(
+            self.segment_x.tolist(), self.segment_y.tolist(), self.segment_dx.tolist(),
+            self.segment_dy.tolist(), self.segment_length2.tolist()
+        ))
+        self.segment_start_list = self.segment_start_km.tolist()
+
+    def __len__(self):
+        return len(self.stops)
+
+    def has_coordinates(self, index):
+        return not np.isnan(self.latitudes[index])
+
+    def nearest_stop_index(self, latitude, longitude):
+        """Index of the stop closest to the given point, or None without coordinates"""
+        index, _ = geo.nearest_index(latitude, longitude, self.latitudes, self.longitudes)
+        return index
+
+    def distance_to_stop_km(self, latitude, longitude, index):
+        return geo.point_distance_km(
+            latitude, longitude, self.latitudes[index], self.longitudes[index]
+        )
+
+    def next_stop_index(self, index):
+        """Index of the stop after the given one, or None at the route's end"""
+        if index + 1 < len(self.stops):
+            return index + 1
+        return None
+
+    def match(self, latitude, longitude, hint_km=None):
+        """
+        Project a fix onto the route and return a RouteMatch, or None if the
+        route has fewer than two stops with coordinates. hint_km is the bus's
+        previous distance along the route; with it only the segments around
+        that position are searched.
+        """
+        if self.segment_x is None:
+            return None
+
+        x = self.x_scale * math.radians(longitude)
+        y = geo.EARTH_RADIUS_KM * math.radians(latitude)
+        count = len(self.segment_x)
+
+        if hint_km is not None:
+            segment = bisect.bisect_right(self.segment_start_list, hint_km) - 1
+            best = self._closest_segment_near(
+                x, y, max(segment - MATCH_WINDOW, 0), min(segment + MATCH_WINDOW + 1, count)
+            )
+            if best[2] <= OFF_ROUTE_KM:
+                return self._route_match(*best)
+        return self._route_match(*self._closest_segment(x, y))
+
+    def _closest_segment_near(self, x, y, start, end):
+        """(segment, fraction along it, distance in km) of the closest segment in [start, end)"""
+        best = (start, 0.0, float('inf'))
+        for segment in range(start, end):
+            segment_x, segment_y, dx, dy, length2 = self.segment_tuples[segment]
+            offset_x = x - segment_x
+            offset_y = y - segment_y
+            fraction = 0.0
+            if length2 > 0:
+                fraction = min(max((offset_x * dx + offset_y * dy) / length2, 0.0), 1.0)
+            distance = math.hypot(offset_x - fraction * dx, offset_y - fraction * dy)
+            if distance < best[2]:
+                best = (segment, fraction, distance)
+        return best
+
+    def _closest_segment(self, x, y):
+        """Vectorized _closest_segment_near over every segment of the route"""
+        offset_x = x - self.segment_x
+        offset_y = y - self.segment_y
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fractions = np.clip(
+                (offset_x * self.segment_dx + offset_y * self.segment_dy) / self.segment_length2, 0.0, 1.0
+            )
+        # Zero-length segments (two stops at the same point) project onto their start
+        fractions = np.nan_to_num(fractions)
+        distances = np.hypot(offset_x - fractions * self.segment_dx, offset_y - fractions * self.segment_dy)
+        index = int(np.argmin(distances))
+        return index, float(fractions[index]), float(distances[index])
+
+    def _route_match(self, segment, fraction, offset_km):
+        along = float(self.segment_start_km[segment] + fraction * self.segment_km[segment])
+        # Last stop at or before this point, so stops without coordinates count too
+        stop_index = bisect.bisect_right(self.cumulative_list, along) - 1
+        stop_index = min(max(stop_index, 0), len(self.stops) - 1)
+        next_index = self.next_stop_index(stop_index)
+        return RouteMatch(
+            segment=segment,
+            stop_index=stop_index,
+            next_stop_index=next_index,
+            distance_along_km=along,
+            distance_remaining_km=max(self.total_km - along, 0.0),
+            progress_percent=along / self.total_km * 100 if self.total_km > 0 else 0.0,
+            offset_km=offset_km,
+        )
+
+
+def get_route_geometries(route_ids):
+    """Return {route_id: RouteGeometry} from the current route catalog"""
+    catalog = get_catalog()
+    return {
+        route_id: catalog.derived(
+            ('geometry', route_id), lambda route_id=route_id: RouteGeometry(route_id, catalog.stops_of(route_id))
+        )
+        for route_id in set(route_ids)
+    }
+
+
+def get_route_geometry(route_id):
+    """Return the RouteGeometry of a single route"""
+    return get_route_geometries([route_id])[route_id]
@@ -0,0 +1,151 @@
+"""
+SmartBus GPS Filter
+Streaming smoothing and outlier rejection of driver GPS fixes
+
+Each bus has a GpsFilter: a constant-velocity Kalman filter run
+independently on the east and north axes of a local plane around the
+bus's first fix, so state and per-fix cost are O(1). Before a fix reaches
+the filter it is gated:
+
+- accuracy: fixes reporting a worse accuracy than MAX_ACCURACY_M
+- teleport: fixes implying a speed above MAX_SPEED_KMH from the last
+  filtered position
+
+Fixes are timed by the device's clock when they carry one, else by the
+server's receive time. The two clocks are never compared: the filter
+restarts when a bus switches between them. Fixes with neither (further
+untimed fixes of a bus buffered on the device and sent in one batch,
+which arrive together) restart the filter, and only the accuracy gate
+applies to them.
+
+After MAX_CONSECUTIVE_REJECTIONS rejected fixes in a row the filter is
+restarted at the next fix, so a bus whose GPS really did jump (e.g. the
+device was swapped between buses) is followed again. That fix is flagged
+as a relocation so the jump is not counted as distance travelled. A
+filter whose state is no longer finite is restarted the same way.
+"""
+
+import math
+
+from .geo import EARTH_RADIUS_KM
+
+MAX_ACCURACY_M = 100.0
+MAX_SPEED_KMH = 150.0
+MAX_CONSECUTIVE_REJECTIONS = 5
+# Accuracy assumed for fixes that do not report one
+DEFAULT_ACCURACY_M = 15.0
+# Acceleration noise of a bus in m/s^2
+ACCELERATION_NOISE = 1.5
+# Gap after which the previous state says nothing about the next fix
+RESET_AFTER_SECONDS = 300.0
+
+METERS_PER_DEGREE = EARTH_RADIUS_KM * 1000 * math.pi / 180
+
+
+class _Axis:
+    """Position/velocity Kalman filter along one axis, in meters"""
+
+    __slots__ = ('position', 'velocity', 'p00', 'p01', 'p11')
+
+    def __init__(self, position, variance):
+        self.position = position
+        self.velocity = 0.0
+        self.p00 = variance
+        self.p01 = 0.0
+        # Unknown initial speed: up to ~MAX_SPEED_KMH either way
+        self.p11 = (MAX_SPEED_KMH / 3.6) ** 2
+
+    def predict(self, dt):
+        q = ACCELERATION_NOISE ** 2
+        self.position += self.velocity * dt
+        self.p00 += dt * (2 * self.p01 + dt * self.p11) + q * dt ** 3 / 3
+        self.p01 += dt * self.p11 + q * dt ** 2 / 2
+        self.p11 += q * dt
+
+    def update(self, measurement, variance):
+        innovation_variance = self.p00 + variance
+        gain_position = self.p00 / innovation_variance
+        gain_velocity = self.p01 / innovation_variance
+        residual = measurement - self.position
+        self.position += gain_position * residual
+        self.velocity += gain_velocity * residual
+        self.p11 -= gain_velocity * self.p01
+        self.p01 -= gain_position * self.p01
+        self.p00 -= gain_position * self.p00
+
+    def is_finite(self):
+        return all(math.isfinite(value) for value in (self.position, self.velocity, self.p00, self.p01, self.p11))
+
+
+class GpsFilter:
+    """Filter state of one bus"""
+
+    __slots__ = (
+        'origin_latitude', 'origin_longitude', 'x_scale', 'east', 'north', 'timestamp', 'clock',
+        'rejections', 'relocated'
+    )
+
+    def __init__(self):
+        self.east = None
+        self.rejections = 0
+        self.relocated = False  # last accepted fix restarted the filter after rejections
+
+    def _reset(self, latitude, longitude, variance, timestamp, clock):
+        self.origin_latitude = latitude
+        self.origin_longitude = longitude
+        self.x_scale = METERS_PER_DEGREE * math.cos(math.radians(latitude))
+        self.east = _Axis(0.0, variance)
+        self.north = _Axis(0.0, variance)
+        self.timestamp = timestamp
+        self.clock = clock
+        self.rejections = 0
+
+    def _is_finite(self):
+        return (
+            math.isfinite(self.origin_latitude) and math.isfinite(self.origin_longitude)
+            and self.east.is_finite() and self.north.is_finite()
+        )
+
+    def step(self, latitude, longitude, accuracy_m, timestamp, clock='device'):
+        """
+        Feed one fix (timestamp in seconds by the named clock, or None if
+        unknown). Returns the smoothed (latitude, longitude), or None if the
+        fix is rejected.
+        """
+        if not (accuracy_m > 0 and math.isfinite(accuracy_m)):
+            # Missing, or not a usable accuracy
+            accuracy_m = DEFAULT_ACCURACY_M
+        elif accuracy_m > MAX_ACCURACY_M:
+            self.rejections += 1
+            return None
+
+        variance = accuracy_m ** 2
+        self.relocated = self.rejections >= MAX_CONSECUTIVE_REJECTIONS
+        if (
+            self.east is None or self.relocated or not self._is_finite()
+            or timestamp is None or self.timestamp is None or clock != self.clock
+            or timestamp - self.timestamp > RESET_AFTER_SECONDS
+        ):
+            self._reset(latitude, longitude, variance, timestamp, clock)
+            return latitude, longitude
+
+        x = (longitude - self.origin_longitude) * self.x_scale
+        y = (latitude - self.origin_latitude) * METERS_PER_DEGREE
+        # Same-second fixes still get a small step so the gate stays finite
+        dt = max(timestamp - self.timestamp, 1.0)
+
+        jump_m = math.hypot(x - self.east.position, y - self.north.position)
+        if jump_m - accuracy_m > MAX_SPEED_KMH / 3.6 * dt:
+            self.rejections += 1
+            return None
+
+        self.east.predict(dt)
+        self.north.predict(dt)
+        self.east.update(x, variance)
+        self.north.update(y, variance)
+        self.timestamp = timestamp
+        self.rejections = 0
+        return (
+            self.origin_latitude + self.north.position / METERS_PER_DEGREE,
+            self.origin_longitude + self.east.position / self.x_scale,
+        )
@@ -0,0 +1,328 @@
+"""
+SmartBus GPS Ingestion Helpers
+Shared validation and tracking computation for the driver location endpoints
+"""
+
+from django.utils import timezone
+from datetime import datetime, timedelta, timezone as dt_timezone
+import math
+
+from . import geo
+from .models import LiveRouteTracking, LocationBreadcrumb
+
+
+REQUIRED_FIX_FIELDS = ['bus_number', 'latitude', 'longitude']
+
+# Inclusive (min, max) of the numeric fix fields; None leaves a side open
+FIX_FIELD_RANGES = {
+    'latitude': (-90.0, 90.0),
+    'longitude': (-180.0, 180.0),
+    'speed': (0.0, None),
+    'bearing': (None, None),
+    'accuracy': (0.0, None),
+    'altitude': (None, None),
+    'fuel_level': (None, None),
+}
+
+# Columns written by the ingestion path, used for bulk updates
+TRACKING_UPDATE_FIELDS = [
+    'current_latitude', 'current_longitude', 'current_speed', 'bearing',
+    'accuracy', 'altitude', 'is_moving', 'engine_status', 'last_updated',
+    'last_movement', 'trip_start_time', 'distance_covered', 'average_speed',
+    'current_stop', 'next_stop', 'route_progress_percent', 'distance_remaining',
+    'estimated_arrival_next_stop', 'estimated_arrival_destination',
+    'delay_minutes', 'is_active', 'is_delayed',
+    'traffic_condition', 'direction',
+]
+
+STATUS_UPDATE_FIELDS = [
+    'current_status', 'driver_name', 'driver_phone', 'passenger_count',
+    'fuel_level', 'updated_at',
+]
+
+
+class FixValidationError(ValueError):
+    """Raised when a GPS fix payload is missing or has malformed fields"""
+    pass
+
+
+class FixIgnored(Exception):
+    """Raised when a valid fix is acknowledged but not applied"""
+
+    MESSAGES = {
+        'stale': 'Duplicate or out-of-order fix ignored',
+        'outlier': 'Implausible GPS fix rejected',
+    }
+
+    def __init__(self, reason):
+        super().__init__(self.MESSAGES[reason])
+        self.reason = reason
+
+    def as_result(self):
+        """Response fields for the device; success so it does not retry"""
+        return {'success': True, 'ignored': True, 'reason': self.reason, 'message': str(self)}
+
+
+def parse_location_fix(data):
+    """Validate a driver GPS payload and return it with numeric fields converted"""
+    if not isinstance(data, dict):
+        raise FixValidationError('Location fix must be a JSON object')
+
+    for field in REQUIRED_FIX_FIELDS:
+        if field not in data or data[field] is None:
+            raise FixValidationError(f'Missing required field: {field}')
+
+    try:
+        fix = {
+            'bus_number': str(data['bus_number']),
+            'latitude': float(data['latitude']),
+            'longitude': float(data['longitude']),
+            'speed': float(data.get('speed', 0)),
+            'bearing': float(data.get('bearing', 0)),
+            'accuracy': float(data.get('accuracy', 0)),
+            'altitude': float(data.get('altitude', 0)),
+            'engine_on': data.get('engine_on', True),
+            'driver_name': data.get('driver_name'),
+            'driver_phone': data.get('driver_phone'),
+            'passenger_count': int(data['passenger_count']) if data.get('passenger_count') is not None else None,
+            'fuel_level': float(data['fuel_level']) if data.get('fuel_level') is not None else None,
+            # Optional direction of travel, kept until a fix names another
+            'direction': data.get('direction'),
+            # Optional ordering fields: device sequence number and device
+            # clock in epoch milliseconds
+            'seq': int(data['seq']) if data.get('seq') is not None else None,
+            'device_ts': int(data['device_ts']) if data.get('device_ts') is not None else None,
+        }
+    except (TypeError, ValueError, OverflowError):
+        raise FixValidationError('Invalid numeric value in location fix')
+
+    # float() accepts NaN and infinity, which the database rejects or stores as NULL
+    for field, (low, high) in FIX_FIELD_RANGES.items():
+        value = fix[field]
+        if value is None:
+            continue
+        if not math.isfinite(value):
+            raise FixValidationError(f'{field} must be a finite number')
+        if (low is not None and value < low) or (high is not None and value > high):
+            raise FixValidationError(f'{field} out of range: {value}')
+
+    directions = dict(LiveRouteTracking._meta.get_field('direction').choices)
+    if fix['direction'] is not None and fix['direction'] not in directions:
+        raise FixValidationError(f'Invalid direction: {fix["direction"]}')
+    return fix
+
+
+def fix_order_key(fix):
+    """(seq, device_ts) of a fix, stored as a bus's high-water mark once applied"""
+    return (fix['seq'], fix['device_ts'])
+
+
+def is_newer_fix(fix, mark):
+    """
+    Whether a fix comes after the high-water mark of its bus.
+    Device timestamps decide when both sides have one, so a reinstalled
+    app whose sequence restarted at 0 is still accepted; sequence numbers
+    break timestamp ties and decide on their own otherwise. Fixes without
+    either field are always applied.
+    """
+    if mark is None:
+        return True
+    seq, device_ts = fix_order_key(fix)
+    mark_seq, mark_ts = mark
+
+    if device_ts is not None and mark_ts is not None and device_ts != mark_ts:
+        return device_ts > mark_ts
+    if seq is not None and mark_seq is not None:
+        return seq > mark_seq
+    if device_ts is not None and mark_ts is not None:
+        return False  # same device timestamp, no sequence to tell them apart
+    return True
+
+
+def new_tracking_defaults(fix, now):
+    """Initial LiveRouteTracking values for a bus route's first fix"""
+    is_moving = fix['speed'] > 5
+    return {
+        'current_latitude': fix['latitude'],
+        'current_longitude': fix['longitude'],
+        'current_speed': fix['speed'],
+        'is_active': True,
+        'trip_start_time': now if is_moving else None
+    }
+
+
+def apply_location_fix(tracking, created, bus_route, geometry, fix, now=None):
+    """
+    Apply one GPS fix to a LiveRouteTracking instance in memory.
+    geometry is the cached RouteGeometry of the bus route's route.
+    Nothing is saved; callers decide how to persist the instance.
+    """
+    now = now or timezone.now()
+
+    latitude = fix['latitude']
+    longitude = fix['longitude']
+    speed = fix['speed']
+    is_moving = speed > 5  # Moving if speed > 5 km/h
+
+    # Update tracking data
+    old_latitude, old_longitude = tracking.current_latitude, tracking.current_longitude
+    tracking.current_latitude = latitude
+    tracking.current_longitude = longitude
+    tracking.current_speed = speed
+    tracking.bearing = fix['bearing']
+    tracking.accuracy = fix['accuracy']
+    tracking.altitude = fix['altitude']
+    tracking.is_moving = is_moving
+    tracking.engine_status = fix['engine_on']
+    tracking.last_updated = now
+    if fix.get('direction'):
+        tracking.direction = fix['direction']
+    # Brings back a bus that sweep_stale_buses marked inactive
+    tracking.is_active = True
+
+    if is_moving:
+        tracking.last_movement = now
+        if not tracking.trip_start_time:
+            tracking.trip_start_time = now
+
+    # Calculate distance and progress; a relocation flagged by the GPS
+    # filter is a jump, not distance travelled
+    if not created and not fix.get('relocated'):
+        distance_moved = geo.point_distance_km(old_latitude, old_longitude, latitude, longitude)
+        tracking.distance_covered += distance_moved
+
+        # Update average speed
+        if tracking.trip_start_time:
+            trip_duration_hours = (now - tracking.trip_start_time).total_seconds() / 3600
+            if trip_duration_hours > 0:
+                tracking.average_speed = tracking.distance_covered / trip_duration_hours
+
+    # Map-match onto the route for continuous progress; routes with fewer
+    # than two located stops fall back to the nearest stop
+    hint_km = None
+    if not created and not fix.get('relocated') and geometry.total_km > 0:
+        hint_km = tracking.route_progress_percent * geometry.total_km / 100
+    match = geometry.match(latitude, longitude, hint_km)
+
+    if match is not None:
+        tracking.current_stop = geometry.stops[match.stop_index]
+        tracking.route_progress_percent = match.progress_percent
+        tracking.distance_remaining = match.distance_remaining_km
+
+        if speed > 0:
+            tracking.estimated_arrival_destination = now + timedelta(
+                hours=match.distance_remaining_km / speed
+            )
+
+        if match.next_stop_index is None:
+            tracking.next_stop = None
+            tracking.estimated_arrival_next_stop = None
+        else:
+            tracking.next_stop = geometry.stops[match.next_stop_index]
+
+            # ETA to the next stop along the route, based on current speed
+            if speed > 0:
+                distance_to_next = geometry.cumulative_km[match.next_stop_index] - match.distance_along_km
+                eta_hours = distance_to_next / speed
+                tracking.estimated_arrival_next_stop = now + timedelta(hours=eta_hours)
+    else:
+        nearest_index = geometry.nearest_stop_index(latitude, longitude)
+
+        if nearest_index is not None:
+            nearest_stop = geometry.stops[nearest_index]
+            tracking.current_stop = nearest_stop
+            # Calculate route progress percentage
+            total_stops = len(geometry)
+            if total_stops > 0:
+                tracking.route_progress_percent = (nearest_stop.stop_sequence / total_stops) * 100
+
+            # Find next stop
+            next_index = geometry.next_stop_index(nearest_index)
+            if next_index is not None:
+                tracking.next_stop = geometry.stops[next_index]
+
+                # Calculate ETA to next stop
+                if geometry.has_coordinates(next_index):
+                    distance_to_next = geometry.distance_to_stop_km(latitude, longitude, next_index)
+                    tracking.distance_remaining = distance_to_next
+
+                    # ETA calculation based on current speed
+                    if speed > 0:
+                        eta_hours = distance_to_next / speed
+                        tracking.estimated_arrival_next_stop = now + timedelta(hours=eta_hours)
+
+    # A standing bus has no ETA; keep none from before it stopped
+    if speed == 0:
+        tracking.estimated_arrival_next_stop = None
+        tracking.estimated_arrival_destination = None
+
+    # Calculate delay
+    if bus_route.departure_time:
+        scheduled_time = datetime.combine(now.date(), bus_route.departure_time)
+        scheduled_time = timezone.make_aware(scheduled_time)
+        current_delay = (now - scheduled_time).total_seconds() / 60
+        tracking.delay_minutes = int(current_delay)
+        tracking.is_delayed = current_delay > 5
+
+    # Update traffic condition based on speed
+    if speed < 10:
+        tracking.traffic_condition = 'heavy'
+    elif speed < 20:
+        tracking.traffic_condition = 'moderate'
+    else:
+        tracking.traffic_condition = 'light'
+
+    return tracking
+
+
+def apply_status_fix(bus_status, fix, now=None):
+    """Apply the driver-reported fields of a GPS fix to a BusStatus instance"""
+    bus_status.current_status = 'active' if fix['speed'] > 5 else 'idle'
+
+    if fix['driver_name'] is not None:
+        bus_status.driver_name = fix['driver_name']
+    if fix['driver_phone'] is not None:
+        bus_status.driver_phone = fix['driver_phone']
+    if fix['passenger_count'] is not None:
+        bus_status.passenger_count = fix['passenger_count']
+    if fix['fuel_level'] is not None:
+        bus_status.fuel_level = fix['fuel_level']
+    bus_status.updated_at = now or timezone.now()
+    return bus_status
+
+
+def build_breadcrumb(tracking, bus_route, now=None):
+    """History row for an accepted fix, taken from the updated tracking"""
+    now = now or timezone.now()
+    return LocationBreadcrumb(
+        bus_route_id=bus_route.id,
+        route_id=bus_route.route_id,
+        day=now.astimezone(dt_timezone.utc).date(),
+        recorded_at=now,
+        latitude=tracking.current_latitude,
+        longitude=tracking.current_longitude,
+        speed=tracking.current_speed,
+        bearing=tracking.bearing,
+        stop_id=tracking.current_stop_id
+    )
+
+
+def tracking_payload(bus_number, bus_route, tracking):
+    """Serialize the driver-facing view of a tracking update"""
+    return {
+        'bus_number': bus_number,
+        'route_name': bus_route.route.route_name,
+        'current_location': {
+            'latitude': tracking.current_latitude,
+            'longitude': tracking.current_longitude
+        },
+        'current_stop': tracking.current_stop.stop_name if tracking.current_stop else 'En Route',
+        'next_stop': tracking.next_stop.stop_name if tracking.next_stop else 'Destination',
+        'speed': tracking.current_speed,
+        'progress_percent': tracking.route_progress_percent,
+        'eta_next_stop': tracking.next_stop_eta_display,
+        'delay_minutes': tracking.delay_minutes,
+        'delay_status': tracking.delay_status,
+        'is_moving': tracking.is_moving,
+        'last_updated': tracking.last_updated.isoformat()
+    }
@@ -0,0 +1,732 @@
+"""
+SmartBus Live State Store
+Write-behind cache of the latest LiveRouteTracking/BusStatus per bus
+
+Accepted GPS fixes update model instances held in memory and are appended
+to a local append-only log. A background thread writes the changed columns
+of the dirty rows to the database with bulk_update (rows with the same set
+of changed columns share a statement, statuses whose only change is their
+timestamp are written at most every STATUS_HEARTBEAT_SECONDS), and the
+buffered LocationBreadcrumb history
+with bulk_create, every LIVE_STATE_FLUSH_INTERVAL seconds, then discards
+the log segments it has made redundant. Segments are named after the
+process id and a random nonce, so a process that reuses a crashed
+process's PID never appends to its segments. Segments left behind by a
+crashed process are replayed into the database when the next store
+starts; a store first claims each one by renaming it, so two stores
+starting together never replay the same segment. Setting the interval
+to 0 writes through on every fix.
+
+A flush that fails outright (e.g. the log disk is full) keeps every row
+queued and is retried on the next interval. When a bulk write fails the
+flush retries row by row: rows the database rejects are logged and
+dropped so that one bad row cannot block every other bus, and the rest
+is kept for the next flush only if the database connection itself was
+lost. At most MAX_PENDING_BREADCRUMBS breadcrumbs wait in memory; beyond
+that the oldest are dropped.
+
+State is per process: route all fixes for a given bus to the same worker
+(e.g. hash on bus_number at the load balancer; the mixed-bus batch
+endpoint needs the same, per gateway). Readers in other workers fall back
+to the database, which lags by at most one flush interval. If fixes for a
+bus do reach two workers, the flush skips rows whose database timestamp
+(last_updated, updated_at) is newer than the in-memory one, and drops the
+in-memory row so the next fix starts from the database, instead of
+overwriting the other worker's newer position.
+The per-bus high-water marks used to drop duplicate and out-of-order
+fixes, and the GPS filter state, are per process too and start empty
+after a restart.
+"""
+
+from django.conf import settings
+from django.db import close_old_connections, connection, models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from pathlib import Path
+import atexit
+import datetime
+import json
+import logging
+import os
+import threading
+import uuid
+
+from .models import LiveRouteTracking, BusStatus, LocationBreadcrumb
+from .ingestion import TRACKING_UPDATE_FIELDS, STATUS_UPDATE_FIELDS, fix_order_key, is_newer_fix
+from .gps_filter import GpsFilter
+from .resolver import bus_number_key
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_SECONDS = getattr(settings, 'LIVE_STATE_FLUSH_INTERVAL', 2.0)
+BREADCRUMB_BATCH_SIZE = 1000
+# Breadcrumbs held in memory while the database cannot take them
+MAX_PENDING_BREADCRUMBS = getattr(settings, 'LIVE_STATE_MAX_PENDING_BREADCRUMBS', 100000)
+STALE_AFTER_SECONDS = getattr(settings, 'LIVE_TRACKING_STALE_AFTER', 300)
+# Keeps updated_at of a reporting bus well inside the stale threshold
+STATUS_HEARTBEAT_SECONDS = STALE_AFTER_SECONDS / 2
+LOG_DIR = Path(getattr(settings, 'LIVE_STATE_LOG_DIR', settings.BASE_DIR / 'var' / 'live_state'))
+
+
+def _field_attnames(model, field_names):
+    return [model._meta.get_field(name).attname for name in field_names]
+
+
+TRACKING_ATTNAMES = _field_attnames(LiveRouteTracking, TRACKING_UPDATE_FIELDS)
+STATUS_ATTNAMES = _field_attnames(BusStatus, STATUS_UPDATE_FIELDS)
+BREADCRUMB_ATTNAMES = [
+    field.attname for field in LocationBreadcrumb._meta.concrete_fields if not field.primary_key
+]
+
+
+def _encode(instance, attnames):
+    values = {'pk': instance.pk}
+    for attname in attnames:
+        value = getattr(instance, attname)
+        if isinstance(value, datetime.date):
+            value = value.isoformat()
+        values[attname] = value
+    return values
+
+
+def _changed_rows(model, instances, update_fields, heartbeat_field=None):
+    """
+    Detached copies of the changed columns of each instance, safe to write
+    without holding the lock: [(instance, copy, field names, {attname: value})].
+    A change to heartbeat_field alone is skipped until it is
+    STATUS_HEARTBEAT_SECONDS old.
+    """
+    rows = []
+    for instance in instances:
+        fields = [name for name in instance.changed_fields() if name in update_fields]
+        if fields == [heartbeat_field]:
+            previous = instance.remembered_value(heartbeat_field)
+            current = getattr(instance, heartbeat_field)
+            if previous and (current - previous).total_seconds() < STATUS_HEARTBEAT_SECONDS:
+                continue
+        if not fields:
+            continue
+        values = {
+            attname: getattr(instance, attname)
+            for attname in _field_attnames(model, fields)
+        }
+        rows.append((instance, model(pk=instance.pk, **values), tuple(fields), values))
+    return rows
+
+
+def _bulk_update_changed(model, rows):
+    """One bulk_update per distinct set of changed columns"""
+    groups = {}
+    for _, copy, fields, _ in rows:
+        groups.setdefault(fields, []).append(copy)
+    for fields, copies in groups.items():
+        model.objects.bulk_update(copies, fields)
+
+
+TIMESTAMP_FIELDS = {LiveRouteTracking: 'last_updated', BusStatus: 'updated_at'}
+
+
+def _split_superseded(model, rows):
+    """
+    Split _changed_rows entries into (rows to write, rows whose database
+    timestamp is newer than the one this process last loaded or saved, i.e.
+    another process wrote the row since). Locks the rows it reads; call
+    inside the write's transaction.
+    """
+    timestamp_field = TIMESTAMP_FIELDS[model]
+    attname = model._meta.get_field(timestamp_field).attname
+    timestamps = {
+        row[0].pk: row[0].remembered_value(attname) or row[3].get(timestamp_field)
+        for row in rows
+    }
+    newer = {
+        pk for pk, written_at in model.objects.select_for_update().filter(
+            pk__in=timestamps
+        ).values_list('pk', timestamp_field)
+        if written_at and timestamps[pk] and written_at > timestamps[pk]
+    }
+    if not newer:
+        return rows, []
+    return [row for row in rows if row[0].pk not in newer], [row for row in rows if row[0].pk in newer]
+
+
+def _connection_lost():
+    return connection.connection is None or not connection.is_usable()
+
+
+def _write_rows(tracking_rows, status_rows, breadcrumbs):
+    """
+    Write the rows of a failed bulk flush one at a time. Returns
+    (written, dropped, superseded, unwritten): rows the database rejected
+    are dropped, rows another process has written since are superseded;
+    if the connection is lost, the rows not tried yet are left unwritten.
+    Rows are (model, row) pairs, row being a _changed_rows entry or a
+    LocationBreadcrumb.
+    """
+    pending = (
+        [(LiveRouteTracking, row) for row in tracking_rows] +
+        [(BusStatus, row) for row in status_rows] +
+        [(LocationBreadcrumb, breadcrumb) for breadcrumb in breadcrumbs]
+    )
+    written = []
+    dropped = []
+    superseded = []
+    for position, (model, row) in enumerate(pending):
+        try:
+            with transaction.atomic():
+                if model is LocationBreadcrumb:
+                    LocationBreadcrumb.objects.bulk_create([row])
+                elif _split_superseded(model, [row])[1]:
+                    superseded.append((model, row))
+                    continue
+                else:
+                    _bulk_update_changed(model, [row])
+        except Exception as e:
+            if _connection_lost():
+                return written, dropped, superseded, pending[position:]
+            pk = row.bus_route_id if model is LocationBreadcrumb else row[0].pk
+            logger.error(f"Dropping {model.__name__} row {pk} from live state flush: {str(e)}")
+            dropped.append((model, row))
+            continue
+        written.append((model, row))
+    return written, dropped, superseded, []
+
+
+def _decode(model, values):
+    fields = {field.attname: field for field in model._meta.concrete_fields}
+    decoded = {}
+    for attname, value in values.items():
+        field = fields.get(attname)
+        if value is not None and field is not None:
+            if isinstance(field, models.DateTimeField):
+                value = parse_datetime(value)
+            elif isinstance(field, models.DateField):
+                value = parse_date(value)
+        decoded[attname] = value
+    return model(**decoded)
+
+
+class LiveStateStore:
+    """In-memory latest tracking and status rows with a durable append log"""
+
+    def __init__(self, log_dir=LOG_DIR, flush_interval=FLUSH_INTERVAL_SECONDS):
+        self.lock = threading.RLock()
+        self.log_dir = Path(log_dir)
+        self.flush_interval = flush_interval
+        self._trackings = {}  # bus_route_id -> LiveRouteTracking
+        self._statuses = {}  # bus_id -> BusStatus
+        self._dirty_trackings = {}
+        self._dirty_statuses = {}
+        self._breadcrumbs = []  # new LocationBreadcrumb rows, insert-only
+        # Keyed by bus_number_key, so every spelling of a number shares them
+        self._marks = {}  # bus number key -> (seq, device_ts) of the last applied fix
+        self._filters = {}  # bus number key -> GpsFilter
+        # Names this store's log segments apart from those of earlier
+        # processes with the same PID
+        self._run_id = f'{os.getpid()}-{uuid.uuid4().hex[:12]}'
+        _run_ids.add(self._run_id)
+        self._segment = 0
+        self._oldest_segment = 0
+        self._log_file = None
+        self._flusher = None
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        # Serializes loading of missing rows so concurrent first fixes for
+        # the same bus do not create duplicate rows
+        self._load_lock = threading.Lock()
+
+    @property
+    def write_behind(self):
+        return self.flush_interval > 0
+
+    # ----- loading -----
+
+    def trackings_for(self, bus_routes, defaults_by_route):
+        """
+        Return {bus_route_id: (tracking, created)} for the given bus routes.
+        Misses are loaded with one query; rows that do not exist yet are created.
+        """
+        result = {}
+        missing = []
+        stale_before = timezone.now() - datetime.timedelta(seconds=STALE_AFTER_SECONDS)
+        with self.lock:
+            for bus_route in bus_routes:
+                tracking = self._trackings.get(bus_route.id)
+                if tracking is None:
+                    missing.append(bus_route)
+                else:
+                    if tracking.last_updated < stale_before:
+                        # sweep_stale_buses may have changed the row since
+                        tracking.mark_all_changed()
+                    result[bus_route.id] = (tracking, False)
+
+        if not missing:
+            return result
+
+        with self._load_lock:
+            with self.lock:
+                # Rows loaded by another request while this one waited
+                for bus_route in missing:
+                    tracking = self._trackings.get(bus_route.id)
+                    if tracking is not None:
+                        result[bus_route.id] = (tracking, False)
+            missing = [bus_route for bus_route in missing if bus_route.id not in result]
+
+            loaded = {}
+            if missing:
+                for tracking in LiveRouteTracking.objects.filter(
+                    bus_route__in=missing
+                ).select_related('current_stop', 'next_stop').order_by('last_updated'):
+                    loaded[tracking.bus_route_id] = tracking
+
+            for bus_route in missing:
+                created = bus_route.id not in loaded
+                if created:
+                    # First fix ever for this bus route; rare enough to insert directly
+                    tracking = LiveRouteTracking.objects.create(
+                        bus_route=bus_route, **defaults_by_route[bus_route.id]
+                    )
+                else:
+                    tracking = loaded[bus_route.id]
+                with self.lock:
+                    tracking = self._trackings.setdefault(bus_route.id, tracking)
+                result[bus_route.id] = (tracking, created)
+
+        return result
+
+    def tracking_for(self, bus_route, defaults):
+        return self.trackings_for([bus_route], {bus_route.id: defaults})[bus_route.id]
+
+    def statuses_for(self, buses):
+        """Return {bus_id: BusStatus}, loading misses with one query and creating absent rows"""
+        result = {}
+        missing = []
+        stale_before = timezone.now() - datetime.timedelta(seconds=STALE_AFTER_SECONDS)
+        with self.lock:
+            for bus in buses:
+                bus_status = self._statuses.get(bus.id)
+                if bus_status is None:
+                    missing.append(bus)
+                else:
+                    if bus_status.updated_at < stale_before:
+                        # sweep_stale_buses may have changed the row since
+                        bus_status.mark_all_changed()
+                    result[bus.id] = bus_status
+
+        if not missing:
+            return result
+
+        with self._load_lock:
+            with self.lock:
+                for bus in missing:
+                    bus_status = self._statuses.get(bus.id)
+                    if bus_status is not None:
+                        result[bus.id] = bus_status
+            missing = [bus for bus in missing if bus.id not in result]
+
+            loaded = {}
+            if missing:
+                loaded = {status.bus_id: status for status in BusStatus.objects.filter(bus__in=missing)}
+            for bus in missing:
+                bus_status = loaded.get(bus.id)
+                if bus_status is None:
+                    bus_status = BusStatus.objects.create(bus=bus, current_status='active')
+                with self.lock:
+                    result[bus.id] = self._statuses.setdefault(bus.id, bus_status)
+
+        return result
+
+    def status_for(self, bus):
+        return self.statuses_for([bus])[bus.id]
+
+    # ----- reads -----
+
+    def peek_tracking(self, bus_route_id):
+        """Latest in-memory tracking row for a bus route, or None if this process has none"""
+        with self.lock:
+            return self._trackings.get(bus_route_id)
+
+    def peek_status(self, bus_id):
+        with self.lock:
+            return self._statuses.get(bus_id)
+
+    def peek_active(self, bus_route_id, bus_id):
+        """
+        In-memory (tracking, status) of a bus that reported within
+        STALE_AFTER_SECONDS, else (None, None). sweep_stale_buses runs in
+        another process and cannot reach these instances, so silent buses
+        are aged out here.
+        """
+        cutoff = timezone.now() - datetime.timedelta(seconds=STALE_AFTER_SECONDS)
+        with self.lock:
+            tracking = self._trackings.get(bus_route_id)
+            if tracking is None or not tracking.is_active or tracking.last_updated < cutoff:
+                return None, None
+            return tracking, self._statuses.get(bus_id)
+
+    # ----- fix ordering -----
+
+    def is_stale(self, fix):
+        """Cheap pre-check: True if the fix is a duplicate or older than the last applied one"""
+        with self.lock:
+            return not is_newer_fix(fix, self._marks.get(bus_number_key(fix['bus_number'])))
+
+    def advance_mark(self, fix):
+        """
+        Move the bus's high-water mark to this fix, or return False if the
+        fix is stale. Call with self.lock held, in the same critical section
+        that applies the fix, so concurrent requests apply in order.
+        """
+        key = bus_number_key(fix['bus_number'])
+        with self.lock:
+            mark = self._marks.get(key)
+            if not is_newer_fix(fix, mark):
+                return False
+            seq, device_ts = fix_order_key(fix)
+            if mark is not None:
+                # Fixes without ordering fields keep the previous mark
+                seq = mark[0] if seq is None else seq
+                device_ts = mark[1] if device_ts is None else device_ts
+            if seq is not None or device_ts is not None:
+                self._marks[key] = (seq, device_ts)
+            return True
+
+    def filter_fix(self, fix, received_at=None):
+        """
+        Run a fix through its bus's GpsFilter. Returns the fix with smoothed
+        coordinates and a 'relocated' flag, or None if it was rejected as an
+        outlier. Call with self.lock held, like advance_mark.
+        The device clock times the filter; fixes without device_ts are timed
+        by received_at, the server receive time. Pass None for untimed fixes
+        a device buffered and sent together, whose receive times bunch up.
+        """
+        if fix['device_ts'] is not None:
+            timestamp, clock = fix['device_ts'] / 1000, 'device'
+        elif received_at is not None:
+            timestamp, clock = received_at.timestamp(), 'server'
+        else:
+            timestamp, clock = None, None
+        key = bus_number_key(fix['bus_number'])
+        with self.lock:
+            gps_filter = self._filters.get(key)
+            if gps_filter is None:
+                gps_filter = self._filters[key] = GpsFilter()
+            smoothed = gps_filter.step(fix['latitude'], fix['longitude'], fix['accuracy'], timestamp, clock)
+            if smoothed is None:
+                return None
+            return {
+                **fix,
+                'latitude': smoothed[0],
+                'longitude': smoothed[1],
+                'relocated': gps_filter.relocated,
+            }
+
+    # ----- writes -----
+
+    def mark_dirty(self, trackings=(), statuses=(), breadcrumbs=()):
+        """
+        Record updated rows and new breadcrumbs: append them to the log and
+        queue them for the next flush. Callers mutate the instances while
+        holding self.lock.
+        """
+        with self.lock:
+            for tracking in trackings:
+                self._dirty_trackings[tracking.pk] = tracking
+            for bus_status in statuses:
+                self._dirty_statuses[bus_status.pk] = bus_status
+            self._breadcrumbs.extend(breadcrumbs)
+            self._cap_breadcrumbs()
+
+            if self.write_behind:
+                self._append_log(
+                    [{'t': _encode(tracking, TRACKING_ATTNAMES)} for tracking in trackings] +
+                    [{'s': _encode(bus_status, STATUS_ATTNAMES)} for bus_status in statuses] +
+                    [{'b': _encode(breadcrumb, BREADCRUMB_ATTNAMES)} for breadcrumb in breadcrumbs]
+                )
+
+        if self.write_behind:
+            self._ensure_flusher()
+        else:
+            self.flush()
+
+    def flush(self):
+        """Write all dirty rows to the database in bulk"""
+        with self._flush_lock:
+            with self.lock:
+                # First, so a failed rotation leaves every row queued
+                flushed_segment = self._rotate_log()
+                tracking_rows = _changed_rows(
+                    LiveRouteTracking, self._dirty_trackings.values(), TRACKING_UPDATE_FIELDS
+                )
+                status_rows = _changed_rows(
+                    BusStatus, self._dirty_statuses.values(), STATUS_UPDATE_FIELDS,
+                    heartbeat_field='updated_at'
+                )
+                self._dirty_trackings = {}
+                self._dirty_statuses = {}
+                breadcrumbs, self._breadcrumbs = self._breadcrumbs, []
+
+            if not tracking_rows and not status_rows and not breadcrumbs:
+                self._discard_segments(up_to=flushed_segment)
+                return 0
+
+            try:
+                with transaction.atomic():
+                    tracking_writes, superseded_trackings = _split_superseded(LiveRouteTracking, tracking_rows)
+                    status_writes, superseded_statuses = _split_superseded(BusStatus, status_rows)
+                    _bulk_update_changed(LiveRouteTracking, tracking_writes)
+                    _bulk_update_changed(BusStatus, status_writes)
+                    if breadcrumbs:
+                        LocationBreadcrumb.objects.bulk_create(breadcrumbs, batch_size=BREADCRUMB_BATCH_SIZE)
+            except Exception as e:
+                logger.warning(f"Live state bulk flush failed, writing rows one by one: {str(e)}")
+                written, dropped, superseded, unwritten = _write_rows(tracking_rows, status_rows, breadcrumbs)
+            else:
+                written = (
+                    [(LiveRouteTracking, row) for row in tracking_writes] +
+                    [(BusStatus, row) for row in status_writes] +
+                    [(LocationBreadcrumb, breadcrumb) for breadcrumb in breadcrumbs]
+                )
+                dropped = []
+                superseded = (
+                    [(LiveRouteTracking, row) for row in superseded_trackings] +
+                    [(BusStatus, row) for row in superseded_statuses]
+                )
+                unwritten = []
+
+            with self.lock:
+                # The written values, not the current ones: fixes applied
+                # during the write stay changed for the next flush. Dropped
+                # values count as written so they are not tried again.
+                for model, row in written + dropped + superseded:
+                    if model is not LocationBreadcrumb:
+                        instance, _, _, values = row
+                        instance.mark_clean(values)
+
+                if superseded:
+                    logger.warning(
+                        f"Live state flush skipped {len(superseded)} rows written more recently by another process"
+                    )
+                    # The next fix for these buses starts from the database row
+                    for model, row in superseded:
+                        instance = row[0]
+                        if model is LiveRouteTracking:
+                            rows, key = self._trackings, instance.bus_route_id
+                        else:
+                            rows, key = self._statuses, instance.bus_id
+                        if rows.get(key) is instance:
+                            del rows[key]
+
+                if unwritten:
+                    logger.error(f"Live state flush lost the database connection, will retry {len(unwritten)} rows")
+                    # Keep newer updates that arrived during the failed flush
+                    for model, row in unwritten:
+                        if model is LiveRouteTracking:
+                            self._dirty_trackings.setdefault(row[0].pk, row[0])
+                        elif model is BusStatus:
+                            self._dirty_statuses.setdefault(row[0].pk, row[0])
+                    self._breadcrumbs[:0] = [row for model, row in unwritten if model is LocationBreadcrumb]
+                    self._cap_breadcrumbs()
+                    return len(written)
+
+            self._discard_segments(up_to=flushed_segment)
+            return len(written)
+
+    def _cap_breadcrumbs(self):
+        """Drop the oldest pending breadcrumbs beyond MAX_PENDING_BREADCRUMBS; called with self.lock held"""
+        excess = len(self._breadcrumbs) - MAX_PENDING_BREADCRUMBS
+        if excess > 0:
+            del self._breadcrumbs[:excess]
+            logger.warning(f"Live state breadcrumb buffer full, dropped the {excess} oldest breadcrumbs")
+
+    # ----- append log -----
+
+    def _segment_path(self, segment):
+        return self.log_dir / f'{self._run_id}-{segment:08d}.log'
+
+    def _append_log(self, entries):
+        if self._log_file is None:
+            self.log_dir.mkdir(parents=True, exist_ok=True)
+            self._log_file = open(self._segment_path(self._segment), 'a', buffering=1)
+        for entry in entries:
+            self._log_file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+    def _rotate_log(self):
+        """Close the active segment and return its number; called with self.lock held"""
+        segment = self._segment
+        if self._log_file is not None:
+            self._log_file.flush()
+            os.fsync(self._log_file.fileno())
+            self._log_file.close()
+            self._log_file = None
+            self._segment += 1
+        return segment
+
+    def _discard_segments(self, up_to):
+        for segment in range(self._oldest_segment, up_to + 1):
+            try:
+                self._segment_path(segment).unlink()
+            except FileNotFoundError:
+                pass
+        self._oldest_segment = max(self._oldest_segment, up_to + 1)
+
+    def recover(self):
+        """Replay log segments left by processes that are no longer running"""
+        if not self.log_dir.exists():
+            return 0
+
+        trackings = {}
+        statuses = {}
+        breadcrumbs = []
+        replayed = []
+        for path in sorted([*self.log_dir.glob('*.log'), *self.log_dir.glob('*.recovering')]):
+            path = self._claim(path)
+            if path is None:
+                continue
+            with open(path) as log_file:
+                for line in log_file:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # torn final line from the crash
+                    if 't' in entry:
+                        _keep_newest(trackings, entry['t'], 'last_updated')
+                    if 's' in entry:
+                        _keep_newest(statuses, entry['s'], 'updated_at')
+                    if 'b' in entry:
+                        breadcrumbs.append(entry['b'])
+            replayed.append(path)
+
+        # Never roll back rows that a live worker has written since the crash
+        for pk, last_updated in LiveRouteTracking.objects.filter(
+            pk__in=trackings.keys()
+        ).values_list('pk', 'last_updated'):
+            if last_updated and last_updated >= parse_datetime(trackings[pk]['last_updated']):
+                del trackings[pk]
+        for pk, updated_at in BusStatus.objects.filter(
+            pk__in=statuses.keys()
+        ).values_list('pk', 'updated_at'):
+            if updated_at and updated_at >= parse_datetime(statuses[pk]['updated_at']):
+                del statuses[pk]
+
+        if trackings or statuses or breadcrumbs:
+            with transaction.atomic():
+                LiveRouteTracking.objects.bulk_update(
+                    [_decode(LiveRouteTracking, values) for values in trackings.values()],
+                    TRACKING_UPDATE_FIELDS
+                )
+                BusStatus.objects.bulk_update(
+                    [_decode(BusStatus, values) for values in statuses.values()],
+                    STATUS_UPDATE_FIELDS
+                )
+                # At-least-once: a crash between commit and segment removal
+                # can replay breadcrumbs that were already written
+                LocationBreadcrumb.objects.bulk_create(
+                    [_decode(LocationBreadcrumb, values) for values in breadcrumbs],
+                    batch_size=BREADCRUMB_BATCH_SIZE
+                )
+            logger.info(
+                f"Recovered {len(trackings)} tracking, {len(statuses)} status and "
+                f"{len(breadcrumbs)} breadcrumb rows from live state log"
+            )
+
+        for path in replayed:
+            path.unlink()
+        return len(trackings) + len(statuses) + len(breadcrumbs)
+
+    def _claim(self, path):
+        """
+        Take over a segment, or a segment a crashed store was recovering,
+        if the process that owns it has exited: rename it to
+        <segment>.<run id>.recovering and return the new path. Returns None
+        if the owner is alive or another store claimed it first.
+        """
+        segment, _, owner = path.name.partition('.')
+        if path.suffix == '.recovering':
+            owner = owner[:-len('.recovering')]
+        else:
+            owner = segment.rsplit('-', 1)[0]
+        if owner == self._run_id:
+            # Our own segments are live; our own claims are retried
+            return path if path.suffix == '.recovering' else None
+        pid = int(owner.split('-', 1)[0])
+        if pid == os.getpid():
+            # Unless a store of this process owns it, an earlier process had our PID
+            if owner in _run_ids:
+                return None
+        elif _process_alive(pid):
+            return None
+
+        claimed = path.with_name(f'{segment}.{self._run_id}.recovering')
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            return None
+        return claimed
+
+    # ----- background flusher -----
+
+    def _ensure_flusher(self):
+        if self._flusher is not None:
+            return
+        with self.lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._run, name='live-state-flusher', daemon=True)
+            self._flusher.start()
+            atexit.register(self.stop)
+
+    def _run(self):
+        try:
+            close_old_connections()
+            self.recover()
+        except Exception as e:
+            logger.error(f"Live state recovery failed: {str(e)}")
+
+        while not self._stop.wait(self.flush_interval):
+            # A failed flush (e.g. the log disk is full) must not end the
+            # thread: nothing would reach the database until a restart
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception as e:
+                logger.exception(f"Live state flush failed, retrying next interval: {str(e)}")
+
+    def stop(self):
+        """Stop the flusher and write out everything still pending"""
+        self._stop.set()
+        self.flush()
+
+
+def _keep_newest(rows, values, timestamp_attname):
+    current = rows.get(values['pk'])
+    if current is None or parse_datetime(current[timestamp_attname]) <= parse_datetime(values[timestamp_attname]):
+        rows[values['pk']] = values
+
+
+# Run ids of the stores of this process
+_run_ids = set()
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Process-wide LiveStateStore"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = LiveStateStore()
+    return _store
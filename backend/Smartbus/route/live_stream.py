@@ -0,0 +1,147 @@
+"""
+SmartBus Live Stream Hub
+In-process publish/subscribe of accepted GPS fixes for server-sent events
+
+Map clients subscribe to a bus ('bus:<bus number key>') or a route
+('route:<route name>') channel through the live/.../stream/ endpoints.
+Bus channels are named by the resolver's bus_number_key, so a stream opened
+under any spelling of a number gets the fixes published under the stored one.
+Every accepted fix is reduced to the fields that changed since the bus's
+previous fix, serialized once as an SSE frame, and the same bytes are
+queued for every subscriber of the bus and of its route.
+
+Subscribers are per process, like the live state store. Streams re-send
+a full snapshot after RESYNC_SECONDS without deltas, so a subscriber
+connected to a worker that does not receive its bus's fixes still sees
+positions no older than that.
+"""
+
+from django.conf import settings
+import asyncio
+import json
+import threading
+
+from .resolver import bus_number_key
+
+# Idle seconds after which a stream re-sends its snapshot (also keeps proxies from closing it)
+RESYNC_SECONDS = getattr(settings, 'LIVE_STREAM_RESYNC_SECONDS', 15)
+# Frames buffered per subscriber; a slow client loses the oldest deltas first
+QUEUE_SIZE = 100
+
+# tracking_payload fields sent in deltas
+DELTA_FIELDS = [
+    'current_stop', 'next_stop', 'speed', 'progress_percent', 'eta_next_stop',
+    'delay_minutes', 'delay_status', 'is_moving', 'last_updated'
+]
+
+
+def sse_frame(event, data):
+    """Encode one server-sent event; data is a dict or already-serialized JSON bytes"""
+    if not isinstance(data, bytes):
+        data = json.dumps(data, separators=(',', ':')).encode()
+    return b'event: ' + event.encode() + b'\ndata: ' + data + b'\n\n'
+
+
+def bus_channel(bus_number):
+    return f'bus:{bus_number_key(bus_number)}'
+
+
+def route_channel(route_name):
+    return f'route:{route_name.lower()}'
+
+
+class Subscription:
+    """Frame queue of one connected client, fed from any thread"""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def push(self, frame):
+        """Called on the subscriber's event loop"""
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(frame)
+
+    async def next_frame(self, timeout):
+        """Next queued frame, or None after timeout seconds without one"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LiveHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # channel -> set of Subscription
+        self._last_sent = {}  # bus_number -> last published delta fields
+
+    def subscribe(self, channel):
+        """Register a subscription for the running event loop's client"""
+        subscription = Subscription(channel)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish_position(self, payload):
+        """
+        Fan out a tracking_payload as a 'position' delta to the bus and
+        route channels. Safe to call from any thread.
+        """
+        bus_number = payload['bus_number']
+        location = payload['current_location']
+        state = {
+            'latitude': round(location['latitude'], 6),
+            'longitude': round(location['longitude'], 6),
+            **{field: payload[field] for field in DELTA_FIELDS},
+        }
+        channels = (bus_channel(bus_number), route_channel(payload['route_name']))
+
+        with self._lock:
+            previous = self._last_sent.get(bus_number, {})
+            self._last_sent[bus_number] = state
+            subscribers = [
+                subscription
+                for channel in channels
+                for subscription in self._subscribers.get(channel, ())
+            ]
+        if not subscribers:
+            return 0
+
+        delta = {'bus_number': bus_number}
+        delta.update((key, value) for key, value in state.items() if previous.get(key) != value)
+        frame = sse_frame('position', delta)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, frame)
+            except RuntimeError:
+                # The client's event loop has shut down
+                self.unsubscribe(subscription)
+        return len(subscribers)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = LiveHub()
+    return _hub
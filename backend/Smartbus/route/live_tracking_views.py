@@ -4,211 +4,109 @@ Professional-grade real-time bus tracking system like FindMyTrain
 """
 
 from django.shortcuts import get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.core.cache import cache
+from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
-from django.db import transaction
-from datetime import datetime, timedelta
+from django.db.models import OuterRef, Subquery
+from asgiref.sync import sync_to_async
+from datetime import timedelta
+import hashlib
 import json
 import logging
-import math
-from geopy.distance import geodesic
 
-from .models import (
-    Route, RouteStop, BusRoute, LiveRouteTracking, 
-    BusStatus, FavoriteRoute, BusAlert
+from .models import LiveRouteTracking, BusStatus, BusAlert
+from .ingestion import (
+    FixValidationError, FixIgnored, parse_location_fix, new_tracking_defaults,
+    apply_location_fix, apply_status_fix, build_breadcrumb, tracking_payload
 )
+from . import geo
+from .geometry import get_route_geometry, get_route_geometries
+from .live_state import get_store
+from .ping_protocol import PING_CONTENT_TYPE, decode_fix, decode_fixes
+from .alerts import get_engine as get_alert_engine
+from .resolver import resolve_bus, resolve_buses
+from .catalog import get_catalog
+from .conditional import make_validators, live_validators, not_modified, with_validators
+from .spatial import get_live_index
+from .live_stream import RESYNC_SECONDS, get_hub as get_live_hub, sse_frame, bus_channel, route_channel
 from users.models import Bus
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on fixes accepted by the batch ingestion endpoint
+MAX_BATCH_SIZE = 1000
+
+# Nearby-bus search radius limits in km
+DEFAULT_NEARBY_RADIUS_KM = 2.0
+MAX_NEARBY_RADIUS_KM = 50.0
+
+# Seconds a route overview snapshot is shared between viewers
+ROUTE_OVERVIEW_CACHE_TTL = getattr(settings, 'ROUTE_OVERVIEW_CACHE_TTL', 2)
+
 # ====== DRIVER MOBILE APP APIs ======
 
 @csrf_exempt
 @require_http_methods(["POST"])
-def driver_update_location(request):
+async def driver_update_location(request):
     """
     Driver Mobile App: Update bus location in real-time
     Professional GPS tracking with automatic ETA calculation
+    Accepts JSON or, with Content-Type PING_CONTENT_TYPE, one binary record
     """
     try:
-        data = json.loads(request.body)
+        if request.content_type == PING_CONTENT_TYPE:
+            data = decode_fix(request.body)
+        else:
+            data = json.loads(request.body)
+        fix = parse_location_fix(data)
         
-        # Validate required fields
-        required_fields = ['bus_number', 'latitude', 'longitude']
-        for field in required_fields:
-            if field not in data or data[field] is None:
-                return JsonResponse({
-                    'success': False,
-                    'error': f'Missing required field: {field}'
-                }, status=400)
+        # Retried and reordered pings are acknowledged without touching the DB
+        if get_store().is_stale(fix):
+            raise FixIgnored('stale')
         
-        # Get bus and active route
-        bus = get_object_or_404(Bus, bus_number=data['bus_number'])
-        active_bus_route = bus.assigned_routes.filter(is_operational=True).first()
+        # Bus and active route from the resolver cache (queries on misses only)
+        resolved = await sync_to_async(resolve_bus)(fix['bus_number'])
+        active_bus_route = resolved.bus_route
         
         if not active_bus_route:
+            if resolved.bus_id is None:
+                raise Bus.DoesNotExist
             return JsonResponse({
                 'success': False,
-                'error': f'No active route found for bus {data["bus_number"]}'
+                'error': f'No active route found for bus {fix["bus_number"]}'
             }, status=404)
         
-        # Extract GPS data
-        latitude = float(data['latitude'])
-        longitude = float(data['longitude'])
-        speed = float(data.get('speed', 0))
-        bearing = float(data.get('bearing', 0))
-        accuracy = float(data.get('accuracy', 0))
-        altitude = float(data.get('altitude', 0))
-        
-        # Calculate movement and progress
-        current_location = (latitude, longitude)
-        is_moving = speed > 5  # Moving if speed > 5 km/h
-        
-        # Get or create live tracking record
-        with transaction.atomic():
-            tracking, created = LiveRouteTracking.objects.get_or_create(
-                bus_route=active_bus_route,
-                defaults={
-                    'current_latitude': latitude,
-                    'current_longitude': longitude,
-                    'current_speed': speed,
-                    'is_active': True,
-                    'trip_start_time': timezone.now() if is_moving else None
-                }
-            )
-            
-            # Update tracking data
-            old_location = (tracking.current_latitude, tracking.current_longitude)
-            tracking.current_latitude = latitude
-            tracking.current_longitude = longitude
-            tracking.current_speed = speed
-            tracking.bearing = bearing
-            tracking.accuracy = accuracy
-            tracking.altitude = altitude
-            tracking.is_moving = is_moving
-            tracking.engine_status = data.get('engine_on', True)
-            tracking.last_updated = timezone.now()
-            
-            if is_moving:
-                tracking.last_movement = timezone.now()
-                if not tracking.trip_start_time:
-                    tracking.trip_start_time = timezone.now()
-            
-            # Calculate distance and progress
-            if not created:
-                distance_moved = geodesic(old_location, current_location).kilometers
-                tracking.distance_covered += distance_moved
-                
-                # Update average speed
-                if tracking.trip_start_time:
-                    trip_duration_hours = (timezone.now() - tracking.trip_start_time).total_seconds() / 3600
-                    if trip_duration_hours > 0:
-                        tracking.average_speed = tracking.distance_covered / trip_duration_hours
-            
-            # Find nearest stop and calculate progress
-            route_stops = active_bus_route.route.stops.all().order_by('stop_sequence')
-            nearest_stop = None
-            min_distance = float('inf')
-            
-            for stop in route_stops:
-                if stop.latitude and stop.longitude:
-                    stop_location = (stop.latitude, stop.longitude)
-                    distance = geodesic(current_location, stop_location).kilometers
-                    if distance < min_distance:
-                        min_distance = distance
-                        nearest_stop = stop
-            
-            if nearest_stop:
-                tracking.current_stop = nearest_stop
-                # Calculate route progress percentage
-                total_stops = route_stops.count()
-                if total_stops > 0:
-                    tracking.route_progress_percent = (nearest_stop.stop_sequence / total_stops) * 100
-                
-                # Find next stop
-                next_stop = route_stops.filter(
-                    stop_sequence__gt=nearest_stop.stop_sequence
-                ).first()
-                if next_stop:
-                    tracking.next_stop = next_stop
-                    
-                    # Calculate ETA to next stop
-                    if next_stop.latitude and next_stop.longitude:
-                        next_stop_location = (next_stop.latitude, next_stop.longitude)
-                        distance_to_next = geodesic(current_location, next_stop_location).kilometers
-                        tracking.distance_remaining = distance_to_next
-                        
-                        # ETA calculation based on current speed
-                        if speed > 0:
-                            eta_hours = distance_to_next / speed
-                            tracking.estimated_arrival_next_stop = timezone.now() + timedelta(hours=eta_hours)
-            
-            # Calculate delay
-            if active_bus_route.departure_time:
-                scheduled_time = datetime.combine(timezone.now().date(), active_bus_route.departure_time)
-                scheduled_time = timezone.make_aware(scheduled_time)
-                current_delay = (timezone.now() - scheduled_time).total_seconds() / 60
-                tracking.delay_minutes = int(current_delay)
-                tracking.is_delayed = current_delay > 5
-            
-            # Update traffic condition based on speed
-            if speed < 10:
-                tracking.traffic_condition = 'heavy'
-            elif speed < 20:
-                tracking.traffic_condition = 'moderate'
-            else:
-                tracking.traffic_condition = 'light'
-            
-            tracking.save()
-            
-            # Update bus status
-            bus_status, _ = BusStatus.objects.get_or_create(
-                bus=bus,
-                defaults={'current_status': 'active'}
-            )
-            
-            if is_moving:
-                bus_status.current_status = 'active'
-            else:
-                bus_status.current_status = 'idle'
-            
-            bus_status.driver_name = data.get('driver_name', bus_status.driver_name)
-            bus_status.driver_phone = data.get('driver_phone', bus_status.driver_phone)
-            bus_status.passenger_count = data.get('passenger_count', bus_status.passenger_count)
-            bus_status.fuel_level = data.get('fuel_level', bus_status.fuel_level)
-            bus_status.save()
-            
-            # Create delay alert if needed
-            if tracking.is_delayed and tracking.delay_minutes > 10:
-                create_delay_alert(active_bus_route, tracking.delay_minutes)
+        payload, delay_minutes, is_delayed = await sync_to_async(record_location_fix)(
+            active_bus_route, fix
+        )
+        
+        # Raise, update or clear the delay alert on threshold changes only
+        get_alert_engine().observe_delay(active_bus_route, delay_minutes, is_delayed)
+        get_live_index().observe(payload)
+        get_live_hub().publish_position(payload)
         
         # Response data
         response_data = {
             'success': True,
             'message': 'Location updated successfully',
-            'tracking_data': {
-                'bus_number': bus.bus_number,
-                'route_name': active_bus_route.route.route_name,
-                'current_location': {
-                    'latitude': tracking.current_latitude,
-                    'longitude': tracking.current_longitude
-                },
-                'current_stop': tracking.current_stop.stop_name if tracking.current_stop else 'En Route',
-                'next_stop': tracking.next_stop.stop_name if tracking.next_stop else 'Destination',
-                'speed': tracking.current_speed,
-                'progress_percent': tracking.route_progress_percent,
-                'eta_next_stop': tracking.eta_display,
-                'delay_minutes': tracking.delay_minutes,
-                'delay_status': tracking.delay_status,
-                'is_moving': tracking.is_moving,
-                'last_updated': tracking.last_updated.isoformat()
-            }
+            'tracking_data': payload
         }
         
         return JsonResponse(response_data)
         
+    except FixIgnored as e:
+        return JsonResponse(e.as_result())
+    
+    except FixValidationError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+    
     except Bus.DoesNotExist:
         return JsonResponse({
             'success': False,
@@ -229,6 +127,122 @@ def driver_update_location(request):
         }, status=500)
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+async def driver_update_location_batch(request):
+    """
+    Driver Mobile App / Gateway: Update many bus locations in one request
+    Accepts {"fixes": [...]} where each fix has the same fields as
+    driver/location/update/. Buses and routes come from the resolver cache
+    (misses are loaded together), route stops from the route catalog, and the
+    updated rows are written in bulk by the live state flusher.
+    With Content-Type PING_CONTENT_TYPE the body is concatenated binary records.
+    """
+    try:
+        if request.content_type == PING_CONTENT_TYPE:
+            fixes = decode_fixes(request.body)
+        else:
+            data = json.loads(request.body)
+            fixes = data.get('fixes') if isinstance(data, dict) else data
+        
+        if not isinstance(fixes, list) or not fixes:
+            return JsonResponse({
+                'success': False,
+                'error': 'Request body must contain a non-empty "fixes" list'
+            }, status=400)
+        
+        if len(fixes) > MAX_BATCH_SIZE:
+            return JsonResponse({
+                'success': False,
+                'error': f'Batch too large: maximum {MAX_BATCH_SIZE} fixes per request'
+            }, status=400)
+        
+        store = get_store()
+        results = [None] * len(fixes)
+        parsed = []
+        for index, raw_fix in enumerate(fixes):
+            try:
+                fix = parse_location_fix(raw_fix)
+            except FixValidationError as e:
+                results[index] = {'index': index, 'success': False, 'status': 400, 'error': str(e)}
+                continue
+            if store.is_stale(fix):
+                results[index] = {'index': index, **FixIgnored('stale').as_result()}
+                continue
+            parsed.append((index, fix))
+        
+        # Resolve buses and their active routes
+        resolved = await sync_to_async(resolve_buses)({fix['bus_number'] for _, fix in parsed})
+        
+        matched = []
+        for index, fix in parsed:
+            entry = resolved[fix['bus_number']]
+            if entry.bus_id is None:
+                results[index] = {
+                    'index': index, 'success': False, 'status': 404,
+                    'error': f'Bus {fix["bus_number"]} not found'
+                }
+                continue
+            
+            bus_route = entry.bus_route
+            if not bus_route:
+                results[index] = {
+                    'index': index, 'success': False, 'status': 404,
+                    'error': f'No active route found for bus {fix["bus_number"]}'
+                }
+                continue
+            matched.append((index, fix, bus_route.bus, bus_route))
+        
+        accepted, ignored, delays = await sync_to_async(record_location_batch)(matched)
+        
+        # Latest delay per bus route; alerts change on threshold crossings only
+        alert_engine = get_alert_engine()
+        for bus_route, delay_minutes, is_delayed in delays.values():
+            alert_engine.observe_delay(bus_route, delay_minutes, is_delayed)
+        
+        live_index = get_live_index()
+        live_hub = get_live_hub()
+        for index, payload in accepted:
+            live_index.observe(payload)
+            live_hub.publish_position(payload)
+            results[index] = {
+                'index': index,
+                'success': True,
+                'tracking_data': payload
+            }
+        for index, reason in ignored:
+            results[index] = {'index': index, **FixIgnored(reason).as_result()}
+        ignored_count = sum(1 for result in results if result.get('ignored'))
+        
+        return JsonResponse({
+            'success': True,
+            'message': f'Processed {len(fixes)} location fixes',
+            'accepted': len(accepted),
+            'ignored': ignored_count,
+            'rejected': len(fixes) - len(accepted) - ignored_count,
+            'results': results
+        })
+        
+    except FixValidationError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+    
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Invalid JSON data'
+        }, status=400)
+    
+    except Exception as e:
+        logger.error(f"Driver batch location update error: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'error': 'Failed to update locations'
+        }, status=500)
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def driver_update_status(request):
@@ -248,18 +262,23 @@ def driver_update_status(request):
             }, status=400)
         
         bus = get_object_or_404(Bus, bus_number=bus_number)
-        bus_status, _ = BusStatus.objects.get_or_create(bus=bus)
         
-        old_status = bus_status.current_status
-        bus_status.current_status = new_status
+        # Go through the live state so a pending write-behind flush
+        # cannot overwrite this change with an older status
+        store = get_store()
+        bus_status = store.status_for(bus)
         
-        # Update additional info if provided
-        if 'passenger_count' in data:
-            bus_status.passenger_count = data['passenger_count']
-        if 'fuel_level' in data:
-            bus_status.fuel_level = data['fuel_level']
-        
-        bus_status.save()
+        with store.lock:
+            old_status = bus_status.current_status
+            bus_status.current_status = new_status
+            
+            # Update additional info if provided
+            if 'passenger_count' in data:
+                bus_status.passenger_count = data['passenger_count']
+            if 'fuel_level' in data:
+                bus_status.fuel_level = data['fuel_level']
+            
+            bus_status.save()
         
         # Create alert for critical status changes
         if new_status in ['breakdown', 'maintenance'] and old_status != new_status:
@@ -288,26 +307,33 @@ def driver_update_status(request):
 # ====== USER LIVE TRACKING APIs ======
 
 @require_http_methods(["GET"])
-def get_live_bus_location(request, bus_number):
+async def get_live_bus_location(request, bus_number):
     """
     User App: Get real-time bus location and details
     Professional tracking like FindMyTrain
+    Answers 304 Not Modified while the bus has not reported
     """
     try:
-        bus = get_object_or_404(Bus, bus_number=bus_number)
+        resolved = await sync_to_async(resolve_bus)(bus_number)
+        if resolved.bus_id is None:
+            raise Http404
         
         # Get active tracking data
-        active_route = bus.assigned_routes.filter(is_operational=True).first()
+        active_route = resolved.bus_route
         if not active_route:
             return JsonResponse({
                 'success': False,
                 'error': f'Bus {bus_number} is not currently operational'
             }, status=404)
         
-        tracking = LiveRouteTracking.objects.filter(
-            bus_route=active_route,
-            is_active=True
-        ).order_by('-last_updated').first()
+        # Served from the in-memory live state when this process holds it
+        store = get_store()
+        tracking, bus_status = store.peek_active(active_route.id, resolved.bus_id)
+        if tracking is None:
+            tracking = await LiveRouteTracking.objects.filter(
+                bus_route_id=active_route.id,
+                is_active=True
+            ).select_related('current_stop', 'next_stop').order_by('-last_updated').afirst()
         
         if not tracking:
             return JsonResponse({
@@ -316,7 +342,16 @@ def get_live_bus_location(request, bus_number):
             }, status=404)
         
         # Get bus status
-        bus_status = getattr(bus, 'status', None)
+        if bus_status is None:
+            bus_status = await BusStatus.objects.filter(bus_id=resolved.bus_id).afirst()
+        
+        validators = live_validators(('bus', active_route.id), tracking, bus_status)
+        unchanged = not_modified(request, validators)
+        if unchanged is not None:
+            return unchanged
+        
+        bus = active_route.bus
+        operator = await Bus.objects.filter(pk=bus.pk).values_list('user__name', flat=True).afirst()
         
         # Build response
         response_data = {
@@ -324,7 +359,7 @@ def get_live_bus_location(request, bus_number):
             'bus_info': {
                 'bus_number': bus.bus_number,
                 'bus_name': bus.bus_name,
-                'operator': bus.user.name,
+                'operator': operator,
                 'route_name': active_route.route.route_name,
                 'route_type': active_route.route.route_type,
                 'source': active_route.route.source,
@@ -372,9 +407,9 @@ def get_live_bus_location(request, bus_number):
             }
         }
         
-        return JsonResponse(response_data)
+        return with_validators(JsonResponse(response_data), validators)
         
-    except Bus.DoesNotExist:
+    except (Bus.DoesNotExist, Http404):
         return JsonResponse({
             'success': False,
             'error': f'Bus {bus_number} not found'
@@ -389,77 +424,33 @@ def get_live_bus_location(request, bus_number):
 
 
 @require_http_methods(["GET"])
-def get_route_live_overview(request, route_name):
+async def get_route_live_overview(request, route_name):
     """
     User App: Get live overview of all buses on a route
     Similar to train tracking on multiple sections
+    Viewers of the same route share a snapshot rebuilt every
+    ROUTE_OVERVIEW_CACHE_TTL seconds; answers 304 Not Modified while no
+    bus on the route has reported
     """
     try:
-        route = get_object_or_404(Route, route_name__iexact=route_name, is_active=True)
-        
-        # Get all active buses on this route
-        active_bus_routes = route.assigned_buses.filter(is_operational=True)
+        # Route names contain spaces, which memcached keys cannot
+        cache_key = f'route_overview:{hashlib.md5(route_name.lower().encode()).hexdigest()}'
+        cached = await cache.aget(cache_key)
+        if cached is None:
+            catalog = await sync_to_async(get_catalog)()
+            route = catalog.route_by_name(route_name)
+            if route is None:
+                raise Http404
+            cached = await build_route_overview(catalog, route)
+            await cache.aset(cache_key, cached, ROUTE_OVERVIEW_CACHE_TTL)
         
-        buses_data = []
-        for bus_route in active_bus_routes:
-            tracking = LiveRouteTracking.objects.filter(
-                bus_route=bus_route,
-                is_active=True
-            ).order_by('-last_updated').first()
-            
-            if tracking:
-                bus_status = getattr(bus_route.bus, 'status', None)
-                
-                bus_data = {
-                    'bus_number': bus_route.bus.bus_number,
-                    'bus_name': bus_route.bus.bus_name,
-                    'current_location': {
-                        'latitude': tracking.current_latitude,
-                        'longitude': tracking.current_longitude
-                    },
-                    'current_stop': tracking.current_stop.stop_name if tracking.current_stop else 'En Route',
-                    'next_stop': tracking.next_stop.stop_name if tracking.next_stop else 'Destination',
-                    'progress_percent': tracking.route_progress_percent,
-                    'speed': tracking.current_speed,
-                    'delay_minutes': tracking.delay_minutes,
-                    'delay_status': tracking.delay_status,
-                    'is_moving': tracking.is_moving,
-                    'status': bus_status.current_status if bus_status else 'unknown',
-                    'passenger_count': bus_status.passenger_count if bus_status else 0,
-                    'last_updated': tracking.last_updated.isoformat()
-                }
-                
-                buses_data.append(bus_data)
-        
-        # Get route stops for map display
-        stops_data = []
-        for stop in route.stops.all().order_by('stop_sequence'):
-            stops_data.append({
-                'stop_name': stop.stop_name,
-                'sequence': stop.stop_sequence,
-                'latitude': stop.latitude,
-                'longitude': stop.longitude,
-                'is_major_stop': stop.is_major_stop,
-                'estimated_time': stop.estimated_arrival_time.strftime('%H:%M') if stop.estimated_arrival_time else None
-            })
-        
-        return JsonResponse({
-            'success': True,
-            'route_info': {
-                'route_name': route.route_name,
-                'source': route.source,
-                'destination': route.destination,
-                'distance': route.distance,
-                'route_type': route.route_type,
-                'total_stops': len(stops_data)
-            },
-            'active_buses': buses_data,
-            'total_active_buses': len(buses_data),
-            'route_stops': stops_data,
-            'last_updated': timezone.now().isoformat()
-        })
+        overview, validators = cached
+        unchanged = not_modified(request, validators)
+        if unchanged is not None:
+            return unchanged
+        return with_validators(JsonResponse(overview), validators)
         
-    except Route.DoesNotExist:
+    except Http404:
         return JsonResponse({
             'success': False,
             'error': f'Route "{route_name}" not found'
@@ -473,23 +464,321 @@ def get_route_live_overview(request, route_name):
         }, status=500)
 
 
+@require_http_methods(["GET"])
+async def get_nearby_buses(request):
+    """
+    User App: Live buses within a radius of a point, nearest first
+    Query parameters: lat, lng, radius (km, default 2), limit (default 50)
+    """
+    try:
+        try:
+            latitude = float(request.GET['lat'])
+            longitude = float(request.GET['lng'])
+            radius_km = float(request.GET.get('radius', DEFAULT_NEARBY_RADIUS_KM))
+            limit = int(request.GET.get('limit', 50))
+        except (KeyError, ValueError):
+            return JsonResponse({
+                'success': False,
+                'error': 'lat and lng are required; radius and limit must be numbers'
+            }, status=400)
+        
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return JsonResponse({
+                'success': False,
+                'error': 'Coordinates out of range'
+            }, status=400)
+        if not 0 < radius_km <= MAX_NEARBY_RADIUS_KM or limit < 1:
+            return JsonResponse({
+                'success': False,
+                'error': f'radius must be between 0 and {MAX_NEARBY_RADIUS_KM:g} km and limit positive'
+            }, status=400)
+        
+        live_index = get_live_index()
+        await sync_to_async(live_index.refresh)()
+        buses = live_index.nearby(latitude, longitude, radius_km, limit)
+        for bus in buses:
+            bus['last_updated'] = bus['last_updated'].isoformat()
+        
+        return JsonResponse({
+            'success': True,
+            'center': {'latitude': latitude, 'longitude': longitude},
+            'radius_km': radius_km,
+            'buses': buses,
+            'total': len(buses)
+        })
+        
+    except Exception as e:
+        logger.error(f"Nearby buses error: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'error': 'Failed to fetch nearby buses'
+        }, status=500)
+
+
+@require_http_methods(["GET"])
+async def stream_bus_location(request, bus_number):
+    """
+    User App: Server-sent events stream of one bus, instead of polling
+    Sends the live/<bus_number>/ payload as a 'snapshot' event, then a
+    'position' event with the changed fields of every accepted fix
+    """
+    return await live_stream_response(
+        request, bus_channel(bus_number), lambda: get_live_bus_location(request, bus_number)
+    )
+
+
+@require_http_methods(["GET"])
+async def stream_route_overview(request, route_name):
+    """
+    User App: Server-sent events stream of every bus on a route
+    Sends the live/route/<route_name>/ payload as a 'snapshot' event, then
+    'position' events as for a single bus
+    """
+    return await live_stream_response(
+        request, route_channel(route_name), lambda: get_route_live_overview(request, route_name)
+    )
+
+
 # ====== HELPER FUNCTIONS ======
 
-def create_delay_alert(bus_route, delay_minutes):
-    """Create delay alert for users"""
-    try:
-        alert = BusAlert.objects.create(
-            alert_type='delay',
-            priority='medium' if delay_minutes < 20 else 'high',
-            title=f'Bus {bus_route.bus.bus_number} Delayed',
-            message=f'Bus {bus_route.bus.bus_number} on {bus_route.route.route_name} is delayed by {delay_minutes} minutes.',
-            bus_route=bus_route,
-            route=bus_route.route,
-            expires_at=timezone.now() + timedelta(hours=2)
+async def live_stream_response(request, channel, snapshot):
+    """
+    Subscribe to a live hub channel and stream it as server-sent events.
+    snapshot() returns the polling view's JsonResponse; errors from it are
+    returned as they are instead of opening the stream.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({
+            'success': False,
+            'error': 'Live streams are only served through the ASGI application'
+        }, status=501)
+    
+    hub = get_live_hub()
+    # Subscribe first so no fix accepted while the snapshot is built is missed
+    subscription = hub.subscribe(channel)
+    response = await snapshot()
+    if response.status_code != 200:
+        hub.unsubscribe(subscription)
+        return response
+    
+    async def events(first_snapshot):
+        try:
+            yield b'retry: 3000\n' + sse_frame('snapshot', first_snapshot)
+            while True:
+                frame = await subscription.next_frame(RESYNC_SECONDS)
+                if frame is None:
+                    frame = sse_frame('snapshot', (await snapshot()).content)
+                yield frame
+        finally:
+            hub.unsubscribe(subscription)
+    
+    stream = StreamingHttpResponse(events(response.content), content_type='text/event-stream')
+    stream['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    stream['X-Accel-Buffering'] = 'no'
+    return stream
+
+
+async def build_route_overview(catalog, route):
+    """
+    Live overview payload of a catalog route in at most two queries: bus
+    routes with their bus and status, and the latest active tracking of
+    the buses this process does not hold in memory. Returns (overview,
+    Validators) of the catalog version and the tracking and status rows used.
+    """
+    latest_tracking = LiveRouteTracking.objects.filter(
+        bus_route=OuterRef('pk'), is_active=True
+    ).order_by('-last_updated').values('pk')[:1]
+    bus_routes = [
+        bus_route async for bus_route in route.assigned_buses.filter(
+            is_operational=True
+        ).select_related('bus', 'bus__status').annotate(
+            latest_tracking_id=Subquery(latest_tracking)
+        ).order_by('id')
+    ]
+    
+    # Served from the in-memory live state when this process holds it
+    store = get_store()
+    live = {}
+    for bus_route in bus_routes:
+        tracking, bus_status = store.peek_active(bus_route.id, bus_route.bus_id)
+        if tracking is not None:
+            live[bus_route.id] = (tracking, bus_status)
+    
+    missing = [
+        bus_route.latest_tracking_id for bus_route in bus_routes
+        if bus_route.id not in live and bus_route.latest_tracking_id is not None
+    ]
+    stored = {}
+    if missing:
+        stored = {
+            tracking.bus_route_id: tracking
+            async for tracking in LiveRouteTracking.objects.filter(
+                pk__in=missing
+            ).select_related('current_stop', 'next_stop')
+        }
+    
+    buses_data = []
+    rows = []
+    modified = [route.updated_at]
+    for bus_route in bus_routes:
+        tracking, bus_status = live.get(bus_route.id, (stored.get(bus_route.id), None))
+        if tracking is None:
+            continue
+        if bus_status is None:
+            bus_status = getattr(bus_route.bus, 'status', None)
+        rows.append((bus_route.id, tracking.pk, bus_status.pk if bus_status else None))
+        modified += [tracking.last_updated, bus_status.updated_at if bus_status else None]
+        
+        buses_data.append({
+            'bus_number': bus_route.bus.bus_number,
+            'bus_name': bus_route.bus.bus_name,
+            'current_location': {
+                'latitude': tracking.current_latitude,
+                'longitude': tracking.current_longitude
+            },
+            'current_stop': tracking.current_stop.stop_name if tracking.current_stop else 'En Route',
+            'next_stop': tracking.next_stop.stop_name if tracking.next_stop else 'Destination',
+            'progress_percent': tracking.route_progress_percent,
+            'speed': tracking.current_speed,
+            'delay_minutes': tracking.delay_minutes,
+            'delay_status': tracking.delay_status,
+            'is_moving': tracking.is_moving,
+            'status': bus_status.current_status if bus_status else 'unknown',
+            'passenger_count': bus_status.passenger_count if bus_status else 0,
+            'last_updated': tracking.last_updated.isoformat()
+        })
+    
+    # Get route stops for map display
+    stops_data = []
+    for stop in catalog.stops_of(route.route_id):
+        stops_data.append({
+            'stop_name': stop.stop_name,
+            'sequence': stop.stop_sequence,
+            'latitude': stop.latitude,
+            'longitude': stop.longitude,
+            'is_major_stop': stop.is_major_stop,
+            'estimated_time': stop.estimated_arrival_time.strftime('%H:%M') if stop.estimated_arrival_time else None
+        })
+    
+    overview = {
+        'success': True,
+        'route_info': {
+            'route_name': route.route_name,
+            'source': route.source,
+            'destination': route.destination,
+            'distance': route.distance,
+            'route_type': route.route_type,
+            'total_stops': len(stops_data)
+        },
+        'active_buses': buses_data,
+        'total_active_buses': len(buses_data),
+        'route_stops': stops_data,
+        'last_updated': timezone.now().isoformat()
+    }
+    return overview, make_validators(('route', route.route_id, catalog.version, rows), modified)
+
+
+def record_location_fix(bus_route, fix):
+    """
+    Apply one fix to the in-memory live state; the write-behind flusher
+    persists it. Returns (payload, delay_minutes, is_delayed); raises
+    FixIgnored if a newer fix for the bus has been applied meanwhile or the
+    GPS filter rejects the fix.
+    Touches the database on cache misses only, so async callers run it
+    through sync_to_async.
+    """
+    now = timezone.now()
+    route_geometry = get_route_geometry(bus_route.route_id)
+    
+    store = get_store()
+    tracking, created = store.tracking_for(bus_route, new_tracking_defaults(fix, now))
+    bus_status = store.status_for(bus_route.bus)
+    with store.lock:
+        if not store.advance_mark(fix):
+            raise FixIgnored('stale')
+        fix = store.filter_fix(fix, received_at=now)
+        if fix is None:
+            raise FixIgnored('outlier')
+        apply_location_fix(tracking, created, bus_route, route_geometry, fix, now)
+        apply_status_fix(bus_status, fix, now)
+        store.mark_dirty(
+            trackings=[tracking],
+            statuses=[bus_status],
+            breadcrumbs=[build_breadcrumb(tracking, bus_route, now)]
         )
-        logger.info(f"Delay alert created: {alert.title}")
-    except Exception as e:
-        logger.error(f"Failed to create delay alert: {str(e)}")
+        payload = tracking_payload(bus_route.bus.bus_number, bus_route, tracking)
+        return payload, tracking.delay_minutes, tracking.is_delayed
+
+
+def record_location_batch(matched):
+    """
+    Apply a batch of (index, fix, bus, bus_route) to the live state.
+    Returns ([(index, payload)], [(index, ignore reason)], {bus_route_id: (bus_route, delay_minutes, is_delayed)}).
+    Stale fixes, including older fixes later in the same batch, and GPS
+    outliers are ignored. The first fix of a bus without device_ts is timed
+    by the receive time; its later untimed fixes were buffered together and
+    cannot be timed.
+    """
+    now = timezone.now()
+    
+    # Route geometry for every route in the batch, from the route catalog
+    geometries = get_route_geometries({bus_route.route_id for _, _, _, bus_route in matched})
+    
+    # Live state rows; misses are loaded with one query each
+    store = get_store()
+    defaults = {}
+    for _, fix, _, bus_route in matched:
+        defaults.setdefault(bus_route.id, new_tracking_defaults(fix, now))
+    trackings = store.trackings_for({br.id: br for _, _, _, br in matched}.values(), defaults)
+    statuses = store.statuses_for({bus.id: bus for _, _, bus, _ in matched}.values())
+    
+    touched_trackings = {}
+    touched_statuses = {}
+    breadcrumbs = []
+    delays = {}
+    accepted = []
+    ignored = []
+    untimed_buses = set()
+    
+    with store.lock:
+        for index, fix, bus, bus_route in matched:
+            if not store.advance_mark(fix):
+                ignored.append((index, 'stale'))
+                continue
+            received_at = None
+            if fix['device_ts'] is None and bus.id not in untimed_buses:
+                untimed_buses.add(bus.id)
+                received_at = now
+            fix = store.filter_fix(fix, received_at=received_at)
+            if fix is None:
+                ignored.append((index, 'outlier'))
+                continue
+            tracking, created = trackings[bus_route.id]
+            # Only the first fix of a newly created row counts as created
+            trackings[bus_route.id] = (tracking, False)
+            apply_location_fix(
+                tracking, created, bus_route, geometries[bus_route.route_id], fix, now
+            )
+            touched_trackings[bus_route.id] = tracking
+            breadcrumbs.append(build_breadcrumb(tracking, bus_route, now))
+            
+            bus_status = statuses[bus.id]
+            apply_status_fix(bus_status, fix, now)
+            touched_statuses[bus.id] = bus_status
+            
+            delays[bus_route.id] = (bus_route, tracking.delay_minutes, tracking.is_delayed)
+            accepted.append(
+                (index, tracking_payload(bus.bus_number, bus_route, tracking))
+            )
+        
+        store.mark_dirty(
+            trackings=touched_trackings.values(),
+            statuses=touched_statuses.values(),
+            breadcrumbs=breadcrumbs
+        )
+    
+    return accepted, ignored, delays
 
 
 def create_status_alert(bus, status):
@@ -515,7 +804,7 @@ def create_status_alert(bus, status):
 
 def calculate_eta_with_traffic(current_location, destination_location, current_speed, traffic_condition):
     """Calculate ETA considering traffic conditions"""
-    distance = geodesic(current_location, destination_location).kilometers
+    distance = geo.point_distance_km(*current_location, *destination_location)
     
     # Traffic multipliers
     traffic_multipliers = {
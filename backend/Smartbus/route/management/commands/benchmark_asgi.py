@@ -0,0 +1,259 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+import asyncio
+import io
+import json
+import random
+import sys
+import threading
+import time
+
+from route.models import BusRoute
+
+
+class SlowInput(io.BytesIO):
+    """wsgi.input whose body arrives after the client's upload latency, like a phone on a mobile network"""
+
+    def __init__(self, body, latency):
+        super().__init__(body)
+        self.latency = latency
+        self.waited = False
+
+    def read(self, *args):
+        if not self.waited:
+            self.waited = True
+            time.sleep(self.latency)
+        return super().read(*args)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark driver location updates served through Smartbus/wsgi.py (thread pool) '
+        'and Smartbus/asgi.py (event loop) with many slow concurrent clients. '
+        'Posts real pings for the operational buses in the configured database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=400,
+            help='Concurrent driver connections (default: 400)',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=3,
+            help='Location updates sent by each client (default: 3)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds between the updates of one client (default: 5)',
+        )
+        parser.add_argument(
+            '--latency-ms',
+            type=float,
+            default=1000.0,
+            help='Time for each request body to arrive from the client (default: 1000)',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=32,
+            help='WSGI worker threads (default: 32)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the simulated fixes',
+        )
+
+    def handle(self, *args, **options):
+        bus_routes = list(BusRoute.objects.filter(is_operational=True).select_related('bus'))
+        if not bus_routes:
+            raise CommandError('No operational buses found. Run add_sample_routes first.')
+
+        rng = random.Random(options['seed'])
+        path = reverse('route:driver_update_location')
+        latency = options['latency_ms'] / 1000
+        interval = options['interval']
+        # Clients connect at random points of the first interval rather than
+        # all in the same instant
+        clients = [
+            (
+                rng.uniform(0, interval),
+                [self._fix_body(rng, rng.choice(bus_routes)) for _ in range(options['requests'])]
+            )
+            for _ in range(options['clients'])
+        ]
+
+        self.stdout.write(self.style.HTTP_INFO(
+            f'🚌 {options["clients"]} clients x {options["requests"]} updates every {interval:g}s, '
+            f'{options["latency_ms"]:.0f} ms upload latency, {len(bus_routes)} buses'
+        ))
+        self.stdout.write(f'Offered load: {options["clients"] / interval:.1f} req/s')
+
+        from Smartbus.wsgi import application as wsgi_application
+        from Smartbus.asgi import application as asgi_application
+
+        results = {}
+        results['wsgi'] = self._measure(
+            lambda: self._run_wsgi(wsgi_application, path, clients, interval, latency, options['threads'])
+        )
+        results['asgi'] = self._measure(
+            lambda: asyncio.run(self._run_asgi(asgi_application, path, clients, interval, latency))
+        )
+
+        for name, (seconds, durations, errors, peak_threads) in results.items():
+            durations.sort()
+            label = f'wsgi ({options["threads"]} threads)' if name == 'wsgi' else 'asgi'
+            self.stdout.write(
+                f'  {label:<18} {len(durations) / seconds:8.1f} req/s  '
+                f'p50 {durations[len(durations) // 2] * 1000:7.1f} ms  '
+                f'p99 {durations[int(len(durations) * 0.99)] * 1000:7.1f} ms  '
+                f'errors {errors}  peak threads {peak_threads}'
+            )
+
+        speedup = results['wsgi'][0] / results['asgi'][0]
+        self.stdout.write(f'ASGI throughput: {speedup:.1f}x WSGI')
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark completed'))
+
+    def _fix_body(self, rng, bus_route):
+        return json.dumps({
+            'bus_number': bus_route.bus.bus_number,
+            # Within a few tens of meters so the GPS filter accepts every fix
+            'latitude': 19.0 + rng.uniform(0, 0.0003),
+            'longitude': 73.0 + rng.uniform(0, 0.0003),
+            'speed': rng.uniform(0, 60),
+            'bearing': rng.uniform(0, 360),
+        }).encode()
+
+    def _measure(self, run):
+        """Run one server model; returns (seconds, per-request durations, errors, peak thread count)"""
+        peak = [threading.active_count()]
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(0.01):
+                peak[0] = max(peak[0], threading.active_count())
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        start = time.perf_counter()
+        durations, errors = run()
+        seconds = time.perf_counter() - start
+        done.set()
+        sampler.join()
+        return seconds, durations, errors, peak[0]
+
+    # ----- WSGI: every in-flight request holds a worker thread, including while its body uploads -----
+
+    def _run_wsgi(self, application, path, clients, interval, latency, threads):
+        durations = []
+        errors = [0]
+
+        def call(body):
+            environ = {
+                'REQUEST_METHOD': 'POST',
+                'PATH_INFO': path,
+                'SCRIPT_NAME': '',
+                'QUERY_STRING': '',
+                'CONTENT_TYPE': 'application/json',
+                'CONTENT_LENGTH': str(len(body)),
+                'SERVER_NAME': 'localhost',
+                'SERVER_PORT': '80',
+                'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': 'localhost',
+                'wsgi.version': (1, 0),
+                'wsgi.url_scheme': 'http',
+                'wsgi.input': SlowInput(body, latency),
+                'wsgi.errors': sys.stderr,
+                'wsgi.multithread': True,
+                'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+            status = []
+            response = application(environ, lambda s, headers, exc_info=None: status.append(s))
+            b''.join(response)
+            response.close()
+            return status[0].startswith('200')
+
+        async def client(pool, delay, client_bodies):
+            loop = asyncio.get_running_loop()
+            await asyncio.sleep(delay)
+            elapsed = interval
+            for body in client_bodies:
+                await asyncio.sleep(max(0.0, interval - elapsed))
+                start = time.perf_counter()
+                if not await loop.run_in_executor(pool, call, body):
+                    errors[0] += 1
+                elapsed = time.perf_counter() - start
+                durations.append(elapsed)
+
+        async def run_all():
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                await asyncio.gather(*(client(pool, *client_args) for client_args in clients))
+
+        asyncio.run(run_all())
+        return durations, errors[0]
+
+    # ----- ASGI: waiting for a body is an await, no thread is held -----
+
+    async def _run_asgi(self, application, path, clients, interval, latency):
+        durations = []
+        errors = [0]
+
+        async def call(body):
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'POST',
+                'scheme': 'http',
+                'path': path,
+                'raw_path': path.encode(),
+                'root_path': '',
+                'query_string': b'',
+                'headers': [
+                    (b'host', b'localhost'),
+                    (b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode()),
+                ],
+                'client': ('127.0.0.1', 0),
+                'server': ('localhost', 80),
+            }
+            messages = iter([{'type': 'http.request', 'body': body, 'more_body': False}])
+            status = []
+
+            async def receive():
+                message = next(messages, None)
+                if message is None:
+                    # Client stays connected until the response is sent
+                    await asyncio.Event().wait()
+                await asyncio.sleep(latency)
+                return message
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            await application(scope, receive, send)
+            return status[0] == 200
+
+        async def client(delay, client_bodies):
+            await asyncio.sleep(delay)
+            elapsed = interval
+            for body in client_bodies:
+                await asyncio.sleep(max(0.0, interval - elapsed))
+                start = time.perf_counter()
+                if not await call(body):
+                    errors[0] += 1
+                elapsed = time.perf_counter() - start
+                durations.append(elapsed)
+
+        await asyncio.gather(*(client(*client_args) for client_args in clients))
+        return durations, errors[0]
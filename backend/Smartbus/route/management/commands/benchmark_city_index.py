@@ -0,0 +1,152 @@
+from django.core.management.base import BaseCommand
+import difflib
+import numpy as np
+import time
+
+from route.cities import CityIndex
+
+SYLLABLES = [
+    'pur', 'abad', 'nagar', 'gar', 'kot', 'ganj', 'wada', 'pet', 'ur', 'gaon', 'ra', 'ma', 'ka', 'la',
+    'sha', 'va', 'dha', 'ni', 'ri', 'bha', 'che', 'jai', 'hal', 'del', 'mum', 'ban', 'ko', 'tri', 'su',
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the city index against the linear city validation scan on synthetic city names'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cities',
+            type=int,
+            default=5000,
+            help='Synthetic city names (default: 5000)',
+        )
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=500,
+            help='Validated inputs (default: 500)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the synthetic names and inputs',
+        )
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        cities = self._simulate_cities(rng, options['cities'])
+        queries = self._simulate_queries(rng, cities, options['queries'])
+
+        self.stdout.write(self.style.HTTP_INFO(
+            f'🏙️ {len(cities)} synthetic cities, {len(queries)} inputs '
+            f'(exact, prefixes, substrings, typos, unknown)'
+        ))
+
+        start = time.perf_counter()
+        index = CityIndex(cities)
+        self.stdout.write(f'Index build: {(time.perf_counter() - start) * 1000:.1f} ms')
+
+        start = time.perf_counter()
+        scanned = [linear_validate(query, cities) for query in queries]
+        scan_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed = [index.validate(query) for query in queries]
+        index_seconds = time.perf_counter() - start
+
+        for name, seconds in (('linear scan', scan_seconds), ('city index', index_seconds)):
+            self.stdout.write(
+                f'  {name:<11} {seconds / len(queries) * 1e6:9.1f} µs/input  '
+                f'{scan_seconds / seconds:6.1f}x vs linear scan'
+            )
+        different = sum(
+            1 for expected, found in zip(scanned, indexed)
+            if (expected['valid'], expected['matched_name']) != (found['valid'], found['matched_name'])
+        )
+        self.stdout.write(f'Inputs resolved differently: {different}')
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark completed'))
+
+    def _simulate_cities(self, rng, count):
+        cities = set()
+        while len(cities) < count:
+            parts = rng.choice(SYLLABLES, rng.integers(2, 5))
+            cities.add(''.join(parts).title())
+        return sorted(cities)
+
+    def _simulate_queries(self, rng, cities, count):
+        queries = []
+        for kind in rng.integers(0, 5, count):
+            city = cities[rng.integers(len(cities))].lower()
+            if kind == 0:
+                queries.append(city)
+            elif kind == 1:
+                queries.append(city[:max(3, len(city) // 2)])
+            elif kind == 2:
+                queries.append(city[1:])
+            elif kind == 3:
+                position = rng.integers(len(city) - 1)
+                queries.append(city[:position] + city[position + 1] + city[position] + city[position + 2:])
+            else:
+                queries.append(''.join(rng.choice(list('qxzvwk'), 7)))
+        return queries
+
+
+def linear_validate(city_input, available_cities):
+    """search_routes' city validation before CityIndex: a scan of every city"""
+    city_input = city_input.strip().title()
+    
+    # Check minimum length - reject very short inputs like "s", "k", etc.
+    if len(city_input) < 3:
+        return {
+            'valid': False,
+            'matched_name': None,
+            'suggestions': available_cities[:5]  # Show some popular cities
+        }
+    
+    # Exact match
+    for city in available_cities:
+        if city.lower() == city_input.lower():
+            return {
+                'valid': True,
+                'matched_name': city,
+                'suggestions': []
+            }
+    
+    # Strict partial match - only if input is significant portion of city name
+    strict_partial_matches = []
+    for city in available_cities:
+        city_lower = city.lower()
+        input_lower = city_input.lower()
+        
+        # Only match if:
+        # 1. Input is at least 3 characters
+        # 2. Input starts the city name, OR
+        # 3. Input is at least 50% of city name length
+        if (city_lower.startswith(input_lower) and len(input_lower) >= 3) or \
+           (input_lower in city_lower and len(input_lower) >= len(city) * 0.5):
+            strict_partial_matches.append(city)
+    
+    # Only auto-select if exactly one strict match found
+    if len(strict_partial_matches) == 1:
+        return {
+            'valid': True,
+            'matched_name': strict_partial_matches[0],
+            'suggestions': []
+        }
+    
+    # If multiple strict matches or none, show fuzzy suggestions
+    if strict_partial_matches:
+        suggestions = strict_partial_matches[:3]
+    else:
+        # Fuzzy matching using difflib with higher cutoff
+        suggestions = difflib.get_close_matches(
+            city_input, available_cities, n=3, cutoff=0.7
+        )
+    
+    return {
+        'valid': False,
+        'matched_name': None,
+        'suggestions': suggestions
+    }
@@ -0,0 +1,107 @@
+from django.core.management.base import BaseCommand
+from geopy.distance import geodesic
+import numpy as np
+import time
+
+from route import geo
+from route.management.commands.add_sample_routes import SAMPLE_ROUTES
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the vectorized geo engine against geopy.geodesic on the sample routes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pings',
+            type=int,
+            default=2000,
+            help='Simulated GPS fixes per route (default: 2000)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the simulated fixes',
+        )
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        pings_per_route = options['pings']
+
+        self.stdout.write(self.style.HTTP_INFO(
+            f'📐 Benchmarking nearest-stop lookup on {len(SAMPLE_ROUTES)} sample routes, '
+            f'{pings_per_route} fixes each'
+        ))
+
+        totals = {'geodesic': 0.0, 'haversine': 0.0, 'pairwise': 0.0}
+        total_pings = 0
+        mismatches = 0
+        max_error = 0.0
+
+        for route in SAMPLE_ROUTES:
+            stop_lats = np.array([stop['lat'] for stop in route['stops']])
+            stop_lngs = np.array([stop['lng'] for stop in route['stops']])
+            ping_lats, ping_lngs = self._simulate_pings(rng, stop_lats, stop_lngs, pings_per_route)
+
+            # Current path: geodesic() per stop per ping
+            start = time.perf_counter()
+            geodesic_nearest = []
+            geodesic_distances = []
+            for lat, lng in zip(ping_lats.tolist(), ping_lngs.tolist()):
+                best_index, best_distance = None, float('inf')
+                for index, (stop_lat, stop_lng) in enumerate(zip(stop_lats.tolist(), stop_lngs.tolist())):
+                    distance = geodesic((lat, lng), (stop_lat, stop_lng)).kilometers
+                    if distance < best_distance:
+                        best_index, best_distance = index, distance
+                geodesic_nearest.append(best_index)
+                geodesic_distances.append(best_distance)
+            totals['geodesic'] += time.perf_counter() - start
+
+            # New path: one vectorized call per ping
+            start = time.perf_counter()
+            haversine_nearest = []
+            haversine_distances = []
+            for lat, lng in zip(ping_lats.tolist(), ping_lngs.tolist()):
+                index, distance = geo.nearest_index(lat, lng, stop_lats, stop_lngs)
+                haversine_nearest.append(index)
+                haversine_distances.append(distance)
+            totals['haversine'] += time.perf_counter() - start
+
+            # Batched path: all pings of the route against all stops at once
+            start = time.perf_counter()
+            matrix = geo.pairwise_distances_km(ping_lats, ping_lngs, stop_lats, stop_lngs)
+            matrix.argmin(axis=1)
+            totals['pairwise'] += time.perf_counter() - start
+
+            mismatches += sum(
+                1 for expected, actual in zip(geodesic_nearest, haversine_nearest) if expected != actual
+            )
+            expected = np.array(geodesic_distances)
+            actual = np.array(haversine_distances)
+            significant = expected > 0.05
+            if significant.any():
+                max_error = max(
+                    max_error,
+                    float(np.max(np.abs(actual[significant] - expected[significant]) / expected[significant]))
+                )
+            total_pings += len(ping_lats)
+
+        self.stdout.write(f'Fixes processed: {total_pings}')
+        for name, seconds in totals.items():
+            self.stdout.write(
+                f'  {name:<10} {seconds * 1000:9.1f} ms total  '
+                f'{seconds / total_pings * 1e6:8.2f} µs/fix  '
+                f'{totals["geodesic"] / seconds:7.1f}x vs geodesic'
+            )
+        self.stdout.write(f'Nearest-stop disagreements: {mismatches} of {total_pings}')
+        self.stdout.write(f'Max relative distance error vs geodesic: {max_error * 100:.3f}%')
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark completed'))
+
+    def _simulate_pings(self, rng, stop_lats, stop_lngs, count):
+        """Random fixes along the straight segments between consecutive stops, with GPS noise"""
+        segments = rng.integers(0, len(stop_lats) - 1, size=count)
+        fractions = rng.random(count)
+        lats = stop_lats[segments] + (stop_lats[segments + 1] - stop_lats[segments]) * fractions
+        lngs = stop_lngs[segments] + (stop_lngs[segments + 1] - stop_lngs[segments]) * fractions
+        noise = rng.normal(0.0, 0.002, size=(2, count))
+        return lats + noise[0], lngs + noise[1]
@@ -0,0 +1,99 @@
+from django.core.management.base import BaseCommand
+import json
+import random
+import time
+
+from route.ingestion import parse_location_fix
+from route.ping_protocol import encode_fix, encode_fixes, decode_fix, decode_fixes
+
+
+class Command(BaseCommand):
+    help = 'Compare payload size and parse time of the JSON and binary driver ping encodings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fixes',
+            type=int,
+            default=20000,
+            help='Simulated GPS fixes (default: 20000)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Fixes per batch request (default: 100)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the simulated fixes',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        fixes = [self._simulate_fix(rng) for _ in range(options['fixes'])]
+        batch_size = options['batch_size']
+        batches = [fixes[start:start + batch_size] for start in range(0, len(fixes), batch_size)]
+
+        self.stdout.write(self.style.HTTP_INFO(
+            f'📦 Encoding {len(fixes)} fixes, batches of {batch_size}'
+        ))
+
+        json_single = [json.dumps(fix).encode() for fix in fixes]
+        binary_single = [encode_fix(fix) for fix in fixes]
+        json_batches = [json.dumps({'fixes': batch}).encode() for batch in batches]
+        binary_batches = [encode_fixes(batch) for batch in batches]
+
+        cases = [
+            ('json', json_single, lambda body: [parse_location_fix(json.loads(body))]),
+            ('binary', binary_single, lambda body: [parse_location_fix(decode_fix(body))]),
+            ('json batch', json_batches, lambda body: [parse_location_fix(fix) for fix in json.loads(body)['fixes']]),
+            ('binary batch', binary_batches, lambda body: [parse_location_fix(fix) for fix in decode_fixes(body)]),
+        ]
+
+        results = {}
+        for name, bodies, parse in cases:
+            start = time.perf_counter()
+            parsed = []
+            for body in bodies:
+                parsed.extend(parse(body))
+            seconds = time.perf_counter() - start
+            results[name] = (sum(len(body) for body in bodies), seconds, parsed)
+
+        json_bytes, json_seconds, _ = results['json']
+        for name, (total_bytes, seconds, _) in results.items():
+            self.stdout.write(
+                f'  {name:<13} {total_bytes / len(fixes):7.1f} bytes/fix ({total_bytes / json_bytes * 100:5.1f}%)  '
+                f'{seconds / len(fixes) * 1e6:6.2f} µs/fix  {json_seconds / seconds:5.1f}x vs json'
+            )
+
+        # float32 and 1e-7 degree fields round the values; report how much
+        max_coordinate_error = 0.0
+        max_speed_error = 0.0
+        for expected, actual in zip(results['json'][2], results['binary'][2]):
+            max_coordinate_error = max(
+                max_coordinate_error,
+                abs(expected['latitude'] - actual['latitude']),
+                abs(expected['longitude'] - actual['longitude']),
+            )
+            max_speed_error = max(max_speed_error, abs(expected['speed'] - actual['speed']))
+        self.stdout.write(f'Max coordinate difference: {max_coordinate_error:.1e} degrees')
+        self.stdout.write(f'Max speed difference: {max_speed_error:.1e} km/h')
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark completed'))
+
+    def _simulate_fix(self, rng):
+        """A fix as a driver app sends it every few seconds"""
+        fix = {
+            'bus_number': f'MH{rng.randint(1, 50):02d}AB{rng.randint(0, 9999):04d}',
+            'latitude': round(rng.uniform(8.0, 32.0), 7),
+            'longitude': round(rng.uniform(68.0, 92.0), 7),
+            'speed': round(rng.uniform(0, 80), 1),
+            'bearing': round(rng.uniform(0, 360), 1),
+            'accuracy': round(rng.uniform(3, 25), 1),
+            'altitude': round(rng.uniform(0, 900), 1),
+            'engine_on': True,
+        }
+        if rng.random() < 0.2:
+            fix['passenger_count'] = rng.randint(0, 60)
+        return fix
@@ -0,0 +1,119 @@
+from django.core.management.base import BaseCommand
+import numpy as np
+import time
+
+from route import geo
+from route.spatial import StopIndex
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the nearest-stop grid index against a vectorized full scan on synthetic stops'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stops',
+            type=int,
+            default=100000,
+            help='Synthetic stops (default: 100000)',
+        )
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=2000,
+            help='Nearest-stop queries (default: 2000)',
+        )
+        parser.add_argument(
+            '--k',
+            type=int,
+            default=10,
+            help='Stops returned per query (default: 10)',
+        )
+        parser.add_argument(
+            '--radius',
+            type=float,
+            default=25.0,
+            help='Search radius in km (default: 25)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the synthetic stops',
+        )
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        k = options['k']
+        radius_km = options['radius']
+        latitudes, longitudes = self._simulate_stops(rng, options['stops'])
+        rows = [
+            (f'Stop {index}', latitude, longitude, index // 20, f'Route {index // 20}', index % 20 + 1)
+            for index, (latitude, longitude) in enumerate(zip(latitudes.tolist(), longitudes.tolist()))
+        ]
+
+        self.stdout.write(self.style.HTTP_INFO(
+            f'🗺️ {len(rows)} synthetic stops, {options["queries"]} queries, '
+            f'k={k} within {radius_km:g} km'
+        ))
+
+        start = time.perf_counter()
+        index = StopIndex(rows)
+        build_seconds = time.perf_counter() - start
+        self.stdout.write(f'Index build: {build_seconds:.2f}s for {len(index.places)} places')
+
+        # Half the queries near existing stops (towns), half anywhere in the area
+        picks = rng.integers(0, len(latitudes), options['queries'] // 2)
+        query_latitudes = np.concatenate([
+            latitudes[picks] + rng.normal(0, 0.02, len(picks)),
+            rng.uniform(8.0, 32.0, options['queries'] - len(picks)),
+        ])
+        query_longitudes = np.concatenate([
+            longitudes[picks] + rng.normal(0, 0.02, len(picks)),
+            rng.uniform(68.0, 92.0, options['queries'] - len(picks)),
+        ])
+        queries = list(zip(query_latitudes.tolist(), query_longitudes.tolist()))
+
+        place_latitudes = np.array([place['latitude'] for place in index.places])
+        place_longitudes = np.array([place['longitude'] for place in index.places])
+
+        start = time.perf_counter()
+        scanned = []
+        for latitude, longitude in queries:
+            distances = geo.distances_to_points_km(latitude, longitude, place_latitudes, place_longitudes)
+            nearest = np.argpartition(distances, k)[:k] if len(distances) > k else np.arange(len(distances))
+            nearest = nearest[distances[nearest] <= radius_km]
+            scanned.append(sorted(distances[nearest].tolist()))
+        scan_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed = [index.grid.nearest(latitude, longitude, k, radius_km) for latitude, longitude in queries]
+        index_seconds = time.perf_counter() - start
+
+        mismatches = sum(
+            1 for expected, found in zip(scanned, indexed)
+            if not np.allclose(expected, [distance for distance, _ in found])
+        )
+        for name, seconds in (('full scan', scan_seconds), ('grid index', index_seconds)):
+            self.stdout.write(
+                f'  {name:<11} {seconds / len(queries) * 1e6:9.1f} µs/query  '
+                f'{scan_seconds / seconds:6.1f}x vs full scan'
+            )
+        self.stdout.write(f'Queries with different results: {mismatches}')
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark completed'))
+
+    def _simulate_stops(self, rng, count):
+        """Stops clustered around towns across India, plus scattered rural stops"""
+        town_count = max(count // 200, 1)
+        town_latitudes = rng.uniform(8.0, 32.0, town_count)
+        town_longitudes = rng.uniform(68.0, 92.0, town_count)
+        clustered = int(count * 0.8)
+        owners = rng.integers(0, town_count, clustered)
+        latitudes = np.concatenate([
+            town_latitudes[owners] + rng.normal(0, 0.05, clustered),
+            rng.uniform(8.0, 32.0, count - clustered),
+        ])
+        longitudes = np.concatenate([
+            town_longitudes[owners] + rng.normal(0, 0.05, clustered),
+            rng.uniform(68.0, 92.0, count - clustered),
+        ])
+        return latitudes, longitudes
@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from route.models import LocationBreadcrumb
+
+TABLE = LocationBreadcrumb._meta.db_table
+DELETE_BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = 'Maintain day partitions of the GPS breadcrumb history and purge expired days'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=getattr(settings, 'BREADCRUMB_RETENTION_DAYS', 30),
+            help='Keep this many days of history, including today',
+        )
+        parser.add_argument(
+            '--create-ahead',
+            type=int,
+            default=7,
+            help='Number of future daily partitions to keep ready (MySQL only)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be done without changing anything',
+        )
+
+    def handle(self, *args, **options):
+        today = datetime.now(dt_timezone.utc).date()
+        cutoff = today - timedelta(days=options['retention_days'] - 1)
+        self.stdout.write(self.style.HTTP_INFO(f'🗂️ Keeping breadcrumbs from {cutoff} onwards'))
+
+        if connection.vendor == 'mysql':
+            self._maintain_partitions(today, cutoff, options['create_ahead'], options['dry_run'])
+        else:
+            self._delete_expired(cutoff, options['dry_run'])
+
+    def _maintain_partitions(self, today, cutoff, create_ahead, dry_run):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL",
+                [TABLE]
+            )
+            names = {row[0] for row in cursor.fetchall()}
+
+        days = {
+            datetime.strptime(name[1:], '%Y%m%d').date(): name
+            for name in names if name != 'pmax'
+        }
+
+        # Partition pYYYYMMDD holds every row with day <= YYYY-MM-DD that no
+        # earlier partition holds, so it expires once YYYY-MM-DD < cutoff
+        expired = sorted(name for day, name in days.items() if day < cutoff)
+        if expired:
+            self._run(f"ALTER TABLE {TABLE} DROP PARTITION {', '.join(expired)}", dry_run)
+        self.stdout.write(f'Dropped {len(expired)} expired partition(s)')
+
+        latest = max(days) if days else today - timedelta(days=1)
+        new_days = []
+        day = max(latest + timedelta(days=1), today)
+        while day <= today + timedelta(days=create_ahead):
+            new_days.append(day)
+            day += timedelta(days=1)
+
+        if new_days:
+            definitions = ', '.join(
+                f"PARTITION p{day:%Y%m%d} VALUES LESS THAN ('{day + timedelta(days=1):%Y-%m-%d}')"
+                for day in new_days
+            )
+            self._run(
+                f"ALTER TABLE {TABLE} REORGANIZE PARTITION pmax INTO "
+                f"({definitions}, PARTITION pmax VALUES LESS THAN (MAXVALUE))",
+                dry_run
+            )
+        self.stdout.write(f'Created {len(new_days)} new daily partition(s)')
+        self.stdout.write(self.style.SUCCESS('✅ Breadcrumb partitions are up to date'))
+
+    def _delete_expired(self, cutoff, dry_run):
+        expired = LocationBreadcrumb.objects.filter(day__lt=cutoff)
+        if dry_run:
+            self.stdout.write(f'Would delete {expired.count()} breadcrumb(s)')
+            return
+
+        deleted = 0
+        while True:
+            batch = list(expired.values_list('pk', flat=True)[:DELETE_BATCH_SIZE])
+            if not batch:
+                break
+            deleted += LocationBreadcrumb.objects.filter(pk__in=batch).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'✅ Deleted {deleted} expired breadcrumb(s)'))
+
+    def _run(self, sql, dry_run):
+        if dry_run:
+            self.stdout.write(sql)
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
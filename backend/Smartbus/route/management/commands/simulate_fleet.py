@@ -0,0 +1,349 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from datetime import time as dt_time
+import bisect
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from route.geometry import get_route_geometries
+from route.models import BusRoute
+from route.ping_protocol import PING_CONTENT_TYPE, encode_fix
+from users.models import User, Bus
+
+SIM_OPERATOR_EMAIL = 'fleet-simulator@smartbus.local'
+SIM_BUS_PREFIX = 'SIM'
+
+
+class SimulatedBus:
+    """A bus driving its route back and forth, one GPS fix per ping interval"""
+
+    def __init__(self, bus_number, geometry, speed_kmh, rng):
+        self.bus_number = bus_number
+        self.rng = rng
+        self.speed_kmh = speed_kmh
+        located = [int(index) for index in geometry.segment_stops]
+        self.stop_km = [geometry.cumulative_list[index] for index in located]
+        self.stop_latitudes = [float(geometry.latitudes[index]) for index in located]
+        self.stop_longitudes = [float(geometry.longitudes[index]) for index in located]
+        self.total_km = self.stop_km[-1]
+        self.distance_km = rng.uniform(0, self.total_km)
+        self.heading = 1
+        self.seq = 0
+
+    def position(self):
+        """(latitude, longitude, bearing) at the current distance, between the surrounding stops"""
+        segment = min(max(bisect.bisect_right(self.stop_km, self.distance_km) - 1, 0), len(self.stop_km) - 2)
+        start_km, end_km = self.stop_km[segment], self.stop_km[segment + 1]
+        fraction = (self.distance_km - start_km) / (end_km - start_km) if end_km > start_km else 0.0
+        lat1, lon1 = self.stop_latitudes[segment], self.stop_longitudes[segment]
+        lat2, lon2 = self.stop_latitudes[segment + 1], self.stop_longitudes[segment + 1]
+        bearing = math.degrees(math.atan2(
+            (lon2 - lon1) * math.cos(math.radians(lat1)), lat2 - lat1
+        )) % 360
+        if self.heading < 0:
+            bearing = (bearing + 180) % 360
+        return lat1 + (lat2 - lat1) * fraction, lon1 + (lon2 - lon1) * fraction, bearing
+
+    def next_fix(self, interval, device_ts):
+        speed = max(0.0, self.rng.gauss(self.speed_kmh, self.speed_kmh * 0.1))
+        self.distance_km += self.heading * speed * interval / 3600
+        # Turn round at either terminus
+        if self.distance_km >= self.total_km:
+            self.distance_km, self.heading = self.total_km, -1
+        elif self.distance_km <= 0:
+            self.distance_km, self.heading = 0.0, 1
+
+        latitude, longitude, bearing = self.position()
+        accuracy = self.rng.uniform(3, 12)
+        # GPS noise of about the reported accuracy, in degrees
+        noise = accuracy / 111_000
+        self.seq += 1
+        return {
+            'bus_number': self.bus_number,
+            'latitude': round(latitude + self.rng.gauss(0, noise / 2), 7),
+            'longitude': round(longitude + self.rng.gauss(0, noise / 2), 7),
+            'speed': round(speed, 1),
+            'bearing': round(bearing, 1),
+            'accuracy': round(accuracy, 1),
+            'engine_on': True,
+            'seq': self.seq,
+            'device_ts': device_ts,
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        'Simulate buses driving the routes in the database and post their GPS pings to '
+        'driver/location/update/, in process or against a running server. Reports '
+        'latency percentiles, throughput and database queries per request.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--buses',
+            type=int,
+            default=0,
+            help='Simulated buses (default: every operational bus)',
+        )
+        parser.add_argument(
+            '--create-buses',
+            action='store_true',
+            help=f'Create {SIM_BUS_PREFIX}-numbered buses when --buses exceeds the operational buses',
+        )
+        parser.add_argument(
+            '--remove-buses',
+            action='store_true',
+            help=f'Delete the {SIM_BUS_PREFIX}-numbered buses and exit',
+        )
+        parser.add_argument(
+            '--pings',
+            type=int,
+            default=20,
+            help='Pings sent by each bus (default: 20)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds between the pings of one bus (default: 5)',
+        )
+        parser.add_argument(
+            '--speed',
+            type=float,
+            default=40.0,
+            help='Mean bus speed in km/h (default: 40)',
+        )
+        parser.add_argument(
+            '--speed-spread',
+            type=float,
+            default=15.0,
+            help='Cruising speeds are spread this many km/h either side of --speed (default: 15)',
+        )
+        parser.add_argument(
+            '--realtime',
+            action='store_true',
+            help='Wait --interval between rounds instead of sending as fast as possible',
+        )
+        parser.add_argument(
+            '--url',
+            help='Base URL of a running server (e.g. http://127.0.0.1:8000); default: Django test client',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=16,
+            help='Parallel connections with --url (default: 16)',
+        )
+        parser.add_argument(
+            '--binary',
+            action='store_true',
+            help='Send the binary ping encoding instead of JSON',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the simulated fleet',
+        )
+
+    def handle(self, *args, **options):
+        if options['remove_buses']:
+            deleted = Bus.objects.filter(bus_number__startswith=SIM_BUS_PREFIX).delete()[0]
+            deleted += User.objects.filter(email=SIM_OPERATOR_EMAIL).delete()[0]
+            self.stdout.write(self.style.SUCCESS(f'✅ Removed {deleted} simulated row(s)'))
+            return
+
+        rng = random.Random(options['seed'])
+        fleet = self._build_fleet(options, rng)
+        path = reverse('route:driver_update_location')
+        interval = options['interval']
+        mode = options['url'] or 'Django test client'
+        self.stdout.write(self.style.HTTP_INFO(
+            f'🚌 {len(fleet)} buses x {options["pings"]} pings every {interval:g}s '
+            f'at {options["speed"]:g}±{options["speed_spread"]:g} km/h via {mode}'
+        ))
+
+        if options['url']:
+            send = self._http_sender(options['url'].rstrip('/') + path, options['binary'])
+        else:
+            send = self._client_sender(path, options['binary'])
+
+        durations = []
+        query_counts = []
+        outcomes = {'accepted': 0, 'ignored': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def ping(bus, device_ts):
+            fix = bus.next_fix(interval, device_ts)
+            start = time.perf_counter()
+            status, body, queries = send(fix)
+            elapsed = time.perf_counter() - start
+            with lock:
+                durations.append(elapsed)
+                if queries is not None:
+                    query_counts.append(queries)
+                if status != 200:
+                    outcomes['errors'] += 1
+                elif body.get('ignored'):
+                    outcomes['ignored'] += 1
+                else:
+                    outcomes['accepted'] += 1
+
+        start_ms = int(time.time() * 1000)
+        started = time.perf_counter()
+        pool = ThreadPoolExecutor(max_workers=options['concurrency']) if options['url'] else None
+        try:
+            for round_number in range(options['pings']):
+                round_started = time.perf_counter()
+                device_ts = start_ms + int(round_number * interval * 1000)
+                if pool:
+                    list(pool.map(lambda bus: ping(bus, device_ts), fleet))
+                else:
+                    for bus in fleet:
+                        ping(bus, device_ts)
+                if options['realtime']:
+                    time.sleep(max(0.0, interval - (time.perf_counter() - round_started)))
+        finally:
+            if pool:
+                pool.shutdown()
+        seconds = time.perf_counter() - started
+
+        durations.sort()
+        self.stdout.write(
+            f'  {len(durations)} requests in {seconds:.1f}s: {len(durations) / seconds:8.1f} req/s'
+        )
+        self.stdout.write(
+            f'  latency p50 {self._percentile(durations, 0.50) * 1000:7.1f} ms  '
+            f'p95 {self._percentile(durations, 0.95) * 1000:7.1f} ms  '
+            f'p99 {self._percentile(durations, 0.99) * 1000:7.1f} ms  '
+            f'max {durations[-1] * 1000:7.1f} ms'
+        )
+        self.stdout.write(
+            f'  accepted {outcomes["accepted"]}  ignored {outcomes["ignored"]}  errors {outcomes["errors"]}'
+        )
+        if query_counts:
+            self.stdout.write(
+                f'  DB queries per request: mean {sum(query_counts) / len(query_counts):.2f}  '
+                f'max {max(query_counts)}  total {sum(query_counts)} '
+                f'(request path only; the live state flusher writes in the background)'
+            )
+        else:
+            self.stdout.write('  DB queries are not visible over HTTP; run without --url to count them')
+        self.stdout.write(self.style.SUCCESS('✅ Simulation completed'))
+
+    def _build_fleet(self, options, rng):
+        bus_routes = list(
+            BusRoute.objects.filter(is_operational=True).select_related('bus', 'route').order_by('id')
+        )
+        geometries = get_route_geometries({bus_route.route_id for bus_route in bus_routes})
+        # One active route per bus, on a route that has a drivable shape
+        drivable = {}
+        for bus_route in bus_routes:
+            if len(geometries[bus_route.route_id].segment_stops) >= 2:
+                drivable.setdefault(bus_route.bus_id, bus_route)
+        bus_routes = list(drivable.values())
+        if not bus_routes:
+            raise CommandError('No operational buses on routes with stop coordinates. Run add_sample_routes first.')
+
+        wanted = options['buses'] or len(bus_routes)
+        if wanted > len(bus_routes):
+            if not options['create_buses']:
+                raise CommandError(
+                    f'Only {len(bus_routes)} operational buses; pass --create-buses to add simulated ones'
+                )
+            bus_routes += self._create_buses(wanted - len(bus_routes), bus_routes)
+
+        low = max(5.0, options['speed'] - options['speed_spread'])
+        high = max(low, options['speed'] + options['speed_spread'])
+        return [
+            SimulatedBus(
+                bus_route.bus.bus_number,
+                geometries[bus_route.route_id],
+                rng.uniform(low, high),
+                random.Random(rng.random())
+            )
+            for bus_route in bus_routes[:wanted]
+        ]
+
+    def _create_buses(self, count, templates):
+        """Simulated buses, assigned round-robin to the routes of the existing ones"""
+        operator, _ = User.objects.get_or_create(
+            email=SIM_OPERATOR_EMAIL,
+            defaults={'name': 'Fleet Simulator', 'password': 'simulator', 'user_type': 'bus'}
+        )
+        existing = {
+            bus.bus_number: bus
+            for bus in Bus.objects.filter(bus_number__startswith=SIM_BUS_PREFIX)
+        }
+        created = []
+        for number in range(1, count + 1):
+            template = templates[(number - 1) % len(templates)]
+            bus_number = f'{SIM_BUS_PREFIX}{number:05d}'
+            bus = existing.get(bus_number)
+            if bus is None:
+                bus = Bus.objects.create(
+                    user=operator,
+                    bus_name='Simulated Bus',
+                    bus_number=bus_number,
+                    route=template.route.route_name
+                )
+            bus_route = BusRoute.objects.filter(bus=bus, is_operational=True).select_related('bus').first()
+            if bus_route is None:
+                bus_route = BusRoute.objects.create(
+                    bus=bus,
+                    route_id=template.route_id,
+                    departure_time=dt_time(6, 0),
+                    arrival_time=dt_time(23, 0),
+                    frequency_minutes=60,
+                    is_operational=True,
+                    effective_from=timezone.now().date()
+                )
+            created.append(bus_route)
+        self.stdout.write(f'Using {len(created)} simulated bus(es)')
+        return created
+
+    def _body(self, fix, binary):
+        if binary:
+            return encode_fix(fix), PING_CONTENT_TYPE
+        return json.dumps(fix).encode(), 'application/json'
+
+    def _client_sender(self, path, binary):
+        """In-process requests; counts the queries each one runs"""
+        client = Client(HTTP_HOST='localhost')
+
+        def send(fix):
+            body, content_type = self._body(fix, binary)
+            with CaptureQueriesContext(connection) as queries:
+                response = client.post(path, body, content_type=content_type)
+            return response.status_code, response.json(), len(queries)
+
+        return send
+
+    def _http_sender(self, url, binary):
+        def send(fix):
+            body, content_type = self._body(fix, binary)
+            request = urllib.request.Request(
+                url, data=body, headers={'Content-Type': content_type}, method='POST'
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    return response.status, json.loads(response.read()), None
+            except urllib.error.HTTPError as e:
+                return e.code, {}, None
+            except (urllib.error.URLError, OSError):
+                return 0, {}, None
+
+        return send
+
+    def _percentile(self, sorted_values, fraction):
+        return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
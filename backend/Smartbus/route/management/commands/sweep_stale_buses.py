@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+from datetime import timedelta
+import logging
+import time
+
+from route.models import LiveRouteTracking, BusStatus
+from route.live_state import STATUS_HEARTBEAT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Statuses that only hold while the driver app keeps reporting; maintenance
+# and breakdown are set by the driver and stay until changed
+LIVE_STATUSES = ['active', 'idle', 'delayed']
+
+
+class Command(BaseCommand):
+    help = 'Mark buses whose driver app stopped reporting as inactive/offline, in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=getattr(settings, 'LIVE_TRACKING_STALE_AFTER', 300),
+            help=(
+                'Seconds without a fix after which a bus is stale; at least the live state '
+                f'status heartbeat ({STATUS_HEARTBEAT_SECONDS:g}s, half of LIVE_TRACKING_STALE_AFTER)'
+            ),
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60.0,
+            help='Seconds between sweeps (default: 60)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run a single sweep and exit',
+        )
+
+    def handle(self, *args, **options):
+        stale_after = options['stale_after']
+        # A reporting bus's BusStatus.updated_at is only written every
+        # STATUS_HEARTBEAT_SECONDS, and the live state never rewrites
+        # current_status on its own: a shorter threshold would leave buses
+        # that are still reporting offline
+        if stale_after < STATUS_HEARTBEAT_SECONDS:
+            raise CommandError(
+                f'--stale-after must be at least {STATUS_HEARTBEAT_SECONDS:g}s, the live state status '
+                f'heartbeat; lower LIVE_TRACKING_STALE_AFTER to sweep sooner'
+            )
+        self.stdout.write(self.style.HTTP_INFO(
+            f'🧹 Sweeping buses silent for more than {stale_after}s'
+        ))
+
+        while True:
+            close_old_connections()
+            try:
+                self._sweep(stale_after)
+            except Exception as e:
+                logger.error(f"Stale bus sweep failed: {str(e)}")
+                self.stdout.write(self.style.ERROR(f'❌ Sweep failed: {str(e)}'))
+                if options['once']:
+                    raise
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+
+    def _sweep(self, stale_after):
+        """One UPDATE per table, whatever the number of stale buses"""
+        start = time.perf_counter()
+        cutoff = timezone.now() - timedelta(seconds=stale_after)
+
+        # Leading is_active column of the (is_active, is_moving) index keeps
+        # this to the live rows rather than the whole table
+        deactivated = LiveRouteTracking.objects.filter(
+            is_active=True, last_updated__lt=cutoff
+        ).update(is_active=False, is_moving=False)
+
+        offline = BusStatus.objects.filter(
+            current_status__in=LIVE_STATUSES, updated_at__lt=cutoff
+        ).update(current_status='offline')
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        logger.info(
+            f"stale_bus_sweep trackings_deactivated={deactivated} "
+            f"statuses_offline={offline} duration_ms={elapsed_ms:.1f}"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Deactivated {deactivated} tracking(s), marked {offline} bus(es) offline '
+            f'in {elapsed_ms:.1f} ms'
+        ))
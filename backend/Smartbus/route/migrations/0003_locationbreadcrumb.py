@@ -0,0 +1,119 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def partition_by_day(apps, schema_editor):
+    """
+    On MySQL, turn location_breadcrumbs into a RANGE COLUMNS(day) partitioned
+    table with a single catch-all partition. purge_breadcrumbs splits daily
+    partitions off it and drops expired ones. Other databases keep a plain
+    table and purge_breadcrumbs deletes by day instead.
+    """
+    if schema_editor.connection.vendor != "mysql":
+        return
+    schema_editor.execute(
+        "ALTER TABLE location_breadcrumbs DROP PRIMARY KEY, ADD PRIMARY KEY (id, day)"
+    )
+    schema_editor.execute(
+        "ALTER TABLE location_breadcrumbs PARTITION BY RANGE COLUMNS(day) "
+        "(PARTITION pmax VALUES LESS THAN (MAXVALUE))"
+    )
+
+
+def remove_partitioning(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    schema_editor.execute("ALTER TABLE location_breadcrumbs REMOVE PARTITIONING")
+    schema_editor.execute(
+        "ALTER TABLE location_breadcrumbs DROP PRIMARY KEY, ADD PRIMARY KEY (id)"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("route", "0002_busalert_busstatus_favoriteroute_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LocationBreadcrumb",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "day",
+                    models.DateField(
+                        help_text="UTC date of recorded_at, the partition key"
+                    ),
+                ),
+                ("recorded_at", models.DateTimeField()),
+                ("latitude", models.FloatField()),
+                ("longitude", models.FloatField()),
+                (
+                    "speed",
+                    models.FloatField(default=0.0, help_text="Speed in km/h"),
+                ),
+                (
+                    "bearing",
+                    models.FloatField(default=0.0, help_text="Direction in degrees"),
+                ),
+                (
+                    "bus_route",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="breadcrumbs",
+                        to="route.busroute",
+                    ),
+                ),
+                (
+                    "route",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        help_text="Denormalized from bus_route for per-route queries",
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="breadcrumbs",
+                        to="route.route",
+                    ),
+                ),
+                (
+                    "stop",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="route.routestop",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "location_breadcrumbs",
+                "indexes": [
+                    models.Index(
+                        fields=["bus_route", "recorded_at"],
+                        name="location_br_bus_rou_ebcb51_idx",
+                    ),
+                    models.Index(
+                        fields=["route", "recorded_at"],
+                        name="location_br_route_i_e72ead_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(partition_by_day, remove_partitioning),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('route', '0003_locationbreadcrumb'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteCatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField()),
+            ],
+            options={
+                'db_table': 'route_catalog_version',
+            },
+        ),
+    ]
@@ -1,5 +1,85 @@
 from django.db import models
 from django.contrib.auth.models import User
+from datetime import timezone as dt_timezone
+
+
+class TrackedFieldsMixin:
+    """
+    Remembers column values as loaded or last saved, so that saving an
+    existing row writes only the changed columns (plus auto_now
+    timestamps) and skips the UPDATE when nothing changed
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.mark_clean()
+        return instance
+
+    def _tracked_fields(self):
+        return [field for field in self._meta.concrete_fields if not field.primary_key]
+
+    def changed_fields(self):
+        """
+        Names of the columns that differ from the remembered values or were
+        marked changed; all of them if none are remembered
+        """
+        tracked = getattr(self, '_tracked_values', None)
+        if tracked is None:
+            return [field.name for field in self._tracked_fields()]
+        forced = getattr(self, '_forced_changed', ())
+        return [
+            field.name for field in self._tracked_fields()
+            # Deferred columns that were never loaded are unchanged
+            if field.attname in self.__dict__ and (
+                field.attname in forced
+                or tracked.get(field.attname, models.DEFERRED) != self.__dict__[field.attname]
+            )
+        ]
+
+    def remembered_value(self, attname):
+        """Value of a column as last loaded or saved, or None if unknown"""
+        return (getattr(self, '_tracked_values', None) or {}).get(attname)
+
+    def mark_clean(self, values=None):
+        """Remember the current column values, or the given {attname: value} written for this row"""
+        if values is None:
+            self._tracked_values = {
+                field.attname: self.__dict__[field.attname]
+                for field in self._tracked_fields() if field.attname in self.__dict__
+            }
+            self._forced_changed = set()
+        elif getattr(self, '_tracked_values', None) is not None:
+            self._tracked_values.update(values)
+            self._forced_changed = getattr(self, '_forced_changed', set()) - values.keys()
+
+    def mark_all_changed(self):
+        """
+        Treat every column as changed until it is next saved, e.g. after the
+        row was updated behind this instance's back
+        """
+        self._forced_changed = {field.attname for field in self._tracked_fields()}
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            changed = self.changed_fields()
+            if not changed:
+                return
+            auto_now = [
+                field.name for field in self._tracked_fields()
+                if getattr(field, 'auto_now', False) and field.name not in changed
+            ]
+            kwargs['update_fields'] = changed + auto_now
+        super().save(*args, **kwargs)
+        if update_fields is None:
+            self.mark_clean()
+        else:
+            # Columns left out of an explicit update_fields are still unsaved
+            self.mark_clean({
+                self._meta.get_field(name).attname: getattr(self, self._meta.get_field(name).attname)
+                for name in update_fields
+            })
 
 
 class Route(models.Model):
@@ -82,7 +162,7 @@ class BusRoute(models.Model):
         return f"{self.bus.bus_number} - {self.route.route_name} ({self.departure_time})"
 
 
-class BusStatus(models.Model):
+class BusStatus(TrackedFieldsMixin, models.Model):
     """Bus operational status and information"""
     STATUS_CHOICES = [
         ('active', 'Active/Running'),
@@ -112,7 +192,7 @@ class BusStatus(models.Model):
         return f"{self.bus.bus_number} - {self.current_status}"
 
 
-class LiveRouteTracking(models.Model):
+class LiveRouteTracking(TrackedFieldsMixin, models.Model):
     """Enhanced real-time tracking of buses with advanced features"""
     bus_route = models.ForeignKey(BusRoute, on_delete=models.CASCADE, related_name='live_tracking')
     current_stop = models.ForeignKey(RouteStop, on_delete=models.SET_NULL, null=True, blank=True)
@@ -184,6 +264,12 @@ class LiveRouteTracking(models.Model):
         if self.estimated_arrival_destination:
             return self.estimated_arrival_destination.strftime('%H:%M')
         return 'N/A'
+
+    @property
+    def next_stop_eta_display(self):
+        if self.estimated_arrival_next_stop:
+            return self.estimated_arrival_next_stop.strftime('%H:%M')
+        return 'N/A'
         
     @property
     def delay_status(self):
@@ -194,6 +280,62 @@ class LiveRouteTracking(models.Model):
         return 'on_time'
 
 
+class BreadcrumbQuerySet(models.QuerySet):
+    def between(self, start, end):
+        """Fixes recorded in [start, end), restricted to the matching day partitions"""
+        # day is the UTC date, whatever the zone of start and end
+        return self.filter(
+            day__gte=start.astimezone(dt_timezone.utc).date(),
+            day__lte=end.astimezone(dt_timezone.utc).date(),
+            recorded_at__gte=start, recorded_at__lt=end
+        )
+
+    def for_bus_route(self, bus_route_id, start, end):
+        return self.filter(bus_route_id=bus_route_id).between(start, end).order_by('recorded_at')
+
+    def for_route(self, route_id, start, end):
+        return self.filter(route_id=route_id).between(start, end).order_by('bus_route_id', 'recorded_at')
+
+
+class LocationBreadcrumb(models.Model):
+    """
+    Append-only GPS history, one row per accepted fix.
+    On MySQL the table is RANGE-partitioned by day (see migration 0003 and
+    the purge_breadcrumbs command), which does not allow foreign key
+    constraints, so relations are kept without them.
+    """
+    bus_route = models.ForeignKey(
+        BusRoute, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+        related_name='breadcrumbs'
+    )
+    route = models.ForeignKey(
+        Route, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+        related_name='breadcrumbs', help_text="Denormalized from bus_route for per-route queries"
+    )
+    day = models.DateField(help_text="UTC date of recorded_at, the partition key")
+    recorded_at = models.DateTimeField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    speed = models.FloatField(default=0.0, help_text="Speed in km/h")
+    bearing = models.FloatField(default=0.0, help_text="Direction in degrees")
+    stop = models.ForeignKey(
+        RouteStop, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+        null=True, blank=True, related_name='+'
+    )
+
+    objects = BreadcrumbQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'location_breadcrumbs'
+        indexes = [
+            models.Index(fields=['bus_route', 'recorded_at']),
+            models.Index(fields=['route', 'recorded_at']),
+        ]
+
+    def __str__(self):
+        return f"BusRoute {self.bus_route_id} @ {self.recorded_at:%Y-%m-%d %H:%M:%S}"
+
+
 class FavoriteRoute(models.Model):
     """User's favorite routes for quick access"""
     user_email = models.EmailField(help_text="User email for identification")
@@ -267,3 +409,18 @@ class BusAlert(models.Model):
 
     def __str__(self):
         return f"{self.alert_type.title()}: {self.title}"
+
+
+class RouteCatalogVersion(models.Model):
+    """
+    Single-row counter of route, stop and bus assignment changes, bumped
+    by the save/delete signals and polled by every worker to tell when
+    its in-process route catalog is out of date (see route/catalog.py)
+    """
+    version = models.BigIntegerField()
+
+    class Meta:
+        db_table = 'route_catalog_version'
+
+    def __str__(self):
+        return f"Route catalog version {self.version}"
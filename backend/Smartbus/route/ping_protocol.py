@@ -0,0 +1,153 @@
+"""
+SmartBus Binary Ping Protocol
+Compact fixed-layout encoding of driver GPS fixes
+
+Driver devices may POST fixes with Content-Type PING_CONTENT_TYPE instead
+of JSON. Each fix is a little-endian record:
+
+    version      uint8    PROTOCOL_VERSION
+    flags        uint8    FLAG_* bits
+    bus_len      uint8    length of bus_number in bytes
+    bus_number   bytes    ASCII
+    latitude     int32    degrees * 1e7
+    longitude    int32    degrees * 1e7
+    speed        float32  km/h
+    bearing      float32  degrees
+    accuracy     float32  meters
+    altitude     float32  meters
+    passenger_count  uint16   only if FLAG_PASSENGER_COUNT
+    fuel_level       float32  only if FLAG_FUEL_LEVEL
+    seq              uint32   only if FLAG_SEQ
+    device_ts        uint64   only if FLAG_DEVICE_TS, epoch milliseconds
+
+Optional fields follow in flag bit order, so new ones can be added behind
+new flag bits without a version change.
+
+A batch is records concatenated back to back. Decoded fixes are plain
+dicts with the same keys as the JSON payload, so both encodings go
+through parse_location_fix. Driver name and phone change once per shift
+and stay JSON-only.
+"""
+
+import struct
+
+from .ingestion import FixValidationError
+
+PING_CONTENT_TYPE = 'application/x-smartbus-ping'
+PROTOCOL_VERSION = 1
+
+FLAG_ENGINE_ON = 0x01
+FLAG_PASSENGER_COUNT = 0x02
+FLAG_FUEL_LEVEL = 0x04
+FLAG_SEQ = 0x08
+FLAG_DEVICE_TS = 0x10
+
+COORDINATE_SCALE = 10 ** 7
+
+HEADER = struct.Struct('<BBB')
+FIX = struct.Struct('<iiffff')
+PASSENGER_COUNT = struct.Struct('<H')
+FUEL_LEVEL = struct.Struct('<f')
+SEQ = struct.Struct('<I')
+DEVICE_TS = struct.Struct('<Q')
+
+
+def encode_fix(fix):
+    """Encode one fix dict (JSON payload keys) as a binary record"""
+    bus_number = str(fix['bus_number']).encode('ascii')
+    flags = FLAG_ENGINE_ON if fix.get('engine_on', True) else 0
+    if fix.get('passenger_count') is not None:
+        flags |= FLAG_PASSENGER_COUNT
+    if fix.get('fuel_level') is not None:
+        flags |= FLAG_FUEL_LEVEL
+    if fix.get('seq') is not None:
+        flags |= FLAG_SEQ
+    if fix.get('device_ts') is not None:
+        flags |= FLAG_DEVICE_TS
+
+    parts = [
+        HEADER.pack(PROTOCOL_VERSION, flags, len(bus_number)),
+        bus_number,
+        FIX.pack(
+            round(fix['latitude'] * COORDINATE_SCALE),
+            round(fix['longitude'] * COORDINATE_SCALE),
+            fix.get('speed', 0),
+            fix.get('bearing', 0),
+            fix.get('accuracy', 0),
+            fix.get('altitude', 0),
+        ),
+    ]
+    if flags & FLAG_PASSENGER_COUNT:
+        parts.append(PASSENGER_COUNT.pack(fix['passenger_count']))
+    if flags & FLAG_FUEL_LEVEL:
+        parts.append(FUEL_LEVEL.pack(fix['fuel_level']))
+    if flags & FLAG_SEQ:
+        parts.append(SEQ.pack(fix['seq']))
+    if flags & FLAG_DEVICE_TS:
+        parts.append(DEVICE_TS.pack(fix['device_ts']))
+    return b''.join(parts)
+
+
+def encode_fixes(fixes):
+    return b''.join(encode_fix(fix) for fix in fixes)
+
+
+def _decode_record(body, offset):
+    """Decode the record starting at offset; returns (fix dict, next offset)"""
+    try:
+        version, flags, bus_len = HEADER.unpack_from(body, offset)
+        if version != PROTOCOL_VERSION:
+            raise FixValidationError(f'Unsupported ping protocol version: {version}')
+        offset += HEADER.size
+
+        bus_number = body[offset:offset + bus_len].decode('ascii')
+        offset += bus_len
+
+        latitude, longitude, speed, bearing, accuracy, altitude = FIX.unpack_from(body, offset)
+        offset += FIX.size
+
+        fix = {
+            'bus_number': bus_number,
+            'latitude': latitude / COORDINATE_SCALE,
+            'longitude': longitude / COORDINATE_SCALE,
+            'speed': speed,
+            'bearing': bearing,
+            'accuracy': accuracy,
+            'altitude': altitude,
+            'engine_on': bool(flags & FLAG_ENGINE_ON),
+        }
+        if flags & FLAG_PASSENGER_COUNT:
+            fix['passenger_count'] = PASSENGER_COUNT.unpack_from(body, offset)[0]
+            offset += PASSENGER_COUNT.size
+        if flags & FLAG_FUEL_LEVEL:
+            fix['fuel_level'] = FUEL_LEVEL.unpack_from(body, offset)[0]
+            offset += FUEL_LEVEL.size
+        if flags & FLAG_SEQ:
+            fix['seq'] = SEQ.unpack_from(body, offset)[0]
+            offset += SEQ.size
+        if flags & FLAG_DEVICE_TS:
+            fix['device_ts'] = DEVICE_TS.unpack_from(body, offset)[0]
+            offset += DEVICE_TS.size
+    except struct.error:
+        raise FixValidationError('Truncated binary location fix')
+    except UnicodeDecodeError:
+        raise FixValidationError('Bus number must be ASCII')
+    return fix, offset
+
+
+def decode_fixes(body):
+    """Decode a body of concatenated records into a list of fix dicts"""
+    fixes = []
+    offset = 0
+    while offset < len(body):
+        fix, offset = _decode_record(body, offset)
+        fixes.append(fix)
+    return fixes
+
+
+def decode_fix(body):
+    """Decode a body holding exactly one record"""
+    fix, offset = _decode_record(body, 0)
+    if offset != len(body):
+        raise FixValidationError('Unexpected trailing bytes after location fix')
+    return fix
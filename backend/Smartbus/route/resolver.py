@@ -0,0 +1,147 @@
+"""
+SmartBus Bus Resolver
+In-process cache from bus_number to the bus's active BusRoute
+
+Every driver ping names its bus by number; the ingestion path needs the
+operational BusRoute (with its bus and route) to apply it. Resolutions,
+including "no such bus" and "no active route", are cached here and
+dropped by the Bus/BusRoute/Route save and delete signals.
+
+Lookups compare bus_number itself, never a function of it, so they use
+its unique index: the production MySQL collation matches numbers
+case-insensitively (elsewhere, the number must be sent as stored or in
+upper case). Resolutions are cached under the upper-cased number, the
+key every spelling shares. The cache holds at most
+CACHE_SIZE entries, least recently used first out, and keeps unknown
+numbers (which anyone can request) only for MISS_TTL_SECONDS.
+"""
+
+from collections import OrderedDict, namedtuple
+from django.conf import settings
+import threading
+import time
+
+from .models import BusRoute
+from users.models import Bus
+
+
+# Safety net for changes made in other worker processes, which the
+# save/delete signals of this process never see
+CACHE_TTL_SECONDS = getattr(settings, 'BUS_RESOLVER_CACHE_TTL', 60)
+MISS_TTL_SECONDS = getattr(settings, 'BUS_RESOLVER_MISS_TTL', 5)
+CACHE_SIZE = getattr(settings, 'BUS_RESOLVER_CACHE_SIZE', 10000)
+
+ResolvedBus = namedtuple('ResolvedBus', [
+    'bus_id',        # None if no bus has this number
+    'bus_route_id',  # None if the bus has no operational route
+    'route_id',
+    'bus_route',     # BusRoute with bus and route loaded, or None
+    'loaded_at',
+])
+
+_cache = OrderedDict()  # upper-cased bus_number -> ResolvedBus, least recently used first
+_lock = threading.Lock()
+_generation = 0
+
+
+def bus_number_key(bus_number):
+    """The key all spellings of a bus number share"""
+    return bus_number.upper()
+
+
+def _load(keys, bus_numbers):
+    """{key: ResolvedBus} for upper-cased keys, looked up under the given spellings and the keys"""
+    resolved = {}
+    now = time.monotonic()
+    spellings = set(bus_numbers) | set(keys)
+    # Same pick as before the cache: the operational route with the lowest id
+    for bus_route in BusRoute.objects.filter(
+        bus__bus_number__in=spellings, is_operational=True
+    ).select_related('bus', 'route').order_by('id'):
+        key = bus_number_key(bus_route.bus.bus_number)
+        if key in keys:
+            resolved.setdefault(key, ResolvedBus(
+                bus_route.bus_id, bus_route.id, bus_route.route_id, bus_route, now
+            ))
+
+    missing = set(keys) - resolved.keys()
+    if missing:
+        found = {
+            bus_number_key(bus_number): bus_id
+            for bus_number, bus_id in Bus.objects.filter(
+                bus_number__in=spellings
+            ).values_list('bus_number', 'id')
+        }
+        for key in missing:
+            resolved[key] = ResolvedBus(found.get(key), None, None, None, now)
+    return resolved
+
+
+def _is_fresh(entry, now):
+    ttl = CACHE_TTL_SECONDS if entry.bus_id is not None else MISS_TTL_SECONDS
+    return entry.loaded_at > now - ttl
+
+
+def resolve_buses(bus_numbers):
+    """
+    Return {bus_number: ResolvedBus} under the given spellings, loading all
+    misses with at most two queries
+    """
+    keys = {bus_number: bus_number_key(bus_number) for bus_number in bus_numbers}
+    now = time.monotonic()
+    found = {}
+    with _lock:
+        for key in set(keys.values()):
+            entry = _cache.get(key)
+            if entry is not None and _is_fresh(entry, now):
+                _cache.move_to_end(key)
+                found[key] = entry
+        generation = _generation
+
+    missing = set(keys.values()) - found.keys()
+    if missing:
+        loaded = _load(missing, [bus_number for bus_number, key in keys.items() if key in missing])
+        with _lock:
+            # Skip caching if an invalidation raced with the load
+            if generation == _generation:
+                for key, entry in loaded.items():
+                    _cache[key] = entry
+                    _cache.move_to_end(key)
+                while len(_cache) > CACHE_SIZE:
+                    _cache.popitem(last=False)
+        found.update(loaded)
+
+    return {bus_number: found[key] for bus_number, key in keys.items()}
+
+
+def resolve_bus(bus_number):
+    """Return the ResolvedBus of a single bus number"""
+    return resolve_buses([bus_number])[bus_number]
+
+
+def _invalidate(matches):
+    global _generation
+    with _lock:
+        _generation += 1
+        for bus_number in [key for key, entry in _cache.items() if matches(key, entry)]:
+            del _cache[bus_number]
+
+
+def invalidate_bus(bus_id, bus_number=None):
+    """Drop a bus, under its current and any previously cached number"""
+    bus_number = bus_number_key(bus_number) if bus_number is not None else None
+    # Ids are loaded as strings; a freshly created instance holds a UUID
+    bus_id = str(bus_id) if bus_id is not None else None
+    _invalidate(lambda key, entry: key == bus_number or (bus_id is not None and entry.bus_id == bus_id))
+
+
+def invalidate_route(route_id):
+    """Drop every bus resolved to a route whose details changed"""
+    _invalidate(lambda key, entry: entry.route_id == route_id)
+
+
+def clear_cache():
+    global _generation
+    with _lock:
+        _generation += 1
+        _cache.clear()
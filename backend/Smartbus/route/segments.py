@@ -0,0 +1,93 @@
+"""
+SmartBus Route Segments
+Any-stop-to-any-stop route search through a stop-to-routes inverted index
+
+Every stop of an active route is posted under its normalized name as
+(route_id, stop_sequence, stop). A route's source and destination city
+are also posted for its first and last stop, so "Delhi" finds the route
+that starts at "ISBT Delhi". Routes from A to B are the intersection of
+the two posting lists by route, keeping the routes that serve A before
+B. Segment distance and fare are differences of distance_from_source
+and fare_from_source. The index is built once per route catalog.
+"""
+
+from collections import namedtuple
+
+from .catalog import get_catalog
+from .cities import normalize
+
+Posting = namedtuple('Posting', ['route_id', 'stop_sequence', 'stop'])
+
+RouteSegment = namedtuple('RouteSegment', [
+    'route',
+    'board',        # RouteStop the passenger boards at
+    'alight',       # RouteStop the passenger leaves at
+    'distance_km',
+    'fare',
+])
+
+
+class SegmentIndex:
+    def __init__(self, catalog):
+        self._routes = catalog.routes
+        self._postings = {}  # normalized place name -> [Posting]
+        for route in catalog.active_routes:
+            stops = catalog.stops_of(route.route_id)
+            if not stops:
+                continue
+            places = [(normalize(stop.stop_name), stop) for stop in stops]
+            places += [(normalize(route.source), stops[0]), (normalize(route.destination), stops[-1])]
+            for name, stop in set(places):
+                self._postings.setdefault(name, []).append(
+                    Posting(route.route_id, stop.stop_sequence, stop)
+                )
+
+    def __contains__(self, place):
+        return normalize(place) in self._postings
+
+    def between(self, source, destination):
+        """
+        (forward, reverse) RouteSegments: routes serving source before
+        destination, and routes serving destination before source, each
+        in route_name order with the shortest span if a route serves a
+        place twice
+        """
+        boarding = {}
+        for posting in self._postings.get(normalize(source), ()):
+            boarding.setdefault(posting.route_id, []).append(posting)
+
+        forward = {}
+        reverse = {}
+        for end in self._postings.get(normalize(destination), ()):
+            for start in boarding.get(end.route_id, ()):
+                if start.stop_sequence < end.stop_sequence:
+                    found, board, alight = forward, start, end
+                elif start.stop_sequence > end.stop_sequence:
+                    found, board, alight = reverse, end, start
+                else:
+                    continue
+                span = alight.stop_sequence - board.stop_sequence
+                best = found.get(end.route_id)
+                if best is None or span < best[0]:
+                    found[end.route_id] = (span, board.stop, alight.stop)
+        return self._segments(forward), self._segments(reverse)
+
+    def _segments(self, found):
+        segments = [
+            RouteSegment(
+                route=self._routes[route_id],
+                board=board,
+                alight=alight,
+                distance_km=round(alight.distance_from_source - board.distance_from_source, 2),
+                fare=float(alight.fare_from_source - board.fare_from_source),
+            )
+            for route_id, (_, board, alight) in found.items()
+        ]
+        segments.sort(key=lambda segment: segment.route.route_name)
+        return segments
+
+
+def get_segment_index():
+    """The SegmentIndex of the current route catalog"""
+    catalog = get_catalog()
+    return catalog.derived('segment_index', lambda: SegmentIndex(catalog))
@@ -0,0 +1,53 @@
+"""
+SmartBus Route Signals
+Keeps the in-process route and bus caches in step with model changes
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Route, RouteStop, BusRoute
+from . import catalog, resolver
+from users.models import Bus, User
+
+
+def catalog_changed():
+    # After commit, so no worker reloads the catalog before the change is visible
+    transaction.on_commit(catalog.bump_version)
+
+
+@receiver([post_save, post_delete], sender=Route)
+def route_changed(sender, instance, **kwargs):
+    resolver.invalidate_route(instance.route_id)
+    catalog_changed()
+
+
+@receiver([post_save, post_delete], sender=RouteStop)
+def route_stop_changed(sender, instance, **kwargs):
+    catalog_changed()
+
+
+@receiver([post_save, post_delete], sender=BusRoute)
+def bus_route_changed(sender, instance, **kwargs):
+    resolver.invalidate_bus(instance.bus_id)
+    catalog_changed()
+
+
+@receiver([post_save, post_delete], sender=Bus)
+def bus_changed(sender, instance, **kwargs):
+    resolver.invalidate_bus(instance.id, instance.bus_number)
+    catalog_changed()
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    # Operator names are part of the catalog's bus routes. Riders, new
+    # operators (no buses yet) and saves that leave the name alone do not
+    # touch the catalog; deleting an operator deletes their buses, whose
+    # own signals reload it.
+    if instance.user_type != 'bus' or created:
+        return
+    if update_fields is not None and 'name' not in update_fields:
+        return
+    catalog_changed()
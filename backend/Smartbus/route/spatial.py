@@ -0,0 +1,286 @@
+"""
+SmartBus Spatial Index
+Uniform latitude/longitude grid for radius and nearest-neighbour queries
+
+GridIndex buckets keyed points into square cells of CELL_DEGREES and
+answers "points within r km" by scanning only the cells overlapping the
+query circle's bounding box, then filtering by haversine distance. Moving
+a point is O(1). "k nearest points" scans rings of cells outwards from
+the query's cell and stops once the k-th candidate is closer than
+anything an unscanned ring could hold.
+
+LiveBusIndex keeps the latest accepted position of every bus in such a
+grid. Ingestion updates it on every fix; positions older than
+LIVE_TRACKING_STALE_AFTER are ignored. Fixes accepted by other worker
+processes are picked up from LiveRouteTracking every REFRESH_SECONDS,
+loading only rows updated since the previous refresh.
+
+StopIndex holds every located stop of the active routes, merged into
+one place per stop name and position so that a place lists all the
+routes serving it. It is built from the route catalog on first use and
+replaced with the catalog.
+"""
+
+from django.conf import settings
+from django.utils import timezone
+import datetime
+import heapq
+import math
+import threading
+import time
+
+from . import geo
+from .catalog import get_catalog
+from .models import LiveRouteTracking
+
+# About 2.2 km north-south; a 2 km query touches at most 3x3 cells
+CELL_DEGREES = 0.02
+KM_PER_DEGREE = geo.EARTH_RADIUS_KM * math.pi / 180
+REFRESH_SECONDS = getattr(settings, 'LIVE_INDEX_REFRESH_SECONDS', 5)
+STALE_AFTER_SECONDS = getattr(settings, 'LIVE_TRACKING_STALE_AFTER', 300)
+# Write-behind flushes can land rows older than the newest one already
+# read; each refresh re-reads this much before its high-water mark
+REFRESH_OVERLAP_SECONDS = 2 * getattr(settings, 'LIVE_STATE_FLUSH_INTERVAL', 2.0) + 1
+
+# Stops are sparser than live buses; about 5.5 km cells
+STOP_CELL_DEGREES = 0.05
+# Stops closer than this with the same name are one place
+STOP_MERGE_DECIMALS = 4
+
+
+class GridIndex:
+    """Keyed points bucketed by grid cell; not thread-safe, callers lock"""
+
+    def __init__(self, cell_degrees=CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self._cells = {}  # (row, column) -> {key: (latitude, longitude)}
+        self._points = {}  # key -> (cell, latitude, longitude)
+
+    def __len__(self):
+        return len(self._points)
+
+    def _cell(self, latitude, longitude):
+        return (math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees))
+
+    def insert(self, key, latitude, longitude):
+        """Add a point, or move it if the key is already indexed"""
+        cell = self._cell(latitude, longitude)
+        previous = self._points.get(key)
+        if previous is not None and previous[0] != cell:
+            self._discard(key, previous[0])
+        self._cells.setdefault(cell, {})[key] = (latitude, longitude)
+        self._points[key] = (cell, latitude, longitude)
+
+    def remove(self, key):
+        previous = self._points.pop(key, None)
+        if previous is not None:
+            self._discard(key, previous[0])
+
+    def _discard(self, key, cell):
+        bucket = self._cells[cell]
+        del bucket[key]
+        if not bucket:
+            del self._cells[cell]
+
+    def within(self, latitude, longitude, radius_km):
+        """[(distance_km, key)] of the points within radius_km, nearest first"""
+        lat_span = radius_km / KM_PER_DEGREE
+        # Widest longitude span of the circle, at the edge nearest the pole
+        edge_latitude = min(abs(latitude) + lat_span, 89.9)
+        lon_span = radius_km / (KM_PER_DEGREE * math.cos(math.radians(edge_latitude)))
+        row_low, column_low = self._cell(latitude - lat_span, longitude - lon_span)
+        row_high, column_high = self._cell(latitude + lat_span, longitude + lon_span)
+
+        found = []
+        for row in range(row_low, row_high + 1):
+            for column in range(column_low, column_high + 1):
+                bucket = self._cells.get((row, column))
+                if not bucket:
+                    continue
+                for key, (point_latitude, point_longitude) in bucket.items():
+                    distance = geo.point_distance_km(latitude, longitude, point_latitude, point_longitude)
+                    if distance <= radius_km:
+                        found.append((distance, key))
+        found.sort()
+        return found
+
+    def nearest(self, latitude, longitude, k, max_radius_km):
+        """[(distance_km, key)] of the k nearest points within max_radius_km, nearest first"""
+        row, column = self._cell(latitude, longitude)
+        # Shortest cell side anywhere within max_radius_km; cells narrow towards the poles
+        edge_latitude = min(abs(latitude) + max_radius_km / KM_PER_DEGREE + self.cell_degrees, 89.9)
+        cell_km = self.cell_degrees * KM_PER_DEGREE * math.cos(math.radians(edge_latitude))
+        max_ring = math.ceil(max_radius_km / cell_km) + 1
+
+        found = []
+        for ring in range(max_ring + 1):
+            for cell in self._ring(row, column, ring):
+                bucket = self._cells.get(cell)
+                if not bucket:
+                    continue
+                for key, (point_latitude, point_longitude) in bucket.items():
+                    distance = geo.point_distance_km(latitude, longitude, point_latitude, point_longitude)
+                    if distance <= max_radius_km:
+                        found.append((distance, key))
+            # Every point not yet scanned is at least this far away
+            covered_km = ring * cell_km
+            if len(found) >= k and heapq.nsmallest(k, found)[-1][0] <= covered_km:
+                break
+            if covered_km >= max_radius_km:
+                break
+        found.sort()
+        return found[:k]
+
+    def _ring(self, row, column, ring):
+        """Cells on the square ring `ring` cells out from (row, column)"""
+        if ring == 0:
+            yield row, column
+            return
+        for offset in range(-ring, ring + 1):
+            yield row - ring, column + offset
+            yield row + ring, column + offset
+        for offset in range(-ring + 1, ring):
+            yield row + offset, column - ring
+            yield row + offset, column + ring
+
+
+class LiveBusIndex:
+    """Latest position of every live bus, for nearby-bus queries"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._grid = GridIndex()
+        self._buses = {}  # bus_number -> {'route_name', 'latitude', 'longitude', 'last_updated'}
+        self._loaded_until = None  # last_updated high-water mark of database refreshes
+        self._refreshed_at = None
+
+    def observe(self, payload):
+        """Index a tracking_payload of an accepted fix"""
+        location = payload['current_location']
+        last_updated = datetime.datetime.fromisoformat(payload['last_updated'])
+        self._put(
+            payload['bus_number'], payload['route_name'],
+            location['latitude'], location['longitude'], last_updated
+        )
+
+    def _put(self, bus_number, route_name, latitude, longitude, last_updated):
+        with self._lock:
+            current = self._buses.get(bus_number)
+            if current is not None and current['last_updated'] >= last_updated:
+                return
+            self._buses[bus_number] = {
+                'route_name': route_name,
+                'latitude': latitude,
+                'longitude': longitude,
+                'last_updated': last_updated,
+            }
+            self._grid.insert(bus_number, latitude, longitude)
+
+    def refresh(self):
+        """Merge positions written by other processes; at most every REFRESH_SECONDS"""
+        now = time.monotonic()
+        with self._lock:
+            if self._refreshed_at is not None and now - self._refreshed_at < REFRESH_SECONDS:
+                return
+            self._refreshed_at = now
+            loaded_until = self._loaded_until
+
+        since = timezone.now() - datetime.timedelta(seconds=STALE_AFTER_SECONDS)
+        if loaded_until is not None:
+            since = max(since, loaded_until - datetime.timedelta(seconds=REFRESH_OVERLAP_SECONDS))
+        rows = LiveRouteTracking.objects.filter(
+            is_active=True, last_updated__gt=since
+        ).values_list(
+            'bus_route__bus__bus_number', 'bus_route__route__route_name',
+            'current_latitude', 'current_longitude', 'last_updated'
+        )
+        for bus_number, route_name, latitude, longitude, last_updated in rows:
+            self._put(bus_number, route_name, latitude, longitude, last_updated)
+            if loaded_until is None or last_updated > loaded_until:
+                loaded_until = last_updated
+        with self._lock:
+            if loaded_until is not None:
+                self._loaded_until = loaded_until
+
+    def nearby(self, latitude, longitude, radius_km, limit):
+        """Buses within radius_km that reported within the stale threshold, nearest first"""
+        cutoff = timezone.now() - datetime.timedelta(seconds=STALE_AFTER_SECONDS)
+        results = []
+        with self._lock:
+            for distance, bus_number in self._grid.within(latitude, longitude, radius_km):
+                bus = self._buses[bus_number]
+                if bus['last_updated'] < cutoff:
+                    # Silent bus: drop it until it reports again
+                    self._grid.remove(bus_number)
+                    del self._buses[bus_number]
+                    continue
+                results.append({'bus_number': bus_number, 'distance_km': round(distance, 3), **bus})
+                if len(results) == limit:
+                    break
+        return results
+
+
+class StopIndex:
+    """Located route stops merged by place, for nearest-stop queries"""
+
+    def __init__(self, rows):
+        """rows: (stop_name, latitude, longitude, route_id, route_name, stop_sequence)"""
+        self.grid = GridIndex(STOP_CELL_DEGREES)
+        self.places = []  # {'stop_name', 'latitude', 'longitude', 'routes'}
+        place_ids = {}
+        for stop_name, latitude, longitude, route_id, route_name, stop_sequence in rows:
+            place_key = (
+                stop_name.strip().lower(),
+                round(latitude, STOP_MERGE_DECIMALS),
+                round(longitude, STOP_MERGE_DECIMALS)
+            )
+            place_id = place_ids.get(place_key)
+            if place_id is None:
+                place_id = place_ids[place_key] = len(self.places)
+                self.places.append({
+                    'stop_name': stop_name,
+                    'latitude': latitude,
+                    'longitude': longitude,
+                    'routes': []
+                })
+                self.grid.insert(place_id, latitude, longitude)
+            self.places[place_id]['routes'].append({
+                'route_id': route_id,
+                'route_name': route_name,
+                'stop_sequence': stop_sequence
+            })
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        return cls(
+            (stop.stop_name, stop.latitude, stop.longitude, route.route_id, route.route_name, stop.stop_sequence)
+            for route in catalog.active_routes
+            for stop in catalog.stops_of(route.route_id)
+            if stop.latitude is not None and stop.longitude is not None
+        )
+
+    def nearest(self, latitude, longitude, k, max_radius_km):
+        """The k nearest places within max_radius_km, each with its distance_km"""
+        return [
+            {**self.places[place_id], 'distance_km': round(distance, 3)}
+            for distance, place_id in self.grid.nearest(latitude, longitude, k, max_radius_km)
+        ]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_live_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = LiveBusIndex()
+    return _index
+
+
+def get_stop_index():
+    """The StopIndex of the current route catalog"""
+    catalog = get_catalog()
+    return catalog.derived('stop_index', lambda: StopIndex.from_catalog(catalog))
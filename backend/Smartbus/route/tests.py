@@ -1,3 +1,1361 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import date, time, timedelta
+from geopy.distance import geodesic
+from pathlib import Path
+from unittest import mock
+import asyncio
+import io
+import json
+import math
+import random
+import tempfile
+import threading
+
+from . import catalog, geo, live_state, live_tracking_views, resolver
+from .alerts import AlertEngine, REFRESH_AFTER_SECONDS
+from .cities import CityIndex, get_city_index
+from .geometry import RouteGeometry, get_route_geometry
+from .gps_filter import GpsFilter, MAX_CONSECUTIVE_REJECTIONS
+from .ingestion import (
+    FixValidationError, apply_location_fix, is_newer_fix, parse_location_fix, tracking_payload
+)
+from .live_state import LiveStateStore
+from .live_stream import LiveHub, bus_channel, route_channel
+from .models import Route, RouteStop, BusRoute, LiveRouteTracking, BusStatus, BusAlert, RouteCatalogVersion
+from .ping_protocol import PING_CONTENT_TYPE, decode_fix, decode_fixes, encode_fix, encode_fixes
+from .segments import SegmentIndex
+from .spatial import GridIndex, LiveBusIndex
+from .views import get_all_routes
+from users.models import User, Bus
+
+
+def make_route(route_id, route_name, source='Alpha', destination='Omega'):
+    return Route(
+        route_id=route_id, route_name=route_name, source=source, destination=destination,
+        distance=100.0, estimated_duration=timedelta(hours=2), total_fare=250
+    )
+
+
+def make_stops(route_id, names):
+    """Unsaved stops 10 km and 20.00 fare apart, along latitude 28 from longitude 77"""
+    return [
+        RouteStop(
+            route_id=route_id, stop_name=name, stop_sequence=index + 1,
+            latitude=28.0, longitude=77.0 + 0.1 * index,
+            distance_from_source=10.0 * index, fare_from_source=20 * index
+        )
+        for index, name in enumerate(names)
+    ]
+
+
+def make_fix(**fields):
+    return parse_location_fix({'bus_number': 'DL01AB1234', 'latitude': 28.0, 'longitude': 77.0, **fields})
+
+
+class _ManualFlushStore(LiveStateStore):
+    """Write-behind store without the background flusher; tests call flush()"""
+
+    def _ensure_flusher(self):
+        pass
+
+
+class LiveApiTestCase(TestCase):
+    """
+    One route with three stops and one bus operating it, served by fresh
+    process-wide live state (write-through store, hub, index, caches) per test
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.operator = User.objects.create(name='Operator', email='operator@example.com', password='x', user_type='bus')
+        cls.route = Route.objects.create(
+            route_name='Line One', source='Alpha', destination='Omega',
+            distance=20.0, estimated_duration=timedelta(hours=1), total_fare=50
+        )
+        cls.stops = [
+            RouteStop.objects.create(
+                route=cls.route, stop_name=name, stop_sequence=index + 1,
+                latitude=28.0, longitude=77.0 + 0.1 * index,
+                distance_from_source=10.0 * index, fare_from_source=20 * index
+            )
+            for index, name in enumerate(['Alpha Stand', 'Beta Stand', 'Omega Stand'])
+        ]
+        cls.bus_route = cls.create_bus_route('DL01AB1234')
+        cls.bus = cls.bus_route.bus
+
+    @classmethod
+    def create_bus_route(cls, bus_number):
+        bus = Bus.objects.create(user=cls.operator, bus_name=bus_number, bus_number=bus_number, route='Line One')
+        return BusRoute.objects.create(
+            bus=bus, route=cls.route, departure_time=time(8), arrival_time=time(10),
+            effective_from=date.today()
+        )
+
+    def setUp(self):
+        log_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(log_dir.cleanup)
+        self.store = LiveStateStore(log_dir=log_dir.name, flush_interval=0)
+        self.hub = LiveHub()
+        self.live_index = LiveBusIndex()
+        for target, value in (
+            ('route.live_state._store', self.store),
+            ('route.live_stream._hub', self.hub),
+            ('route.spatial._index', self.live_index),
+            ('route.alerts._engine', AlertEngine()),
+            ('route.catalog._catalog', None),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # Alert writes are collected instead of running on the engine's thread
+        self.alert_jobs = []
+        patcher = mock.patch.object(
+            AlertEngine, '_submit', lambda engine, key, func, kwargs: self.alert_jobs.append((func, kwargs))
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        resolver.clear_cache()
+        self.addCleanup(resolver.clear_cache)
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def post_fix(self, path='/api/routes/driver/location/update/', **fields):
+        return self.client.post(
+            path, {'bus_number': 'DL01AB1234', 'latitude': 28.0, 'longitude': 77.0, **fields},
+            content_type='application/json'
+        )
+
+    def tracking(self):
+        return LiveRouteTracking.objects.get(bus_route=self.bus_route)
+
+
+# ====== Fix parsing and ordering ======
+
+class ParseLocationFixTests(SimpleTestCase):
+    def test_converts_numeric_fields(self):
+        fix = make_fix(speed='42.5', passenger_count='7', seq=3)
+        self.assertEqual(fix['speed'], 42.5)
+        self.assertEqual(fix['passenger_count'], 7)
+        self.assertEqual(fix['seq'], 3)
+
+    def test_rejects_non_finite_values(self):
+        for field in ('latitude', 'longitude', 'speed', 'accuracy', 'bearing', 'fuel_level'):
+            for value in (float('nan'), float('inf'), 'NaN'):
+                with self.subTest(field=field, value=value), self.assertRaises(FixValidationError):
+                    make_fix(**{field: value})
+
+    def test_rejects_out_of_range_values(self):
+        for fields in ({'latitude': 90.5}, {'longitude': -181}, {'speed': -1}, {'accuracy': -0.5}):
+            with self.subTest(fields=fields), self.assertRaises(FixValidationError):
+                make_fix(**fields)
+
+    def test_rejects_overflowing_ordering_fields(self):
+        with self.assertRaises(FixValidationError):
+            make_fix(seq=float('inf'))
+
+
+class IsNewerFixTests(SimpleTestCase):
+    def fix(self, seq=None, device_ts=None):
+        return {'seq': seq, 'device_ts': device_ts}
+
+    def test_first_fix_is_newer(self):
+        self.assertTrue(is_newer_fix(self.fix(seq=1), None))
+
+    def test_device_timestamp_decides(self):
+        # A reinstalled app restarts its sequence at 0
+        self.assertTrue(is_newer_fix(self.fix(seq=0, device_ts=2000), (50, 1000)))
+        self.assertFalse(is_newer_fix(self.fix(seq=99, device_ts=500), (50, 1000)))
+
+    def test_sequence_breaks_timestamp_ties(self):
+        self.assertTrue(is_newer_fix(self.fix(seq=6, device_ts=1000), (5, 1000)))
+        self.assertFalse(is_newer_fix(self.fix(seq=5, device_ts=1000), (5, 1000)))
+        self.assertFalse(is_newer_fix(self.fix(device_ts=1000), (None, 1000)))
+
+    def test_sequence_alone(self):
+        self.assertTrue(is_newer_fix(self.fix(seq=6), (5, None)))
+        self.assertFalse(is_newer_fix(self.fix(seq=4), (5, None)))
+
+    def test_fix_without_ordering_fields_is_applied(self):
+        self.assertTrue(is_newer_fix(self.fix(), (5, 1000)))
+
+
+class SequencedPingTests(LiveApiTestCase):
+    def test_retried_ping_is_acknowledged_without_queries(self):
+        self.assertIn('tracking_data', self.post_fix(seq=7, longitude=77.05).json())
+        with self.assertNumQueries(0):
+            result = self.post_fix(seq=7, longitude=77.05).json()
+        self.assertEqual((result['success'], result['ignored'], result['reason']), (True, True, 'stale'))
+
+    def test_older_fix_later_in_a_batch_is_ignored(self):
+        fixes = [
+            {'bus_number': 'DL01AB1234', 'latitude': 28.0, 'longitude': 77.051, 'seq': 2, 'device_ts': 1_760_000_010_000},
+            {'bus_number': 'DL01AB1234', 'latitude': 28.0, 'longitude': 77.05, 'seq': 1, 'device_ts': 1_760_000_000_000},
+        ]
+        data = self.client.post(
+            '/api/routes/driver/location/batch/', {'fixes': fixes}, content_type='application/json'
+        ).json()
+        self.assertEqual((data['accepted'], data['ignored']), (1, 1))
+        self.assertEqual(data['results'][1]['reason'], 'stale')
+        self.assertGreater(self.tracking().current_longitude, 77.0505)
+
+
+# ====== Distances ======
+
+class GeoTests(SimpleTestCase):
+    def test_haversine_stays_within_the_documented_error(self):
+        # One degree of longitude on the equator, then Delhi to Mumbai
+        self.assertAlmostEqual(geo.point_distance_km(0.0, 0.0, 0.0, 1.0), 111.195, places=3)
+        ellipsoidal = geodesic((28.6139, 77.2090), (19.0760, 72.8777)).km
+        self.assertAlmostEqual(
+            geo.point_distance_km(28.6139, 77.2090, 19.0760, 72.8777), ellipsoidal, delta=ellipsoidal * 0.0056
+        )
+
+    def test_vectorized_distances_match_scalar(self):
+        latitudes, longitudes = [28.0, 28.5, 19.0], [77.0, 77.5, 72.8]
+        distances = geo.distances_to_points_km(28.1, 77.1, latitudes, longitudes)
+        for distance, latitude, longitude in zip(distances, latitudes, longitudes):
+            self.assertAlmostEqual(distance, geo.point_distance_km(28.1, 77.1, latitude, longitude), places=9)
+        pairwise = geo.pairwise_distances_km([28.1, 19.1], [77.1, 72.9], latitudes, longitudes)
+        self.assertEqual(pairwise.shape, (2, 3))
+        self.assertAlmostEqual(pairwise[1, 2], geo.point_distance_km(19.1, 72.9, 19.0, 72.8), places=9)
+
+    def test_equirectangular_is_close_for_short_hops(self):
+        haversine = geo.point_distance_km(28.0, 77.0, 28.001, 77.001)
+        self.assertAlmostEqual(float(geo.equirectangular_km(28.0, 77.0, 28.001, 77.001)), haversine, places=6)
+
+    def test_nearest_index_skips_missing_coordinates(self):
+        self.assertEqual(geo.nearest_index(28.0, 77.0, [math.nan, 28.5, 28.1], [math.nan, 77.0, 77.0])[0], 2)
+        self.assertEqual(geo.nearest_index(28.0, 77.0, [math.nan], [math.nan]), (None, math.inf))
+
+
+# ====== Map matching ======
+
+class MapMatchingTests(SimpleTestCase):
+    def setUp(self):
+        self.route = make_route(1, 'Line One')
+        self.stops = make_stops(1, ['A', 'B', 'C'])
+        self.geometry = RouteGeometry(1, self.stops)
+        self.bus_route = BusRoute(id=1, route=self.route, departure_time=None)
+
+    def test_match_gives_continuous_progress(self):
+        first = self.geometry.match(28.0, 77.05)
+        later = self.geometry.match(28.0, 77.15, hint_km=first.distance_along_km)
+        self.assertEqual((first.stop_index, first.next_stop_index), (0, 1))
+        self.assertEqual((later.stop_index, later.next_stop_index), (1, 2))
+        self.assertAlmostEqual(first.progress_percent, 25.0, places=0)
+        self.assertAlmostEqual(later.progress_percent, 75.0, places=0)
+
+    def test_match_at_destination_has_no_next_stop(self):
+        self.assertIsNone(self.geometry.match(28.0, 77.25).next_stop_index)
+
+    def test_payload_reports_next_stop_eta(self):
+        tracking = LiveRouteTracking(current_latitude=28.0, current_longitude=77.0)
+        fix = make_fix(longitude=77.05, speed=40)
+        apply_location_fix(tracking, True, self.bus_route, self.geometry, fix)
+        payload = tracking_payload('DL01AB1234', self.bus_route, tracking)
+        self.assertEqual(payload['next_stop'], 'B')
+        self.assertEqual(payload['eta_next_stop'], tracking.estimated_arrival_next_stop.strftime('%H:%M'))
+        self.assertLess(tracking.estimated_arrival_next_stop, tracking.estimated_arrival_destination)
+
+    def test_standing_bus_has_no_eta(self):
+        tracking = LiveRouteTracking(current_latitude=28.0, current_longitude=77.0)
+        apply_location_fix(tracking, True, self.bus_route, self.geometry, make_fix(longitude=77.05, speed=40))
+        apply_location_fix(tracking, False, self.bus_route, self.geometry, make_fix(longitude=77.05, speed=0))
+        self.assertIsNone(tracking.estimated_arrival_next_stop)
+        self.assertIsNone(tracking.estimated_arrival_destination)
+        self.assertEqual(tracking_payload('DL01AB1234', self.bus_route, tracking)['eta_next_stop'], 'N/A')
+
+
+class RouteProgressTests(LiveApiTestCase):
+    def test_progress_follows_the_bus_along_the_route(self):
+        progress = []
+        for step, longitude in enumerate((77.05, 77.1, 77.15)):
+            # Ten minutes apart, about 30 km/h
+            data = self.post_fix(longitude=longitude, speed=30, device_ts=1_760_000_000_000 + 600_000 * step)
+            progress.append(data.json()['tracking_data']['progress_percent'])
+        self.assertEqual(progress, sorted(progress))
+        self.assertAlmostEqual(progress[-1], 75.0, delta=1.0)
+        tracking = self.tracking()
+        self.assertEqual(
+            (tracking.current_stop.stop_name, tracking.next_stop.stop_name), ('Beta Stand', 'Omega Stand')
+        )
+
+
+# ====== GPS filter ======
+
+class GpsFilterTests(SimpleTestCase):
+    def test_accepts_plausible_movement(self):
+        gps_filter = GpsFilter()
+        for step in range(5):
+            # ~98 m every 10 s, about 35 km/h
+            self.assertIsNotNone(gps_filter.step(28.0, 77.0 + 0.001 * step, 10.0, step * 10.0))
+
+    def test_rejects_inaccurate_fix(self):
+        gps_filter = GpsFilter()
+        gps_filter.step(28.0, 77.0, 10.0, 0.0)
+        self.assertIsNone(gps_filter.step(28.0, 77.001, 500.0, 10.0))
+
+    def test_rejects_teleport_then_follows_persistent_jump(self):
+        gps_filter = GpsFilter()
+        gps_filter.step(28.0, 77.0, 10.0, 0.0)
+        for step in range(1, MAX_CONSECUTIVE_REJECTIONS + 1):
+            self.assertIsNone(gps_filter.step(29.0, 78.0, 10.0, step * 10.0))
+        self.assertEqual(gps_filter.step(29.0, 78.0, 10.0, 100.0), (29.0, 78.0))
+        self.assertTrue(gps_filter.relocated)
+
+    def test_nan_accuracy_does_not_poison_state(self):
+        gps_filter = GpsFilter()
+        gps_filter.step(28.0, 77.0, 10.0, 0.0)
+        self.assertIsNotNone(gps_filter.step(28.0, 77.001, float('nan'), 10.0))
+        for step in range(2, 6):
+            self.assertIsNotNone(gps_filter.step(28.0, 77.0 + 0.001 * step, 10.0, step * 10.0))
+
+    def test_non_finite_state_is_reset(self):
+        gps_filter = GpsFilter()
+        gps_filter.step(28.0, 77.0, 10.0, 0.0)
+        gps_filter.east.position = float('nan')
+        self.assertEqual(gps_filter.step(28.0, 77.001, 10.0, 10.0), (28.0, 77.001))
+        self.assertIsNotNone(gps_filter.step(28.0, 77.002, 10.0, 20.0))
+
+    def test_switching_clocks_restarts_the_filter(self):
+        gps_filter = GpsFilter()
+        gps_filter.step(28.0, 77.0, 10.0, 1_000.0, 'device')
+        # A device clock far behind the server's is not read as a huge gap or a teleport
+        self.assertEqual(gps_filter.step(28.0, 77.001, 10.0, 1_760_000_000.0, 'server'), (28.0, 77.001))
+        self.assertFalse(gps_filter.relocated)
+        self.assertIsNone(gps_filter.step(29.0, 77.001, 10.0, 1_760_000_010.0, 'server'))
+
+
+class StoreGpsFilterTests(SimpleTestCase):
+    def setUp(self):
+        log_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(log_dir.cleanup)
+        self.store = LiveStateStore(log_dir=log_dir.name, flush_interval=0)
+
+    def test_untimed_fixes_are_gated_by_receive_time(self):
+        received_at = timezone.now()
+        self.assertIsNotNone(self.store.filter_fix(make_fix(), received_at=received_at))
+        # ~140 km in 10 s
+        jump = make_fix(latitude=29.26)
+        self.assertIsNone(self.store.filter_fix(jump, received_at=received_at + timedelta(seconds=10)))
+
+    def test_untimed_batch_is_not_rejected(self):
+        # Further untimed fixes of a batch were buffered together, ~85 m apart
+        results = [
+            self.store.filter_fix(make_fix(latitude=28.0 + 0.00077 * index, accuracy=10.0))
+            for index in range(5)
+        ]
+        self.assertNotIn(None, results)
+
+
+class UntimedFixGateTests(LiveApiTestCase):
+    def test_jump_between_untimed_fixes_is_ignored(self):
+        self.assertIn('tracking_data', self.post_fix(longitude=77.05).json())
+        distance_covered = self.tracking().distance_covered
+
+        result = self.post_fix(latitude=29.26, longitude=77.05).json()
+        self.assertEqual((result['ignored'], result['reason']), (True, 'outlier'))
+        tracking = self.tracking()
+        self.assertEqual(tracking.current_latitude, 28.0)
+        self.assertEqual(tracking.distance_covered, distance_covered)
+
+    def test_batch_times_the_first_untimed_fix_of_a_bus(self):
+        self.assertIn('tracking_data', self.post_fix(longitude=77.05).json())
+        response = self.client.post('/api/routes/driver/location/batch/', {'fixes': [
+            {'bus_number': 'DL01AB1234', 'latitude': 29.26, 'longitude': 77.05},
+        ]}, content_type='application/json')
+        self.assertEqual(response.json()['results'][0]['reason'], 'outlier')
+
+
+class BusNumberSpellingTests(LiveApiTestCase):
+    def test_out_of_order_fix_under_another_spelling_is_ignored(self):
+        self.assertIn('tracking_data', self.post_fix(seq=100, longitude=77.05).json())
+        result = self.post_fix(bus_number='dl01ab1234', seq=50, longitude=77.05).json()
+        self.assertEqual((result['ignored'], result['reason']), (True, 'stale'))
+
+    def test_spellings_share_one_gps_filter(self):
+        self.post_fix(longitude=77.05)
+        self.post_fix(bus_number='Dl01Ab1234', longitude=77.051)
+        self.assertEqual(list(self.store._filters), ['DL01AB1234'])
+
+
+# ====== Live state store ======
+
+class LiveStateStoreTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        operator = User.objects.create(name='Operator', email='operator@example.com', password='x', user_type='bus')
+        route = Route.objects.create(
+            route_name='Line One', source='Alpha', destination='Omega',
+            distance=100.0, estimated_duration=timedelta(hours=2), total_fare=250
+        )
+        cls.tracking_ids = []
+        for number in ('DL01AB1234', 'DL01AB5678'):
+            bus = Bus.objects.create(user=operator, bus_name=number, bus_number=number, route='Line One')
+            bus_route = BusRoute.objects.create(
+                bus=bus, route=route, departure_time=time(8), arrival_time=time(10), effective_from=date.today()
+            )
+            cls.tracking_ids.append(LiveRouteTracking.objects.create(
+                bus_route=bus_route, current_latitude=28.0, current_longitude=77.0, direction='to_destination'
+            ).pk)
+
+    def setUp(self):
+        log_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(log_dir.cleanup)
+        self.log_dir = Path(log_dir.name)
+
+    def trackings(self):
+        return [LiveRouteTracking.objects.get(pk=pk) for pk in self.tracking_ids]
+
+    def speed(self, tracking):
+        return LiveRouteTracking.objects.filter(pk=tracking.pk).values_list('current_speed', flat=True)[0]
+
+    def test_failed_log_rotation_keeps_rows_queued(self):
+        store = _ManualFlushStore(log_dir=self.log_dir, flush_interval=60)
+        tracking = self.trackings()[0]
+        with store.lock:
+            tracking.current_speed = 31
+            store.mark_dirty(trackings=[tracking])
+        with mock.patch.object(store, '_rotate_log', side_effect=OSError('No space left on device')):
+            with self.assertRaises(OSError):
+                store.flush()
+        self.assertEqual(store.flush(), 1)
+        self.assertEqual(self.speed(tracking), 31)
+
+
+    def test_flush_skips_rows_another_process_wrote_since(self):
+        store = _ManualFlushStore(log_dir=self.log_dir, flush_interval=60)
+        bus_route = BusRoute.objects.get(live_tracking__pk=self.tracking_ids[0])
+        tracking, _ = store.tracking_for(bus_route, {})
+        with store.lock:
+            tracking.current_speed = 50
+            tracking.last_updated = timezone.now()
+            store.mark_dirty(trackings=[tracking])
+        # Another worker received a later fix for the same bus
+        LiveRouteTracking.objects.filter(pk=tracking.pk).update(
+            current_speed=60, last_updated=tracking.last_updated + timedelta(seconds=5)
+        )
+        with self.assertLogs('route.live_state', 'WARNING'):
+            self.assertEqual(store.flush(), 0)
+        self.assertEqual(self.speed(tracking), 60)
+        self.assertIsNone(store.peek_tracking(bus_route.id))
+        self.assertEqual(store.tracking_for(bus_route, {})[0].current_speed, 60)
+
+    def test_flush_writes_fix_received_before_its_row_was_loaded(self):
+        store = _ManualFlushStore(log_dir=self.log_dir, flush_interval=60)
+        bus_route = BusRoute.objects.get(live_tracking__pk=self.tracking_ids[0])
+        received_at = timezone.now()
+        LiveRouteTracking.objects.filter(pk=self.tracking_ids[0]).update(
+            last_updated=received_at + timedelta(seconds=1)
+        )
+        tracking, _ = store.tracking_for(bus_route, {})
+        with store.lock:
+            tracking.current_speed = 42
+            tracking.last_updated = received_at
+            store.mark_dirty(trackings=[tracking])
+        self.assertEqual(store.flush(), 1)
+        self.assertEqual(self.speed(tracking), 42)
+
+
+    def test_recover_replays_the_log_of_a_crashed_store(self):
+        crashed = _ManualFlushStore(log_dir=self.log_dir, flush_interval=60)
+        tracking = self.trackings()[0]
+        with crashed.lock:
+            tracking.current_speed = 27
+            tracking.last_updated = timezone.now()
+            crashed.mark_dirty(trackings=[tracking])
+        # The process died before its flusher wrote the row
+        crashed._log_file.close()
+        live_state._run_ids.discard(crashed._run_id)
+        self.assertEqual(self.speed(tracking), 0)
+
+        store = _ManualFlushStore(log_dir=self.log_dir, flush_interval=60)
+        self.assertEqual(store.recover(), 1)
+        self.assertEqual(self.speed(tracking), 27)
+        self.assertEqual(list(self.log_dir.iterdir()), [])
+        # Replayed segments are gone, so a second recovery has nothing to do
+        self.assertEqual(store.recover(), 0)
+
+
+class WriteBehindIngestionTests(LiveApiTestCase):
+    def test_fixes_reach_the_database_on_flush(self):
+        log_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(log_dir.cleanup)
+        store = _ManualFlushStore(log_dir=log_dir.name, flush_interval=60)
+        with mock.patch('route.live_state._store', store):
+            self.post_fix(longitude=77.05, device_ts=1_760_000_000_000)
+            store.flush()
+            with self.assertNumQueries(0):
+                data = self.post_fix(longitude=77.051, device_ts=1_760_000_010_000).json()
+            self.assertIn('tracking_data', data)
+            self.assertLess(self.tracking().current_longitude, 77.0505)
+            store.flush()
+        self.assertGreater(self.tracking().current_longitude, 77.0505)
+
+class FlusherThreadTests(SimpleTestCase):
+    def test_flusher_survives_a_failed_flush(self):
+        log_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(log_dir.cleanup)
+        store = LiveStateStore(log_dir=Path(log_dir.name) / 'live_state', flush_interval=0.01)
+        rotations = []
+        retried = threading.Event()
+
+        def rotate_log():
+            rotations.append(None)
+            if len(rotations) == 1:
+                raise OSError('No space left on device')
+            retried.set()
+            return 0
+
+        with mock.patch.object(store, '_rotate_log', rotate_log), mock.patch.object(live_state.atexit, 'register'):
+            with self.assertLogs('route.live_state', 'ERROR'):
+                store._ensure_flusher()
+                self.assertTrue(retried.wait(5))
+            self.assertTrue(store._flusher.is_alive())
+            store._stop.set()
+            store._flusher.join(5)
+
+
+# ====== Bus resolver ======
+
+class ResolverTests(LiveApiTestCase):
+    def test_resolves_any_case_through_the_bus_number_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            resolved = resolver.resolve_buses(['dl01ab1234', 'DL01AB1234'])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('UPPER(', queries[0]['sql'])
+        self.assertEqual(resolved['dl01ab1234'], resolved['DL01AB1234'])
+        self.assertEqual(resolved['dl01ab1234'].bus_route_id, self.bus_route.id)
+
+    def test_hits_are_served_from_the_cache(self):
+        resolver.resolve_bus('DL01AB1234')
+        with self.assertNumQueries(0):
+            self.assertEqual(resolver.resolve_bus('dl01ab1234').bus_id, str(self.bus.id))
+
+    def test_bus_without_route_and_unknown_bus(self):
+        Bus.objects.create(user=self.operator, bus_name='Two', bus_number='DL01AB9999', route='')
+        with self.assertNumQueries(2):
+            resolved = resolver.resolve_buses(['DL01AB9999', 'NOPE'])
+        self.assertIsNotNone(resolved['DL01AB9999'].bus_id)
+        self.assertIsNone(resolved['DL01AB9999'].bus_route)
+        self.assertIsNone(resolved['NOPE'].bus_id)
+
+    def test_unknown_numbers_expire_after_the_miss_ttl(self):
+        resolver.resolve_bus('NOPE')
+        with self.assertNumQueries(0):
+            resolver.resolve_bus('NOPE')
+        with mock.patch.object(resolver, 'MISS_TTL_SECONDS', 0), self.assertNumQueries(2):
+            resolver.resolve_bus('NOPE')
+
+    def test_cache_is_bounded(self):
+        with mock.patch.object(resolver, 'CACHE_SIZE', 2):
+            resolver.resolve_buses(['DL01AB1234', 'NOPE1', 'NOPE2'])
+            self.assertEqual(len(resolver._cache), 2)
+
+    def test_saving_the_bus_invalidates_it(self):
+        resolver.resolve_bus('DL01AB1234')
+        self.bus.bus_number = 'DL01AB4321'
+        self.bus.save()
+        self.assertIsNone(resolver.resolve_bus('DL01AB1234').bus_id)
+        self.assertEqual(resolver.resolve_bus('dl01ab4321').bus_id, str(self.bus.id))
+
+
+# ====== Live streams ======
+
+class LiveStreamTests(LiveApiTestCase):
+    def stream(self, path, publish):
+        """The first two frames of a stream: its snapshot, then the frame after publish() runs"""
+        async def read():
+            response = await self.async_client.get(path)
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            frames = aiter(response.streaming_content)
+            try:
+                snapshot = await anext(frames)
+                publish()
+                return snapshot, await asyncio.wait_for(anext(frames), 5)
+            finally:
+                await frames.aclose()
+        return async_to_sync(read)()
+
+    def test_channels_ignore_case(self):
+        self.assertEqual(bus_channel('dl01ab1234'), bus_channel('DL01AB1234'))
+        self.assertEqual(route_channel('line one'), route_channel('Line One'))
+
+    def test_bus_stream_under_another_spelling_gets_positions(self):
+        payload = self.post_fix(longitude=77.05).json()['tracking_data']
+        moved = {**payload, 'speed': 41.0}
+        snapshot, position = self.stream(
+            '/api/routes/live/dl01ab1234/stream/', lambda: self.hub.publish_position(moved)
+        )
+        self.assertTrue(snapshot.startswith(b'retry: 3000\nevent: snapshot\n'))
+        self.assertTrue(position.startswith(b'event: position\n'))
+        self.assertIn(b'"speed":41.0', position)
+        # Closing the stream unsubscribes it
+        self.assertFalse(self.hub._subscribers.get(bus_channel('DL01AB1234')))
+
+    def test_route_stream_gets_positions_of_its_buses(self):
+        payload = self.post_fix(longitude=77.05).json()['tracking_data']
+        moved = {**payload, 'speed': 23.0}
+        snapshot, position = self.stream(
+            '/api/routes/live/route/line one/stream/', lambda: self.hub.publish_position(moved)
+        )
+        self.assertIn(b'"total_active_buses": 1', snapshot)
+        self.assertIn(b'"bus_number":"DL01AB1234"', position)
+        self.assertIn(b'"speed":23.0', position)
+
+    def test_unknown_bus_is_not_streamed(self):
+        response = async_to_sync(self.async_client.get)('/api/routes/live/XX00ZZ0000/stream/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.hub.subscriber_count(), 0)
+
+    def test_streams_need_the_asgi_application(self):
+        self.assertEqual(self.client.get('/api/routes/live/DL01AB1234/stream/').status_code, 501)
+
+
+# ====== Stale bus sweeper ======
+
+class SweepStaleBusesTests(LiveApiTestCase):
+    def sweep(self, *args):
+        call_command('sweep_stale_buses', '--once', *args, stdout=io.StringIO())
+
+    def test_marks_silent_buses_inactive_and_offline(self):
+        self.post_fix(longitude=77.05)
+        long_ago = timezone.now() - timedelta(hours=1)
+        LiveRouteTracking.objects.update(last_updated=long_ago)
+        BusStatus.objects.update(updated_at=long_ago)
+        with self.assertNumQueries(2):
+            self.sweep()
+        self.assertFalse(self.tracking().is_active)
+        self.assertEqual(BusStatus.objects.get(bus=self.bus).current_status, 'offline')
+
+    def test_keeps_reporting_buses(self):
+        self.post_fix(longitude=77.05)
+        self.sweep()
+        self.assertTrue(self.tracking().is_active)
+        self.assertNotEqual(BusStatus.objects.get(bus=self.bus).current_status, 'offline')
+
+    def test_rejects_threshold_below_the_status_heartbeat(self):
+        with self.assertRaisesMessage(CommandError, '--stale-after must be at least'):
+            self.sweep('--stale-after', str(int(live_state.STATUS_HEARTBEAT_SECONDS) - 1))
+        self.sweep('--stale-after', str(int(live_state.STATUS_HEARTBEAT_SECONDS)))
+
+
+# ====== Batch ingestion ======
+
+class BatchIngestionTests(LiveApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.bus_numbers = ['DL01AB1234', 'DL01AB0002', 'DL01AB0003']
+        for number in cls.bus_numbers[1:]:
+            cls.create_bus_route(number)
+
+    def post_batch(self, fixes):
+        return self.client.post('/api/routes/driver/location/batch/', {'fixes': fixes}, content_type='application/json')
+
+    def fixes(self, bus_numbers, longitude=77.05, device_ts=1_760_000_000_000):
+        return [
+            {'bus_number': number, 'latitude': 28.0, 'longitude': longitude, 'device_ts': device_ts}
+            for number in bus_numbers
+        ]
+
+    def test_applies_each_fix_and_reports_the_rest(self):
+        fixes = self.fixes(self.bus_numbers[:2]) + [
+            {'bus_number': 'XX00ZZ0000', 'latitude': 28.0, 'longitude': 77.0},
+            {'bus_number': 'DL01AB0003', 'latitude': 91.0, 'longitude': 77.0},
+        ]
+        data = self.post_batch(fixes).json()
+        self.assertEqual((data['accepted'], data['ignored'], data['rejected']), (2, 0, 2))
+        self.assertEqual([result.get('status') for result in data['results']], [None, None, 404, 400])
+        self.assertEqual(
+            LiveRouteTracking.objects.filter(current_longitude__gt=77.04).count(), 2
+        )
+
+    def test_rejects_empty_and_oversized_batches(self):
+        self.assertEqual(self.post_batch([]).status_code, 400)
+        with mock.patch('route.live_tracking_views.MAX_BATCH_SIZE', 2):
+            self.assertEqual(self.post_batch(self.fixes(self.bus_numbers)).status_code, 400)
+
+    def test_queries_do_not_grow_with_batch_size(self):
+        self.post_batch(self.fixes(self.bus_numbers))
+        for step, bus_numbers in enumerate((self.bus_numbers[:1], self.bus_numbers), start=1):
+            fixes = self.fixes(bus_numbers, 77.05 + 0.001 * step, 1_760_000_000_000 + 10_000 * step)
+            # Savepoint, superseded-row check, bulk update, breadcrumbs, release
+            with self.assertNumQueries(5):
+                self.assertEqual(self.post_batch(fixes).json()['accepted'], len(bus_numbers))
+
+
+# ====== Route geometry ======
+
+class RouteGeometryCacheTests(LiveApiTestCase):
+    def test_geometry_is_built_once_per_catalog(self):
+        geometry = get_route_geometry(self.route.route_id)
+        self.assertEqual([stop.stop_name for stop in geometry.stops], ['Alpha Stand', 'Beta Stand', 'Omega Stand'])
+        with self.assertNumQueries(0):
+            self.assertIs(get_route_geometry(self.route.route_id), geometry)
+
+    def test_stop_changes_rebuild_the_geometry(self):
+        geometry = get_route_geometry(self.route.route_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            RouteStop.objects.create(
+                route=self.route, stop_name='Delta Stand', stop_sequence=4,
+                latitude=28.0, longitude=77.3, distance_from_source=30.0, fare_from_source=60
+            )
+        rebuilt = get_route_geometry(self.route.route_id)
+        self.assertIsNot(rebuilt, geometry)
+        self.assertEqual(len(rebuilt), 4)
+
+
+# ====== Delay alerts ======
+
+class AlertEngineTests(LiveApiTestCase):
+    def observe(self, *delays):
+        engine = AlertEngine()
+        return [engine.observe_delay(self.bus_route, delay) for delay in delays]
+
+    def run_jobs(self):
+        for func, kwargs in self.alert_jobs:
+            func(**kwargs)
+        self.alert_jobs.clear()
+
+    def test_emits_on_threshold_crossings_only(self):
+        self.assertEqual(
+            self.observe(0, 5, 12, 15, 18, 25, 25, 12, 0, 3),
+            [True, False, True, False, False, True, False, True, True, False]
+        )
+
+    def test_keeps_one_alert_per_bus_route(self):
+        engine = AlertEngine()
+        engine.observe_delay(self.bus_route, 12)
+        self.run_jobs()
+        engine.observe_delay(self.bus_route, 35)
+        self.run_jobs()
+        alert = BusAlert.objects.get(bus_route=self.bus_route, alert_type='delay')
+        self.assertEqual((alert.priority, alert.is_active), ('critical', True))
+        self.assertIn('35 minutes', alert.message)
+
+        engine.observe_delay(self.bus_route, 0)
+        self.run_jobs()
+        alert.refresh_from_db()
+        self.assertFalse(alert.is_active)
+        self.assertEqual(BusAlert.objects.filter(alert_type='delay').count(), 1)
+
+    def test_refreshes_an_unchanged_alert_before_it_expires(self):
+        engine = AlertEngine()
+        with mock.patch('route.alerts.time.monotonic', return_value=1_000.0):
+            self.assertTrue(engine.observe_delay(self.bus_route, 12))
+            self.assertFalse(engine.observe_delay(self.bus_route, 12))
+        with mock.patch('route.alerts.time.monotonic', return_value=1_000.0 + REFRESH_AFTER_SECONDS):
+            self.assertTrue(engine.observe_delay(self.bus_route, 12))
+
+
+# ====== Async live tracking views ======
+
+class AsyncViewTests(LiveApiTestCase):
+    def test_ingestion_and_live_views_are_async(self):
+        for view in (
+            live_tracking_views.driver_update_location,
+            live_tracking_views.driver_update_location_batch,
+            live_tracking_views.get_live_bus_location,
+            live_tracking_views.get_route_live_overview,
+            live_tracking_views.get_nearby_buses,
+        ):
+            self.assertTrue(asyncio.iscoroutinefunction(view), view.__name__)
+
+    def test_fix_and_location_over_asgi(self):
+        async def exchange():
+            update = await self.async_client.post(
+                '/api/routes/driver/location/update/',
+                {'bus_number': 'DL01AB1234', 'latitude': 28.0, 'longitude': 77.05, 'speed': 30},
+                content_type='application/json'
+            )
+            location = await self.async_client.get('/api/routes/live/DL01AB1234/')
+            missing = await self.async_client.get('/api/routes/live/XX00ZZ0000/')
+            return update, location, missing
+
+        update, location, missing = async_to_sync(exchange)()
+        self.assertEqual(update.status_code, 200)
+        self.assertEqual(
+            location.json()['live_location']['longitude'],
+            update.json()['tracking_data']['current_location']['longitude']
+        )
+        self.assertEqual(location.json()['route_progress']['next_stop'], 'Beta Stand')
+        self.assertEqual(missing.status_code, 404)
+
+    def test_driver_endpoint_errors(self):
+        response = self.client.post('/api/routes/driver/location/update/', 'not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post_fix(bus_number='XX00ZZ0000').status_code, 404)
+        self.assertEqual(self.client.get('/api/routes/driver/location/update/').status_code, 405)
+
+
+# ====== Binary ping protocol ======
+
+class PingProtocolTests(SimpleTestCase):
+    def test_round_trip(self):
+        raw = {
+            'bus_number': 'DL01AB1234', 'latitude': 28.6648123, 'longitude': 77.2426456,
+            'speed': 42.5, 'bearing': 90.0, 'accuracy': 8.0, 'altitude': 216.0,
+            'engine_on': False, 'passenger_count': 31, 'fuel_level': 64.5,
+            'seq': 17, 'device_ts': 1760000000123,
+        }
+        decoded = parse_location_fix(decode_fix(encode_fix(raw)))
+        expected = parse_location_fix(raw)
+        for field, value in expected.items():
+            if isinstance(value, float):
+                self.assertAlmostEqual(decoded[field], value, places=5, msg=field)
+            else:
+                self.assertEqual(decoded[field], value, msg=field)
+
+    def test_optional_fields_are_omitted(self):
+        fix = decode_fix(encode_fix({'bus_number': 'X1', 'latitude': 1.0, 'longitude': 2.0}))
+        self.assertNotIn('seq', fix)
+        self.assertIsNone(parse_location_fix(fix)['device_ts'])
+
+    def test_batch_round_trip(self):
+        fixes = [{'bus_number': f'B{index}', 'latitude': index, 'longitude': -index, 'seq': index} for index in range(3)]
+        decoded = decode_fixes(encode_fixes(fixes))
+        self.assertEqual([fix['bus_number'] for fix in decoded], ['B0', 'B1', 'B2'])
+        self.assertEqual([fix['seq'] for fix in decoded], [0, 1, 2])
+
+    def test_malformed_records(self):
+        body = encode_fix({'bus_number': 'X1', 'latitude': 1.0, 'longitude': 2.0})
+        for bad in (body[:-1], body + b'\x00', b'\x02' + body[1:]):
+            with self.subTest(bad=bad), self.assertRaises(FixValidationError):
+                decode_fix(bad)
+
+
+class BinaryPingEndpointTests(LiveApiTestCase):
+    def test_single_binary_ping(self):
+        body = encode_fix({'bus_number': 'DL01AB1234', 'latitude': 28.0, 'longitude': 77.05, 'speed': 30.0})
+        response = self.client.post('/api/routes/driver/location/update/', body, content_type=PING_CONTENT_TYPE)
+        self.assertEqual(response.json()['tracking_data']['next_stop'], 'Beta Stand')
+
+    def test_binary_batch(self):
+        body = encode_fixes([
+            {'bus_number': 'DL01AB1234', 'latitude': 28.0, 'longitude': 77.05, 'device_ts': 1_760_000_000_000},
+            {'bus_number': 'DL01AB1234', 'latitude': 28.0, 'longitude': 77.051, 'device_ts': 1_760_000_010_000},
+        ])
+        response = self.client.post('/api/routes/driver/location/batch/', body, content_type=PING_CONTENT_TYPE)
+        self.assertEqual(response.json()['accepted'], 2)
+
+    def test_malformed_binary_ping(self):
+        body = encode_fix({'bus_number': 'DL01AB1234', 'latitude': 28.0, 'longitude': 77.05})[:-1]
+        response = self.client.post('/api/routes/driver/location/update/', body, content_type=PING_CONTENT_TYPE)
+        self.assertEqual(response.status_code, 400)
+
+
+# ====== Dirty-field tracking ======
+
+class TrackedFieldsTests(LiveApiTestCase):
+    def setUp(self):
+        super().setUp()
+        LiveRouteTracking.objects.create(
+            bus_route=self.bus_route, current_latitude=28.0, current_longitude=77.0, direction='to_destination'
+        )
+
+    def test_save_writes_only_changed_columns(self):
+        tracking = self.tracking()
+        tracking.current_speed = 35
+        with CaptureQueriesContext(connection) as queries:
+            tracking.save()
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql']
+        self.assertIn('"current_speed"', sql)
+        self.assertIn('"last_updated"', sql)
+        self.assertNotIn('"current_latitude"', sql)
+        self.assertEqual(tracking.changed_fields(), [])
+
+    def test_unchanged_save_is_skipped(self):
+        tracking = self.tracking()
+        with self.assertNumQueries(0):
+            tracking.save()
+
+    def test_mark_all_changed_rewrites_every_column(self):
+        tracking = self.tracking()
+        tracking.mark_all_changed()
+        self.assertIn('current_latitude', tracking.changed_fields())
+        with CaptureQueriesContext(connection) as queries:
+            tracking.save()
+        self.assertIn('"current_latitude"', queries[0]['sql'])
+        self.assertEqual(tracking.changed_fields(), [])
+
+    def test_status_heartbeat_alone_waits_for_the_interval(self):
+        bus_status = BusStatus.objects.create(bus=self.bus)
+        bus_status.updated_at += timedelta(seconds=1)
+        self.assertEqual(live_state._changed_rows(BusStatus, [bus_status], ['updated_at'], 'updated_at'), [])
+        bus_status.updated_at += timedelta(seconds=live_state.STATUS_HEARTBEAT_SECONDS)
+        self.assertEqual(len(live_state._changed_rows(BusStatus, [bus_status], ['updated_at'], 'updated_at')), 1)
+
+
+# ====== Fleet simulator ======
+
+class SimulateFleetTests(LiveApiTestCase):
+    def simulate(self, *args):
+        out = io.StringIO()
+        call_command('simulate_fleet', '--pings', '3', *args, stdout=out)
+        return out.getvalue()
+
+    def test_simulated_buses_report_through_the_driver_endpoint(self):
+        output = self.simulate('--buses', '3', '--create-buses', '--binary')
+        self.assertIn('accepted 9  ignored 0  errors 0', output)
+        self.assertIn('DB queries per request', output)
+        self.assertEqual(LiveRouteTracking.objects.filter(is_active=True).count(), 3)
+
+        self.simulate('--remove-buses')
+        self.assertFalse(Bus.objects.filter(bus_number__startswith='SIM').exists())
+        self.assertTrue(Bus.objects.filter(pk=self.bus.pk).exists())
+
+    def test_more_buses_than_operational_need_create_buses(self):
+        with self.assertRaisesMessage(CommandError, '--create-buses'):
+            self.simulate('--buses', '2')
+
+
+# ====== Route live overview ======
+
+class RouteOverviewTests(LiveApiTestCase):
+    def overview(self):
+        return self.client.get('/api/routes/live/route/line one/')
+
+    def test_lists_reporting_buses_and_stops(self):
+        self.post_fix(longitude=77.05, passenger_count=12)
+        data = self.overview().json()
+        self.assertEqual([bus['bus_number'] for bus in data['active_buses']], ['DL01AB1234'])
+        self.assertEqual(data['active_buses'][0]['next_stop'], 'Beta Stand')
+        self.assertEqual(data['active_buses'][0]['passenger_count'], 12)
+        self.assertEqual(
+            [stop['stop_name'] for stop in data['route_stops']], ['Alpha Stand', 'Beta Stand', 'Omega Stand']
+        )
+
+    def test_queries_do_not_grow_with_buses(self):
+        bus_numbers = ['DL01AB1234']
+        for count in (1, 3):
+            while len(bus_numbers) < count:
+                bus_numbers.append(self.create_bus_route(f'DL01AB000{len(bus_numbers) + 1}').bus.bus_number)
+            for number in bus_numbers:
+                self.post_fix(bus_number=number, longitude=77.05, device_ts=1_760_000_000_000 + 10_000 * count)
+            # Trackings held by another process are read from the database
+            self.store._trackings.clear()
+            self.store._statuses.clear()
+            cache.clear()
+            # Bus routes with bus and status, then their latest trackings
+            with self.assertNumQueries(2):
+                self.assertEqual(self.overview().json()['total_active_buses'], count)
+
+    def test_viewers_share_a_snapshot(self):
+        self.post_fix(longitude=77.05)
+        self.overview()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.overview().json()['total_active_buses'], 1)
+
+    def test_unknown_route(self):
+        self.assertEqual(self.client.get('/api/routes/live/route/nowhere/').status_code, 404)
+
+
+# ====== Spatial indexes ======
+
+class GridIndexTests(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.points = {key: (28.0 + rng.uniform(-0.2, 0.2), 77.0 + rng.uniform(-0.2, 0.2)) for key in range(300)}
+        self.grid = GridIndex()
+        for key, (latitude, longitude) in self.points.items():
+            self.grid.insert(key, latitude, longitude)
+
+    def brute_force(self, latitude, longitude):
+        return sorted(
+            (geo.point_distance_km(latitude, longitude, *point), key) for key, point in self.points.items()
+        )
+
+    def test_within_matches_a_full_scan(self):
+        for radius_km in (0.5, 2.0, 7.5):
+            expected = [found for found in self.brute_force(28.03, 77.01) if found[0] <= radius_km]
+            self.assertEqual(self.grid.within(28.03, 77.01, radius_km), expected)
+
+    def test_nearest_matches_a_full_scan(self):
+        for k in (1, 5, 40):
+            self.assertEqual(self.grid.nearest(28.03, 77.01, k, 50.0), self.brute_force(28.03, 77.01)[:k])
+        # Never beyond max_radius_km, even when fewer than k points are that close
+        close = [found for found in self.brute_force(28.03, 77.01) if found[0] <= 1.0]
+        self.assertEqual(self.grid.nearest(28.03, 77.01, 300, 1.0), close)
+
+    def test_moved_and_removed_points(self):
+        self.grid.insert(0, 40.0, 70.0)
+        self.assertEqual([key for _, key in self.grid.within(40.0, 70.0, 0.1)], [0])
+        self.grid.remove(0)
+        self.assertEqual(self.grid.within(40.0, 70.0, 0.1), [])
+        self.assertEqual(len(self.grid), 299)
+
+
+class NearbyBusesTests(LiveApiTestCase):
+    def nearby(self, **params):
+        return self.client.get('/api/routes/live/nearby/', {'lat': 28.0, 'lng': 77.05, **params})
+
+    def test_buses_within_the_radius_nearest_first(self):
+        self.create_bus_route('DL01AB0002')
+        self.create_bus_route('DL01AB0003')
+        self.post_fix(longitude=77.06)
+        self.post_fix(bus_number='DL01AB0002', longitude=77.051)
+        self.post_fix(bus_number='DL01AB0003', longitude=77.15)
+        data = self.nearby(radius=2).json()
+        self.assertEqual([bus['bus_number'] for bus in data['buses']], ['DL01AB0002', 'DL01AB1234'])
+        self.assertAlmostEqual(data['buses'][0]['distance_km'], 0.098, delta=0.002)
+        self.assertEqual(data['buses'][1]['route_name'], 'Line One')
+        self.assertEqual(len(self.nearby(radius=2, limit=1).json()['buses']), 1)
+
+    def test_positions_written_by_other_processes_are_loaded(self):
+        LiveRouteTracking.objects.create(
+            bus_route=self.bus_route, current_latitude=28.0, current_longitude=77.052, direction='to_destination'
+        )
+        self.assertEqual([bus['bus_number'] for bus in self.nearby().json()['buses']], ['DL01AB1234'])
+
+    def test_silent_buses_are_dropped(self):
+        self.post_fix(longitude=77.051)
+        with mock.patch('route.spatial.timezone.now', return_value=timezone.now() + timedelta(hours=1)):
+            self.assertEqual(self.nearby().json()['buses'], [])
+
+    def test_invalid_queries(self):
+        for params in ({'lat': 'north'}, {'lat': 91}, {'radius': 0}, {'radius': 51}, {'limit': 0}):
+            with self.subTest(params=params):
+                self.assertEqual(self.nearby(**params).status_code, 400)
+        self.assertEqual(self.client.get('/api/routes/live/nearby/').status_code, 400)
+
+
+class NearestStopsTests(LiveApiTestCase):
+    def nearest(self, **params):
+        return self.client.get('/api/routes/stops/nearest/', {'lat': 28.0, 'lng': 77.09, **params})
+
+    def test_nearest_places_with_their_routes(self):
+        crossing = Route.objects.create(
+            route_name='Cross Line', source='Beta', destination='Gamma',
+            distance=5.0, estimated_duration=timedelta(minutes=20), total_fare=10
+        )
+        RouteStop.objects.create(
+            route=crossing, stop_name='beta stand', stop_sequence=1, latitude=28.0, longitude=77.1,
+            distance_from_source=0.0, fare_from_source=0
+        )
+        data = self.nearest(k=2).json()
+        # One place per stop name and position, whatever the spelling
+        self.assertEqual([stop['stop_name'].lower() for stop in data['stops']], ['beta stand', 'alpha stand'])
+        self.assertAlmostEqual(data['stops'][0]['distance_km'], 0.983, delta=0.002)
+        self.assertEqual(
+            sorted((route['route_name'], route['stop_sequence']) for route in data['stops'][0]['routes']),
+            [('Cross Line', 1), ('Line One', 2)]
+        )
+
+    def test_radius_bounds_the_search(self):
+        self.assertEqual([stop['stop_name'] for stop in self.nearest(radius=2).json()['stops']], ['Beta Stand'])
+
+    def test_index_is_built_once_per_catalog(self):
+        self.nearest()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.nearest().json()['total'], 3)
+
+    def test_invalid_queries(self):
+        for params in ({'lng': 'east'}, {'lng': 181}, {'k': 0}, {'radius': -1}):
+            with self.subTest(params=params):
+                self.assertEqual(self.nearest(**params).status_code, 400)
+
+
+# ====== Conditional GET ======
+
+class ConditionalGetTests(LiveApiTestCase):
+    def revalidate(self, path):
+        """(first response, response to a request with its ETag)"""
+        first = self.client.get(path)
+        self.assertEqual(first.status_code, 200)
+        return first, self.client.get(path, HTTP_IF_NONE_MATCH=first['ETag'])
+
+    def test_live_location_is_not_modified_until_the_bus_reports(self):
+        self.post_fix(longitude=77.05, device_ts=1_760_000_000_000)
+        first, again = self.revalidate('/api/routes/live/DL01AB1234/')
+        self.assertTrue(first['ETag'].startswith('W/"'))
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+        since = self.client.get('/api/routes/live/DL01AB1234/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+
+        self.post_fix(longitude=77.051, device_ts=1_760_000_010_000)
+        moved = self.client.get('/api/routes/live/DL01AB1234/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(moved.status_code, 200)
+        self.assertNotEqual(moved['ETag'], first['ETag'])
+
+    def test_route_overview_revalidates(self):
+        self.post_fix(longitude=77.05, device_ts=1_760_000_000_000)
+        first, again = self.revalidate('/api/routes/live/route/Line One/')
+        self.assertEqual(again.status_code, 304)
+        self.post_fix(longitude=77.051, device_ts=1_760_000_010_000)
+        cache.clear()
+        moved = self.client.get('/api/routes/live/route/Line One/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(moved.status_code, 200)
+
+    def test_legacy_tracking_revalidates(self):
+        self.post_fix(longitude=77.05)
+        _, again = self.revalidate(f'/api/routes/tracking/{self.bus_route.id}/')
+        self.assertEqual(again.status_code, 304)
+
+    def test_route_details_change_with_the_catalog(self):
+        path = f'/api/routes/{self.route.route_id}/'
+        first, again = self.revalidate(path)
+        self.assertEqual(again.status_code, 304)
+        stop = self.stops[1]
+        stop.stop_name = 'Beta Market'
+        with self.captureOnCommitCallbacks(execute=True):
+            stop.save()
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+
+# ====== Route catalog ======
+
+class RouteCatalogTests(LiveApiTestCase):
+    def test_catalog_is_reused_until_the_version_moves(self):
+        catalog.current_version()
+        # Version, routes, stops, bus routes
+        with self.assertNumQueries(4):
+            loaded = catalog.get_catalog()
+        self.assertEqual([stop.stop_name for stop in loaded.stops_of(self.route.route_id)][-1], 'Omega Stand')
+        with self.assertNumQueries(0):
+            self.assertIs(catalog.get_catalog(), loaded)
+        # Past the check interval one version query confirms it
+        with mock.patch('route.catalog.VERSION_CHECK_SECONDS', 0), self.assertNumQueries(1):
+            self.assertIs(catalog.get_catalog(), loaded)
+
+    def test_version_bumped_by_another_worker_reloads(self):
+        loaded = catalog.get_catalog()
+        RouteCatalogVersion.objects.filter(pk=catalog.VERSION_ROW_ID).update(version=loaded.version + 1)
+        with mock.patch('route.catalog.VERSION_CHECK_SECONDS', 0):
+            reloaded = catalog.get_catalog()
+        self.assertIsNot(reloaded, loaded)
+        self.assertEqual(reloaded.version, loaded.version + 1)
+
+    def test_model_changes_bump_the_version_after_commit(self):
+        version = catalog.get_catalog().version
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_bus_route('DL01AB0002')
+        reloaded = catalog.get_catalog()
+        self.assertGreater(reloaded.version, version)
+        self.assertEqual(len(reloaded.bus_routes_of(self.route.route_id)), 2)
+
+    def test_rider_changes_leave_the_catalog_alone(self):
+        rider = User.objects.create(name='Rider', email='rider@example.com', password='x', user_type='user')
+        version = catalog.current_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            rider.name = 'Renamed Rider'
+            rider.save()
+        self.assertEqual(catalog.current_version(), version)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.operator.name = 'Renamed Operator'
+            self.operator.save()
+        self.assertGreater(catalog.current_version(), version)
+
+
+# ====== Route listing ======
+
+class CursorPaginationTests(SimpleTestCase):
+    def setUp(self):
+        self.routes = [make_route(index, f'Route {letter}') for index, letter in enumerate('ACEGIKM', start=1)]
+        self.factory = RequestFactory()
+
+    def fetch(self, **params):
+        with mock.patch('route.views.get_catalog', return_value=catalog.RouteCatalog(1, self.routes, [], [])):
+            response = get_all_routes(self.factory.get('/api/routes/', params))
+        return response.status_code, json.loads(response.content)
+
+    def test_pages_cover_every_route_once(self):
+        names = []
+        cursor = ''
+        while cursor is not None:
+            status, data = self.fetch(cursor=cursor, page_size=3)
+            self.assertEqual(status, 200)
+            names += [route['route_name'] for route in data['routes']]
+            cursor = data['pagination']['next_cursor']
+        self.assertEqual(names, sorted(route.route_name for route in self.routes))
+
+    def test_cursor_is_stable_across_inserts(self):
+        _, first = self.fetch(cursor='', page_size=3)
+        self.routes.append(make_route(99, 'Route B'))
+        _, second = self.fetch(cursor=first['pagination']['next_cursor'], page_size=3)
+        self.assertEqual([route['route_name'] for route in second['routes']], ['Route G', 'Route I', 'Route K'])
+
+    def test_total_is_opt_in(self):
+        _, data = self.fetch(cursor='')
+        self.assertNotIn('total', data['pagination'])
+        _, data = self.fetch(cursor='', include_total=1)
+        self.assertEqual(data['pagination']['total'], 7)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.fetch(cursor='%%%')[0], 400)
+
+
+class RouteListingTests(LiveApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for letter in 'ABCDEFG':
+            Route.objects.create(
+                route_name=f'Route {letter}', source='Alpha', destination='Omega',
+                distance=20.0, estimated_duration=timedelta(hours=1), total_fare=50
+            )
+
+    def test_cursor_pages_cost_no_queries_at_any_depth(self):
+        self.client.get('/api/routes/', {'cursor': ''})
+        names = []
+        cursor = ''
+        while cursor is not None:
+            with self.assertNumQueries(0):
+                data = self.client.get('/api/routes/', {'cursor': cursor, 'page_size': 3}).json()
+            names += [route['route_name'] for route in data['routes']]
+            cursor = data['pagination']['next_cursor']
+        self.assertEqual(names, ['Line One'] + [f'Route {letter}' for letter in 'ABCDEFG'])
+
+    def test_numbered_pages_and_filters(self):
+        data = self.client.get('/api/routes/', {'page': 2, 'page_size': 3}).json()
+        self.assertEqual([route['route_name'] for route in data['routes']], ['Route C', 'Route D', 'Route E'])
+        self.assertEqual((data['pagination']['pages'], data['pagination']['total']), (3, 8))
+        matching = self.client.get('/api/routes/', {'cursor': '', 'source': 'alp', 'include_total': 1}).json()
+        self.assertEqual(matching['pagination']['total'], 8)
+        self.assertEqual(matching['routes'][0]['stops_count'], 3)
+        none = self.client.get('/api/routes/', {'cursor': '', 'destination': 'nowhere'}).json()
+        self.assertEqual((none['routes'], none['pagination']['next_cursor']), ([], None))
+
+
+# ====== City search index ======
+
+class CityIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = CityIndex(['Bangalore', 'Mumbai', 'New Delhi', 'Pune', 'Punalur', 'Delhi', ' ', 'Mumbai'])
+
+    def matched(self, city_input):
+        result = self.index.validate(city_input)
+        return result['matched_name'] if result['valid'] else None
+
+    def test_exact_match_ignores_case_and_spacing(self):
+        self.assertEqual(self.matched('  new   DELHI '), 'New Delhi')
+        self.assertEqual(self.matched('delhi'), 'Delhi')
+
+    def test_single_strict_partial_match(self):
+        self.assertEqual(self.matched('Bang'), 'Bangalore')
+        # A substring must cover at least half of the name
+        self.assertEqual(self.matched('galore'), 'Bangalore')
+        self.assertIsNone(self.matched('lore'))
+
+    def test_ambiguous_partial_match_is_suggested(self):
+        self.assertEqual(self.index.validate('Pun'), {
+            'valid': False, 'matched_name': None, 'suggestions': ['Punalur', 'Pune']
+        })
+
+    def test_fuzzy_suggestions(self):
+        self.assertEqual(self.index.validate('Mumbay')['suggestions'], ['Mumbai'])
+        self.assertEqual(self.index.validate('Xyzzyq')['suggestions'], [])
+
+    def test_short_input_lists_cities(self):
+        self.assertEqual(self.index.validate('Mu')['suggestions'], self.index.names[:5])
+        self.assertEqual(len(self.index), 6)
+
+
+class CitySearchValidationTests(LiveApiTestCase):
+    def test_index_is_built_once_per_catalog(self):
+        index = get_city_index()
+        self.assertEqual(index.names, ['Alpha', 'Omega'])
+        with self.assertNumQueries(0):
+            self.assertIs(get_city_index(), index)
+
+    def test_misspelt_city_gets_suggestions(self):
+        response = self.client.get('/api/routes/search/', {'source': 'alpha', 'destination': 'Omegga'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Did you mean 'Omega' for destination?", response.json()['suggestions'])
+
+    def test_partial_names_are_resolved(self):
+        response = self.client.get('/api/routes/search/', {'source': 'Alph', 'destination': 'omega'})
+        self.assertEqual(response.json()['search_params'], {'source': 'Alpha', 'destination': 'Omega'})
+
+
+# ====== Route search ======
+
+class RouteSearchTests(LiveApiTestCase):
+    def search(self, source='Alpha', destination='Omega'):
+        return self.client.get('/api/routes/search/', {'source': source, 'destination': destination})
+
+    def test_queries_do_not_grow_with_routes_or_buses(self):
+        self.search()
+        for count in (2, 3):
+            # A new route, and a new bus running both it and Line One
+            with self.captureOnCommitCallbacks(execute=True):
+                route = Route.objects.create(
+                    route_name=f'Line {count}', source='Alpha', destination='Omega',
+                    distance=25.0, estimated_duration=timedelta(hours=1), total_fare=60
+                )
+                BusRoute.objects.create(
+                    bus=self.create_bus_route(f'DL01AB000{count}').bus, route=route,
+                    departure_time=time(9), arrival_time=time(11), effective_from=date.today()
+                )
+            self.search()
+            # Buses, operators and stops come from the route catalog
+            with self.assertNumQueries(0):
+                data = self.search().json()
+            self.assertEqual(data['summary']['total_routes'], count)
+        self.assertEqual(
+            [(route['route_name'], route['available_buses_count']) for route in data['routes']],
+            [('Line 2', 1), ('Line 3', 1), ('Line One', 3)]
+        )
+        self.assertEqual(data['routes'][0]['buses'][0]['operator_name'], 'Operator')
+
+    def test_reverse_direction_is_offered(self):
+        response = self.search('Omega', 'Alpha')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual([route['route_name'] for route in response.json()['reverse_routes']], ['Line One'])
+
+    def test_missing_cities(self):
+        self.assertEqual(self.search(destination='').status_code, 400)
+
+
+# ====== Intermediate-stop search ======
+
+class SegmentIndexTests(SimpleTestCase):
+    def setUp(self):
+        routes = [make_route(1, 'Line One', 'Xton', 'Zton'), make_route(2, 'Line Two', 'Zton', 'Wton')]
+        stops = make_stops(1, ['X Stand', 'Y Stand', 'Z Stand']) + make_stops(2, ['Z Stand', 'Y Stand', 'W Stand'])
+        for stop_id, stop in enumerate(stops, start=1):
+            stop.pk = stop_id
+        self.index = SegmentIndex(catalog.RouteCatalog(1, routes, stops, []))
+
+    def test_intermediate_stops_in_both_directions(self):
+        forward, reverse = self.index.between('Z Stand', 'y stand')
+        self.assertEqual([segment.route.route_name for segment in forward], ['Line Two'])
+        self.assertEqual([segment.route.route_name for segment in reverse], ['Line One'])
+        self.assertEqual((forward[0].distance_km, forward[0].fare), (10.0, 20.0))
+        self.assertEqual((reverse[0].board.stop_name, reverse[0].alight.stop_name), ('Y Stand', 'Z Stand'))
+
+    def test_endpoint_cities_match_first_and_last_stop(self):
+        forward, reverse = self.index.between('Xton', 'Zton')
+        self.assertEqual([segment.route.route_name for segment in forward], ['Line One'])
+        self.assertEqual(forward[0].distance_km, 20.0)
+        self.assertEqual(reverse, [])
+
+    def test_unknown_place(self):
+        self.assertEqual(self.index.between('Nowhere', 'Y Stand'), ([], []))
+        self.assertNotIn('Nowhere', self.index)
+
+
+class StopSearchTests(LiveApiTestCase):
+    def test_search_between_intermediate_stops(self):
+        response = self.client.get('/api/routes/search/', {'source': 'beta stand', 'destination': 'Omega Stand'})
+        route = response.json()['routes'][0]
+        self.assertEqual(route['route_name'], 'Line One')
+        self.assertEqual(route['segment'], {
+            'from_stop': 'Beta Stand', 'from_sequence': 2, 'to_stop': 'Omega Stand', 'to_sequence': 3,
+            'distance': 10.0, 'fare': 20.0
+        })
+
+    def test_stops_in_the_wrong_order_offer_the_reverse_route(self):
+        response = self.client.get('/api/routes/search/', {'source': 'Omega Stand', 'destination': 'Beta Stand'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual([route['route_name'] for route in response.json()['reverse_routes']], ['Line One'])
 
-# Create your tests here.
@@ -10,6 +10,7 @@ urlpatterns = [
     path('', views.get_all_routes, name='get_all_routes'),
     path('<int:route_id>/', views.get_route_details, name='get_route_details'),
     path('search/', views.search_routes, name='search_routes'),
+    path('stops/nearest/', views.get_nearest_stops, name='get_nearest_stops'),
     
     # Bus search endpoints
     path('find-bus/', views.find_bus_by_route_name, name='find_bus_by_route_name'),
@@ -18,11 +19,16 @@ urlpatterns = [
     
     # Driver Mobile App APIs
     path('driver/location/update/', live_tracking_views.driver_update_location, name='driver_update_location'),
+    path('driver/location/batch/', live_tracking_views.driver_update_location_batch, name='driver_update_location_batch'),
     path('driver/status/update/', live_tracking_views.driver_update_status, name='driver_update_status'),
     
     # User Live Tracking APIs
+    # Before live/<bus_number>/ so "nearby" is not taken for a bus number
+    path('live/nearby/', live_tracking_views.get_nearby_buses, name='get_nearby_buses'),
     path('live/<str:bus_number>/', live_tracking_views.get_live_bus_location, name='get_live_bus_location'),
     path('live/route/<str:route_name>/', live_tracking_views.get_route_live_overview, name='get_route_live_overview'),
+    path('live/<str:bus_number>/stream/', live_tracking_views.stream_bus_location, name='stream_bus_location'),
+    path('live/route/<str:route_name>/stream/', live_tracking_views.stream_route_overview, name='stream_route_overview'),
     
     # Legacy tracking endpoints (for backward compatibility)
     path('tracking/<int:bus_route_id>/', views.get_live_tracking, name='get_live_tracking'),
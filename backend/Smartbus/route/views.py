@@ -1,47 +1,103 @@
-from django.shortcuts import render, get_object_or_404
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import require_http_methods, condition
 from django.core.paginator import Paginator
 from django.utils import timezone
-from datetime import datetime, timedelta
+import base64
+import bisect
+import itertools
 import json
 import logging
-import difflib  # For intelligent city name matching
-
-from .models import Route, RouteStop, BusRoute, LiveRouteTracking
-from users.models import Bus
+import random
+
+from .models import Route, BusRoute, LiveRouteTracking
+from .catalog import get_catalog
+from .cities import get_city_index, get_stop_name_index
+from .segments import get_segment_index
+from .spatial import get_stop_index, get_live_index
+from .conditional import make_validators
+from .ingestion import FixValidationError, FixIgnored, parse_location_fix
+from .live_state import get_store
+from .live_tracking_views import record_location_fix
+from .alerts import get_engine as get_alert_engine
+from .live_stream import get_hub as get_live_hub
 
 logger = logging.getLogger(__name__)
 
+# Nearest-stop search limits
+DEFAULT_NEAREST_STOPS = 10
+MAX_NEAREST_STOPS = 50
+DEFAULT_STOP_RADIUS_KM = 25.0
+MAX_STOP_RADIUS_KM = 100.0
+
 
 @require_http_methods(["GET"])
 def get_all_routes(request):
-    """Get all active routes with pagination"""
+    """
+    Get all active routes with pagination
+    Pages by number (page), or by keyset cursor on route_name: pass an
+    empty cursor for the first page, then each response's next_cursor.
+    Cursor pages cost the same at any depth and never skip or repeat a
+    route when routes are added or removed between requests; their total
+    is only counted with include_total=1.
+    """
     try:
-        routes = Route.objects.filter(is_active=True).order_by('route_name')
+        catalog = get_catalog()
         
         # Apply filters
         route_type = request.GET.get('type')
-        source = request.GET.get('source')
-        destination = request.GET.get('destination')
-        
-        if route_type:
-            routes = routes.filter(route_type=route_type)
-        if source:
-            routes = routes.filter(source__icontains=source)
-        if destination:
-            routes = routes.filter(destination__icontains=destination)
+        source = request.GET.get('source', '').lower()
+        destination = request.GET.get('destination', '').lower()
+        
+        def matches(route):
+            return (
+                (not route_type or route.route_type == route_type)
+                and (not source or source in route.source.lower())
+                and (not destination or destination in route.destination.lower())
+            )
         
         # Pagination
-        page_number = request.GET.get('page', 1)
         page_size = min(int(request.GET.get('page_size', 10)), 100)
         
-        paginator = Paginator(routes, page_size)
-        page_obj = paginator.get_page(page_number)
+        if 'cursor' in request.GET:
+            try:
+                after = _decode_route_cursor(request.GET['cursor'])
+            except ValueError:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Invalid cursor'
+                }, status=400)
+            
+            # Scan from the cursor for one route more than the page holds
+            start = 0 if after is None else bisect.bisect_right(catalog.active_route_names, after)
+            page = []
+            for route in itertools.islice(catalog.active_routes, start, None):
+                if matches(route):
+                    page.append(route)
+                    if len(page) > page_size:
+                        break
+            has_more = len(page) > page_size
+            page = page[:page_size]
+            
+            pagination = {
+                'per_page': page_size,
+                'next_cursor': _encode_route_cursor(page[-1].route_name) if has_more else None
+            }
+            if request.GET.get('include_total', '').lower() in ('1', 'true', 'yes'):
+                pagination['total'] = sum(1 for route in catalog.active_routes if matches(route))
+        else:
+            routes = [route for route in catalog.active_routes if matches(route)]
+            paginator = Paginator(routes, page_size)
+            page = paginator.get_page(request.GET.get('page', 1))
+            pagination = {
+                'page': page.number,
+                'pages': paginator.num_pages,
+                'per_page': page_size,
+                'total': paginator.count
+            }
         
         routes_data = []
-        for route in page_obj:
+        for route in page:
             routes_data.append({
                 'route_id': route.route_id,
                 'route_name': route.route_name,
@@ -51,18 +107,13 @@ def get_all_routes(request):
                 'total_fare': float(route.total_fare),
                 'route_type': route.route_type,
                 'estimated_duration': str(route.estimated_duration) if route.estimated_duration else None,
-                'stops_count': route.stops.count()
+                'stops_count': len(catalog.stops_of(route.route_id))
             })
         
         return JsonResponse({
             'success': True,
             'routes': routes_data,
-            'pagination': {
-                'page': page_obj.number,
-                'pages': paginator.num_pages,
-                'per_page': page_size,
-                'total': paginator.count
-            }
+            'pagination': pagination
         })
     
     except Exception as e:
@@ -73,16 +124,39 @@ def get_all_routes(request):
         }, status=500)
 
 
+def _encode_route_cursor(route_name):
+    """Opaque cursor pointing after a route name"""
+    return base64.urlsafe_b64encode(route_name.encode()).decode().rstrip('=')
+
+
+def _decode_route_cursor(cursor):
+    """Route name of a cursor, None for an empty (first page) cursor; raises ValueError"""
+    if not cursor:
+        return None
+    return base64.b64decode(cursor + '=' * (-len(cursor) % 4), altchars=b'-_', validate=True).decode()
+
+
+def _route_details_etag(request, route_id):
+    """Route details change only with the route catalog"""
+    catalog = get_catalog()
+    if catalog.active_route(route_id) is None:
+        return None
+    return make_validators(('route_details', route_id, catalog.version), []).etag
+
+
 @require_http_methods(["GET"])
+@condition(etag_func=_route_details_etag)
 def get_route_details(request, route_id):
     """Get detailed information about a specific route"""
     try:
-        route = get_object_or_404(Route, route_id=route_id, is_active=True)
+        catalog = get_catalog()
+        route = catalog.active_route(route_id)
+        if route is None:
+            raise Route.DoesNotExist
         
         # Get route stops
-        stops = route.stops.all().order_by('stop_sequence')
         stops_data = []
-        for stop in stops:
+        for stop in catalog.stops_of(route.route_id):
             stops_data.append({
                 'stop_name': stop.stop_name,
                 'stop_sequence': stop.stop_sequence,
@@ -95,9 +169,8 @@ def get_route_details(request, route_id):
             })
         
         # Get assigned buses
-        bus_routes = route.assigned_buses.filter(is_operational=True)
         buses_data = []
-        for bus_route in bus_routes:
+        for bus_route in catalog.bus_routes_of(route.route_id):
             buses_data.append({
                 'bus_number': bus_route.bus.bus_number,
                 'bus_name': bus_route.bus.bus_name,
@@ -136,6 +209,53 @@ def get_route_details(request, route_id):
         }, status=500)
 
 
+@require_http_methods(["GET"])
+def get_nearest_stops(request):
+    """
+    Find the stops nearest to a point and the routes serving them
+    Query parameters: lat, lng, k (default 10), radius (km, default 25)
+    """
+    try:
+        try:
+            latitude = float(request.GET['lat'])
+            longitude = float(request.GET['lng'])
+            k = int(request.GET.get('k', DEFAULT_NEAREST_STOPS))
+            radius_km = float(request.GET.get('radius', DEFAULT_STOP_RADIUS_KM))
+        except (KeyError, ValueError):
+            return JsonResponse({
+                'success': False,
+                'error': 'lat and lng are required; k and radius must be numbers'
+            }, status=400)
+        
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return JsonResponse({
+                'success': False,
+                'error': 'Coordinates out of range'
+            }, status=400)
+        if not 1 <= k <= MAX_NEAREST_STOPS or not 0 < radius_km <= MAX_STOP_RADIUS_KM:
+            return JsonResponse({
+                'success': False,
+                'error': f'k must be 1-{MAX_NEAREST_STOPS} and radius between 0 and {MAX_STOP_RADIUS_KM:g} km'
+            }, status=400)
+        
+        stops = get_stop_index().nearest(latitude, longitude, k, radius_km)
+        
+        return JsonResponse({
+            'success': True,
+            'center': {'latitude': latitude, 'longitude': longitude},
+            'radius_km': radius_km,
+            'stops': stops,
+            'total': len(stops)
+        })
+    
+    except Exception as e:
+        logger.error(f"Error finding nearest stops: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'error': 'Failed to find nearest stops'
+        }, status=500)
+
+
 @require_http_methods(["GET"])
 def search_routes(request):
     """Enhanced route search with intelligent location validation and bus availability"""
@@ -163,9 +283,11 @@ def search_routes(request):
             }, status=400)
         
         # Validate locations against available cities
-        available_cities = get_available_cities()
-        source_valid = validate_city_name(source, available_cities)
-        destination_valid = validate_city_name(destination, available_cities)
+        catalog = get_catalog()
+        city_index = get_city_index()
+        stop_name_index = get_stop_name_index()
+        source_valid = validate_city_name(source, city_index, stop_name_index)
+        destination_valid = validate_city_name(destination, city_index, stop_name_index)
         
         # Handle invalid locations
         if not source_valid['valid'] or not destination_valid['valid']:
@@ -194,7 +316,7 @@ def search_routes(request):
                     'Try: Bangalore to Chennai', 
                     'Try: Pune to Mumbai'
                 ],
-                'available_cities': available_cities[:10],
+                'available_cities': city_index.names[:10],
                 'search_params': {'source': source, 'destination': destination}
             }, status=400)
         
@@ -202,31 +324,32 @@ def search_routes(request):
         validated_source = source_valid['matched_name']
         validated_destination = destination_valid['matched_name']
         
-        # Search for routes
-        routes = Route.objects.filter(
-            is_active=True,
-            source__iexact=validated_source,
-            destination__iexact=validated_destination
-        )
+        # Search for routes in both directions with one lookup
+        routes, reverse_routes = catalog.routes_between(validated_source, validated_destination)
         
         # If no exact match, try broader search
-        if not routes.exists():
-            routes = Route.objects.filter(
-                is_active=True,
-                source__icontains=validated_source,
-                destination__icontains=validated_destination
+        if not routes:
+            source_key = validated_source.lower()
+            destination_key = validated_destination.lower()
+            routes = [
+                route for route in catalog.active_routes
+                if source_key in route.source.lower() and destination_key in route.destination.lower()
+            ]
+        
+        # If still no match, look for routes passing through both places
+        segments = {}
+        if not routes:
+            forward_segments, reverse_segments = get_segment_index().between(
+                validated_source, validated_destination
             )
+            routes = [segment.route for segment in forward_segments]
+            segments = {segment.route.route_id: segment for segment in forward_segments}
+            reverse_routes = reverse_routes or [segment.route for segment in reverse_segments]
         
         # If still no routes found
-        if not routes.exists():
+        if not routes:
             # Check if cities exist in reverse direction
-            reverse_routes = Route.objects.filter(
-                is_active=True,
-                source__iexact=validated_destination,
-                destination__iexact=validated_source
-            )
-            
-            if reverse_routes.exists():
+            if reverse_routes:
                 return JsonResponse({
                     'status': 'info',
                     'success': False,
@@ -256,16 +379,17 @@ def search_routes(request):
         routes_data = []
         routes_with_buses = 0
         routes_coming_soon = 0
+        today = timezone.now().date()
         
         for route in routes:
             # Get available buses for this route
-            available_buses = route.assigned_buses.filter(
-                is_operational=True,
-                effective_from__lte=timezone.now().date()
-            )
+            available_buses = [
+                bus_route for bus_route in catalog.bus_routes_of(route.route_id)
+                if bus_route.effective_from <= today
+            ]
             
             buses_info = []
-            if available_buses.exists():
+            if available_buses:
                 for bus_route in available_buses:
                     buses_info.append({
                         'bus_name': bus_route.bus.bus_name,
@@ -282,7 +406,7 @@ def search_routes(request):
             # Route status based on bus availability  
             route_status = 'active' if buses_info else 'coming_soon'
             
-            routes_data.append({
+            route_data = {
                 'route_id': route.route_id,
                 'route_name': route.route_name,
                 'source': route.source,
@@ -295,8 +419,21 @@ def search_routes(request):
                 'available_buses_count': len(buses_info),
                 'buses': buses_info if buses_info else [],
                 'message': f'✅ {len(buses_info)} buses available' if buses_info else '🔄 Coming Soon - No buses currently operational',
-                'stops_count': route.stops.count()
-            })
+                'stops_count': len(catalog.stops_of(route.route_id))
+            }
+            
+            # Part of the route between intermediate stops
+            segment = segments.get(route.route_id)
+            if segment is not None:
+                route_data['segment'] = {
+                    'from_stop': segment.board.stop_name,
+                    'from_sequence': segment.board.stop_sequence,
+                    'to_stop': segment.alight.stop_name,
+                    'to_sequence': segment.alight.stop_sequence,
+                    'distance': segment.distance_km,
+                    'fare': segment.fare
+                }
+            routes_data.append(route_data)
         
         # Prepare response based on bus availability
         if routes_with_buses == 0:
@@ -345,12 +482,8 @@ def search_routes(request):
 def get_popular_cities():
     """Get list of popular cities with available routes"""
     try:
-        # Get unique source and destination cities
-        sources = Route.objects.filter(is_active=True).values_list('source', flat=True).distinct()
-        destinations = Route.objects.filter(is_active=True).values_list('destination', flat=True).distinct()
-        
-        all_cities = set(list(sources) + list(destinations))
-        return sorted(list(all_cities))
+        # Unique source and destination cities
+        return list(get_catalog().cities)
     except:
         return ['Delhi', 'Mumbai', 'Bangalore', 'Chennai', 'Kolkata', 'Hyderabad', 'Pune', 'Ahmedabad']
 
@@ -358,85 +491,39 @@ def get_popular_cities():
 def get_available_cities():
     """Get all available cities from active routes"""
     try:
-        routes = Route.objects.filter(is_active=True)
-        sources = set(routes.values_list('source', flat=True))
-        destinations = set(routes.values_list('destination', flat=True))
-        all_cities = sources.union(destinations)
-        return sorted(list(all_cities))
+        return list(get_catalog().cities)
     except Exception as e:
         logger.error(f"Error getting available cities: {str(e)}")
         return ['Delhi', 'Mumbai', 'Bangalore', 'Chennai', 'Kolkata', 'Hyderabad', 'Pune', 'Ahmedabad']
 
 
-def validate_city_name(city_input, available_cities):
-    """Validate city name with strict matching and suggestions"""
-    city_input = city_input.strip().title()
-    
-    # Check minimum length - reject very short inputs like "s", "k", etc.
-    if len(city_input) < 3:
-        return {
-            'valid': False,
-            'matched_name': None,
-            'suggestions': available_cities[:5]  # Show some popular cities
-        }
-    
-    # Exact match
-    for city in available_cities:
-        if city.lower() == city_input.lower():
-            return {
-                'valid': True,
-                'matched_name': city,
-                'suggestions': []
-            }
-    
-    # Strict partial match - only if input is significant portion of city name
-    # और multiple matches की case में valid return नहीं करें
-    strict_partial_matches = []
-    for city in available_cities:
-        city_lower = city.lower()
-        input_lower = city_input.lower()
-        
-        # Only match if:
-        # 1. Input is at least 3 characters
-        # 2. Input starts the city name, OR
-        # 3. Input is at least 50% of city name length
-        if (city_lower.startswith(input_lower) and len(input_lower) >= 3) or \
-           (input_lower in city_lower and len(input_lower) >= len(city) * 0.5):
-            strict_partial_matches.append(city)
+def validate_city_name(city_input, city_index, stop_name_index=None):
+    """
+    Validate city name with strict matching and suggestions
+    Input that matches no city is tried against stop names, so that
+    searches can start or end at an intermediate stop
+    """
+    result = city_index.validate(city_input)
+    if result['valid'] or stop_name_index is None:
+        return result
     
-    # Only auto-select if exactly one strict match found
-    if len(strict_partial_matches) == 1:
-        return {
-            'valid': True,
-            'matched_name': strict_partial_matches[0],
-            'suggestions': []
-        }
-    
-    # If multiple strict matches or none, show fuzzy suggestions
-    if strict_partial_matches:
-        suggestions = strict_partial_matches[:3]
-    else:
-        # Fuzzy matching using difflib with higher cutoff
-        suggestions = difflib.get_close_matches(
-            city_input, available_cities, n=3, cutoff=0.7
-        )
-    
-    return {
-        'valid': False,
-        'matched_name': None,
-        'suggestions': suggestions
-    }
+    stop_result = stop_name_index.validate(city_input)
+    if stop_result['valid'] or not result['suggestions']:
+        return stop_result
+    return result
 
 
 def get_alternative_routes(source, destination):
     """Get alternative route suggestions"""
     try:
         alternatives = []
+        catalog = get_catalog()
         
         # Routes from source to anywhere
-        source_routes = Route.objects.filter(
-            is_active=True, source__iexact=source
-        ).exclude(destination__iexact=destination)[:3]
+        source_routes = [
+            route for route in catalog.routes_from(source)
+            if route.destination.lower() != destination.lower()
+        ][:3]
         
         for route in source_routes:
             alternatives.append({
@@ -448,9 +535,10 @@ def get_alternative_routes(source, destination):
             })
         
         # Routes to destination from anywhere  
-        dest_routes = Route.objects.filter(
-            is_active=True, destination__iexact=destination
-        ).exclude(source__iexact=source)[:3]
+        dest_routes = [
+            route for route in catalog.routes_to(destination)
+            if route.source.lower() != source.lower()
+        ][:3]
         
         for route in dest_routes:
             alternatives.append({
@@ -470,11 +558,12 @@ def get_alternative_routes(source, destination):
 def get_popular_route_suggestions():
     """Get popular route suggestions"""
     try:
-        routes = Route.objects.filter(is_active=True).order_by('?')[:5]
+        catalog = get_catalog()
+        routes = random.sample(catalog.active_routes, min(len(catalog.active_routes), 5))
         suggestions = []
         
         for route in routes:
-            bus_count = route.assigned_buses.filter(is_operational=True).count()
+            bus_count = len(catalog.bus_routes_of(route.route_id))
             suggestions.append({
                 'route_name': route.route_name,
                 'source': route.source,
@@ -493,14 +582,13 @@ def get_popular_route_suggestions():
 def get_routes_from_city(city):
     """Get routes originating from a city"""
     try:
-        routes = Route.objects.filter(
-            is_active=True, source__iexact=city
-        )[:5]
+        catalog = get_catalog()
+        routes = catalog.routes_from(city)[:5]
         
         return [{
             'route_name': r.route_name,
             'destination': r.destination,
-            'buses_count': r.assigned_buses.filter(is_operational=True).count()
+            'buses_count': len(catalog.bus_routes_of(r.route_id))
         } for r in routes]
     except:
         return []
@@ -509,14 +597,13 @@ def get_routes_from_city(city):
 def get_routes_to_city(city):
     """Get routes going to a city"""
     try:
-        routes = Route.objects.filter(
-            is_active=True, destination__iexact=city
-        )[:5]
+        catalog = get_catalog()
+        routes = catalog.routes_to(city)[:5]
         
         return [{
             'route_name': r.route_name,
             'source': r.source,
-            'buses_count': r.assigned_buses.filter(is_operational=True).count()
+            'buses_count': len(catalog.bus_routes_of(r.route_id))
         } for r in routes]
     except:
         return []
@@ -525,15 +612,15 @@ def get_routes_to_city(city):
 def get_route_suggestions(source=None, destination=None):
     """Get route suggestions based on available routes"""
     try:
-        routes = Route.objects.filter(is_active=True)[:10]
+        catalog = get_catalog()
         suggestions = []
         
-        for route in routes:
+        for route in catalog.active_routes[:10]:
             suggestions.append({
                 'route_name': route.route_name,
                 'source': route.source,
                 'destination': route.destination,
-                'available_buses': route.assigned_buses.filter(is_operational=True).count()
+                'available_buses': len(catalog.bus_routes_of(route.route_id))
             })
         
         return suggestions
@@ -541,11 +628,41 @@ def get_route_suggestions(source=None, destination=None):
         return []
 
 
+def _live_tracking_validators(request, bus_route_id):
+    """Validators of a bus route's latest active tracking row, looked up once per request"""
+    if not hasattr(request, '_live_tracking_validators'):
+        latest = LiveRouteTracking.objects.filter(
+            bus_route_id=bus_route_id,
+            bus_route__is_operational=True,
+            is_active=True
+        ).order_by('-last_updated').values_list('pk', 'last_updated').first()
+        request._live_tracking_validators = (
+            make_validators(('tracking', bus_route_id, latest[0]), [latest[1]]) if latest else None
+        )
+    return request._live_tracking_validators
+
+
+def _live_tracking_etag(request, bus_route_id):
+    validators = _live_tracking_validators(request, bus_route_id)
+    return validators.etag if validators else None
+
+
+def _live_tracking_last_modified(request, bus_route_id):
+    validators = _live_tracking_validators(request, bus_route_id)
+    return validators.last_modified if validators else None
+
+
 @require_http_methods(["GET"])
+@condition(etag_func=_live_tracking_etag, last_modified_func=_live_tracking_last_modified)
 def get_live_tracking(request, bus_route_id):
-    """Get live tracking information for a specific bus route"""
+    """
+    Get live tracking information for a specific bus route
+    Answers 304 Not Modified while the bus has not reported
+    """
     try:
-        bus_route = get_object_or_404(BusRoute, id=bus_route_id, is_operational=True)
+        bus_route = get_catalog().bus_route(bus_route_id)
+        if bus_route is None:
+            raise BusRoute.DoesNotExist
         
         # Get latest tracking information
         tracking = LiveRouteTracking.objects.filter(
@@ -592,7 +709,10 @@ def get_live_tracking(request, bus_route_id):
 @csrf_exempt
 @require_http_methods(["POST"])
 def update_live_location(request):
-    """Update live location for a bus (for bus operators)"""
+    """
+    Update live location for a bus (for bus operators)
+    Same path as driver/location/update/, addressed by bus route id
+    """
     try:
         data = json.loads(request.body)
         
@@ -605,31 +725,45 @@ def update_live_location(request):
                     'error': f'Missing required field: {field}'
                 }, status=400)
         
-        bus_route = get_object_or_404(BusRoute, id=data['bus_route_id'], is_operational=True)
+        try:
+            bus_route = get_catalog().bus_route(int(data['bus_route_id']))
+        except (TypeError, ValueError):
+            bus_route = None
+        if bus_route is None:
+            return JsonResponse({
+                'success': False,
+                'error': 'Bus route not found'
+            }, status=404)
         
-        # Create or update live tracking
-        tracking, created = LiveRouteTracking.objects.update_or_create(
-            bus_route=bus_route,
-            defaults={
-                'current_latitude': data['latitude'],
-                'current_longitude': data['longitude'],
-                'current_speed': data.get('speed', 0.0),
-                'direction': data.get('direction', 'to_destination'),
-                'is_active': True
-            }
-        )
+        fix = parse_location_fix({
+            'bus_number': bus_route.bus.bus_number,
+            'latitude': data['latitude'],
+            'longitude': data['longitude'],
+            'speed': data.get('speed', 0.0),
+            'direction': data.get('direction', 'to_destination'),
+        })
+        
+        # Through the live state, so the write-behind flush and the live
+        # readers see this fix like any other
+        payload, delay_minutes, is_delayed = record_location_fix(bus_route, fix)
+        get_alert_engine().observe_delay(bus_route, delay_minutes, is_delayed)
+        get_live_index().observe(payload)
+        get_live_hub().publish_position(payload)
         
         return JsonResponse({
             'success': True,
             'message': 'Location updated successfully',
-            'tracking_id': tracking.id
+            'tracking_id': get_store().peek_tracking(bus_route.id).id
         })
     
-    except BusRoute.DoesNotExist:
+    except FixIgnored as e:
+        return JsonResponse(e.as_result())
+    
+    except FixValidationError as e:
         return JsonResponse({
             'success': False,
-            'error': 'Bus route not found'
-        }, status=404)
+            'error': str(e)
+        }, status=400)
     
     except json.JSONDecodeError:
         return JsonResponse({
@@ -650,28 +784,30 @@ def find_bus_by_route_name(request):
     """Find buses by route name with intelligent validation"""
     try:
         route_name = request.GET.get('route_name', '').strip()
+        catalog = get_catalog()
         
         if not route_name:
             return JsonResponse({
                 'success': False,
                 'error': 'Please provide a route name to search',
-                'available_routes': [r.route_name for r in Route.objects.filter(is_active=True)[:10]]
+                'available_routes': [r.route_name for r in catalog.active_routes[:10]]
             }, status=400)
         
         # Try exact match first
-        routes = Route.objects.filter(route_name__iexact=route_name, is_active=True)
+        route = catalog.route_by_name(route_name)
         
         # If no exact match, try partial match
-        if not routes.exists():
-            routes = Route.objects.filter(route_name__icontains=route_name, is_active=True)
+        if route is None:
+            route = next(
+                (r for r in catalog.active_routes if route_name.lower() in r.route_name.lower()), None
+            )
         
         # If still no match, suggest similar routes
-        if not routes.exists():
+        if route is None:
             # Find routes with similar names
-            all_routes = Route.objects.filter(is_active=True)
             suggestions = []
             
-            for route in all_routes:
+            for route in catalog.active_routes:
                 # Simple similarity check
                 if any(word.lower() in route.route_name.lower() for word in route_name.split()):
                     suggestions.append({
@@ -686,16 +822,13 @@ def find_bus_by_route_name(request):
                 'message': 'Please check the route name or try these available routes:',
                 'suggestions': suggestions[:5] if suggestions else [
                     {'route_name': r.route_name, 'source': r.source, 'destination': r.destination} 
-                    for r in Route.objects.filter(is_active=True)[:5]
+                    for r in catalog.active_routes[:5]
                 ]
             }, status=404)
         
         # Route found! Get bus details
-        route = routes.first()
-        bus_routes = route.assigned_buses.filter(is_operational=True)
-        
         buses_data = []
-        for bus_route in bus_routes:
+        for bus_route in catalog.bus_routes_of(route.route_id):
             buses_data.append({
                 'bus_id': bus_route.id,
                 'bus_name': bus_route.bus.bus_name,
@@ -734,7 +867,7 @@ def find_bus_by_route_name(request):
                 'distance': route.distance,
                 'total_fare': float(route.total_fare),
                 'route_type': route.route_type,
-                'stops_count': route.stops.count()
+                'stops_count': len(catalog.stops_of(route.route_id))
             },
             'buses': buses_data,
             'total_buses': len(buses_data)
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:33
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Upper
+
+
+def check_duplicate_bus_numbers(apps, schema_editor):
+    """
+    Refuse to add the unique index while bus numbers repeat. Numbers that
+    differ only in case count as the same: the bus resolver and MySQL's
+    default collation both match them case-insensitively. Which bus keeps
+    the number is a data decision, so duplicates are listed, not merged.
+    """
+    Bus = apps.get_model('users', 'Bus')
+    duplicates = sorted(
+        Bus.objects.annotate(bus_number_key=Upper('bus_number'))
+        .values('bus_number_key').annotate(count=Count('id')).filter(count__gt=1)
+        .values_list('bus_number_key', flat=True)
+    )
+    if not duplicates:
+        return
+    listing = '; '.join(
+        f'{key}: bus ids ' + ', '.join(
+            str(bus_id) for bus_id in Bus.objects.annotate(bus_number_key=Upper('bus_number'))
+            .filter(bus_number_key=key).order_by('id').values_list('id', flat=True)
+        )
+        for key in duplicates
+    )
+    raise RuntimeError(
+        f'Cannot make Bus.bus_number unique, these numbers are used by more than one bus '
+        f'(case-insensitively): {listing}. Renumber or delete the extra buses and migrate again.'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_bus_numbers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='bus',
+            name='bus_number',
+            field=models.CharField(max_length=50, unique=True),
+        ),
+    ]
@@ -29,7 +29,7 @@ class Bus(models.Model):
     id = models.CharField(max_length=36, primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='buses')
     bus_name = models.CharField(max_length=100)
-    bus_number = models.CharField(max_length=50)
+    bus_number = models.CharField(max_length=50, unique=True)
     route = models.CharField(max_length=200)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -194,6 +194,13 @@ def register(request):
                     'message': 'Email already registered'
                 }, status=400)
             
+            # Check if bus number already exists
+            if Bus.objects.filter(bus_number=bus_number).exists():
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Bus number already registered'
+                }, status=400)
+            
             # Create user using Django model
             user = User.objects.create(
                 name=name,